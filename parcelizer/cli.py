@@ -2,6 +2,7 @@
 
 import asyncio
 import sys
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -10,11 +11,23 @@ from PIL import Image
 
 from .core.config import config
 from .core.image_processor import ImageProcessor
-from .core.vision_extractor import VisionExtractor
 from .core.pipeline import ParcelPipeline
+from .core.point_join import PointResolver, join_points, read_points
+from .core.regrid_client import RegridClient
+from .core.result_store import ResultStore
+from .core.output_sink import GEOPARQUET_INSTALL_HINT, OUTPUT_FORMATS, PYARROW_AVAILABLE
+from .core.profiling import RunProfiler
+from .core.work_queue import QueueWorker, WorkQueue
 from .web.app import run_dev_server
 
 
+def _check_output_format(ctx: click.Context, param: click.Parameter, value: Optional[str]) -> Optional[str]:
+    """Fail early when the chosen output format's optional dependency is missing."""
+    if (value or config.output_format) == "geoparquet" and not PYARROW_AVAILABLE:
+        raise click.UsageError(GEOPARQUET_INSTALL_HINT)
+    return value
+
+
 @click.group()
 @click.version_option(version="0.1.0")
 def cli():
@@ -27,7 +40,11 @@ def cli():
 @click.option('--output', '-o', type=click.Path(path_type=Path), 
               help='Output directory (default: ./output)')
 @click.option('--demo', is_flag=True, help='Use demo mode with sample parcel data')
-def process(image_path: Path, output: Optional[Path] = None, demo: bool = False):
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS), callback=_check_output_format,
+              help='Output format (default: PARCELIZER_OUTPUT_FORMAT or files)')
+@click.option('--profile', is_flag=True, help='Write CPU, memory and flamegraph reports to the output directory')
+def process(image_path: Path, output: Optional[Path] = None, demo: bool = False,
+            output_format: Optional[str] = None, profile: bool = False):
     """Process a parcel map image and extract information."""
     if output is None:
         output = Path("output")
@@ -36,7 +53,7 @@ def process(image_path: Path, output: Optional[Path] = None, demo: bool = False)
     
     try:
         # Initialize pipeline
-        pipeline = ParcelPipeline(demo_mode=demo)
+        pipeline = ParcelPipeline(demo_mode=demo, output_format=output_format, output_dir=output)
         
         if demo:
             click.echo("🎭 Running in demo mode with sample parcel data")
@@ -50,9 +67,12 @@ def process(image_path: Path, output: Optional[Path] = None, demo: bool = False)
         
         # Process through complete pipeline
         async def process_file():
-            return await pipeline.process_file(image_path)
+            try:
+                return await pipeline.process_file(image_path)
+            finally:
+                await pipeline.close()
         
-        results = asyncio.run(process_file())
+        results = _run(process_file(), output, profile)
         
         # Display results
         successful_parcels = 0
@@ -60,6 +80,8 @@ def process(image_path: Path, output: Optional[Path] = None, demo: bool = False)
             click.echo(f"\n--- Result {i + 1} ---")
             
             # Vision extraction results
+            if result.vision_info.page_index is not None:
+                click.echo(f"Page: {result.vision_info.page_index + 1}")
             if result.vision_info.apn:
                 click.echo(f"APN: {result.vision_info.apn}")
             if result.vision_info.address:
@@ -72,27 +94,188 @@ def process(image_path: Path, output: Optional[Path] = None, demo: bool = False)
             # Boundary lookup results
             if result.success and result.boundary:
                 successful_parcels += 1
-                click.echo(f"✓ Parcel Boundary: Found ({len(result.boundary.vertices)} vertices)")
+                click.echo(f"✓ Parcel Boundary: Found ({result.boundary.vertex_count} vertices)")
                 click.echo(f"  Parcel ID: {result.boundary.parcel_id}")
-                
-                # Files should already be saved by pipeline
-                parcel_id = pipeline._clean_filename(result.boundary.parcel_id)
-                click.echo(f"  Files saved: {parcel_id}.geojson, {parcel_id}_vertices.csv")
             else:
                 click.echo(f"✗ Parcel Boundary: Not found")
                 if result.error:
                     click.echo(f"  Error: {result.error}")
         
+        retryable = len([r for r in results if r.retryable])
+        
         click.echo(f"\nProcessing complete!")
         click.echo(f"- Processed {len(results)} parcel(s)")
         click.echo(f"- Found boundaries for {successful_parcels} parcel(s)")
-        click.echo(f"- Results saved to: {output}")
+        if retryable:
+            click.echo(f"- {retryable} lookup(s) throttled or unavailable; run again later to retry them")
+        click.echo(f"- Results saved: {pipeline.sink.describe()}")
+        
+    except Exception as e:
+        click.echo(f"Error: {e}")
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('inputs', nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option('--output', '-o', type=click.Path(path_type=Path),
+              help='Output directory (default: ./output)')
+@click.option('--demo', is_flag=True, help='Use demo mode with sample parcel data')
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS), callback=_check_output_format,
+              help='Output format (default: PARCELIZER_OUTPUT_FORMAT or files)')
+@click.option('--profile', is_flag=True, help='Write CPU, memory and flamegraph reports to the output directory')
+def batch(inputs: tuple, output: Optional[Path] = None, demo: bool = False,
+          output_format: Optional[str] = None, profile: bool = False):
+    """Process many parcel map files (or directories of them) into one run."""
+    if output is None:
+        output = Path("output")
+    
+    output.mkdir(exist_ok=True)
+    
+    try:
+        pipeline = ParcelPipeline(demo_mode=demo, output_format=output_format, output_dir=output)
+        
+        files = _expand_inputs(inputs, pipeline.image_processor)
+        click.echo(f"Processing {len(files)} file(s)")
+        
+        async def process_files():
+            results = []
+            try:
+                for file_path in files:
+                    try:
+                        results.extend(await pipeline.process_file(file_path))
+                    except Exception as e:
+                        click.echo(f"✗ {file_path}: {e}")
+            finally:
+                await pipeline.close()
+            return results
+        
+        results = _run(process_files(), output, profile)
+        successful_parcels = len([r for r in results if r.success])
+        retryable = len([r for r in results if r.retryable])
+        
+        click.echo(f"\nBatch complete!")
+        click.echo(f"- Processed {len(results)} parcel(s) from {len(files)} file(s)")
+        click.echo(f"- Found boundaries for {successful_parcels} parcel(s)")
+        if retryable:
+            click.echo(f"- {retryable} lookup(s) throttled or unavailable; run again later to retry them")
+        click.echo(f"- Results saved: {pipeline.sink.describe()}")
+        _echo_regrid_status(pipeline.regrid_client)
+        
+    except Exception as e:
+        click.echo(f"Error: {e}")
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('inputs', nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option('--queue', 'queue_path', type=click.Path(path_type=Path),
+              help='Queue database (default: PARCELIZER_QUEUE or output/queue.sqlite)')
+def enqueue(inputs: tuple, queue_path: Optional[Path] = None):
+    """Queue every page of parcel map files (or directories of them) for workers."""
+    try:
+        work_queue = WorkQueue(queue_path)
+        image_processor = ImageProcessor()
+        
+        added = 0
+        files = _expand_inputs(inputs, image_processor)
+        for file_path in files:
+            try:
+                added += work_queue.enqueue(file_path, image_processor.page_count(file_path))
+            except Exception as e:
+                click.echo(f"✗ {file_path}: {e}")
+        
+        click.echo(f"Queued {added} page(s) from {len(files)} file(s) in {work_queue.path}")
+        click.echo(f"Queue status: {_format_counts(work_queue.counts())}")
+        
+    except Exception as e:
+        click.echo(f"Error: {e}")
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--queue', 'queue_path', type=click.Path(path_type=Path),
+              help='Queue database (default: PARCELIZER_QUEUE or output/queue.sqlite)')
+@click.option('--output', '-o', type=click.Path(path_type=Path),
+              help='Shared output directory (default: ./output)')
+@click.option('--demo', is_flag=True, help='Use demo mode with sample parcel data')
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS), callback=_check_output_format,
+              help='Output format (default: PARCELIZER_OUTPUT_FORMAT or files)')
+@click.option('--wait', is_flag=True, help='Keep polling for new work instead of exiting when the queue is empty')
+def worker(queue_path: Optional[Path] = None, output: Optional[Path] = None, demo: bool = False,
+           output_format: Optional[str] = None, wait: bool = False):
+    """Process queued pages; run one per core or host to scale out."""
+    if output is None:
+        output = Path("output")
+    
+    output.mkdir(exist_ok=True)
+    
+    try:
+        work_queue = WorkQueue(queue_path)
+        pipeline = ParcelPipeline(demo_mode=demo, output_format=output_format, output_dir=output)
+        queue_worker = QueueWorker(work_queue, pipeline)
+        
+        click.echo(f"Worker {queue_worker.worker_id} reading {work_queue.path}")
+        
+        async def run_worker():
+            try:
+                return await queue_worker.run(wait=wait)
+            finally:
+                await pipeline.close()
+        
+        pages = asyncio.run(run_worker())
+        
+        click.echo(f"\nWorker finished!")
+        click.echo(f"- Processed {pages} page(s)")
+        click.echo(f"- Found boundaries for {queue_worker.parcels_found} parcel(s)")
+        click.echo(f"- Queue status: {_format_counts(work_queue.counts())}")
         
     except Exception as e:
         click.echo(f"Error: {e}")
         sys.exit(1)
 
 
+def _run(coroutine, output: Path, profile: bool):
+    """Run a command's coroutine, under the profiler if asked."""
+    if not profile:
+        return asyncio.run(coroutine)
+    
+    with RunProfiler(output) as profiler:
+        result = asyncio.run(coroutine)
+    click.echo(f"Profile written: {', '.join(str(path) for path in profiler.report_paths)}")
+    return result
+
+
+def _expand_inputs(inputs: tuple, image_processor: ImageProcessor) -> list:
+    """Expand directories into their supported files."""
+    files = []
+    for path in inputs:
+        if path.is_dir():
+            files.extend(sorted(
+                p for p in path.rglob('*') if image_processor.is_supported_format(p)
+            ))
+        elif image_processor.is_supported_format(path):
+            files.append(path)
+        else:
+            click.echo(f"Skipping unsupported file: {path}")
+    return files
+
+
+def _echo_regrid_status(regrid_client: RegridClient) -> None:
+    """Report the Regrid quota and circuit state when there is something to say."""
+    status = regrid_client.status()
+    quota = status["quota"]
+    if quota["remaining"] is not None:
+        of_limit = f" of {quota['limit']}" if quota["limit"] is not None else ""
+        click.echo(f"- Regrid quota: {quota['remaining']}{of_limit} request(s) left")
+    if status["circuit"] != "closed":
+        click.echo(f"- Regrid circuit {status['circuit']}; retrying in {status['retry_after']:.0f}s")
+
+
+def _format_counts(counts: dict) -> str:
+    """Format queue status counts for display."""
+    return ", ".join(f"{counts.get(status, 0)} {status}" for status in ("pending", "leased", "done", "failed"))
+
+
 @cli.command()
 @click.option('--host', default='127.0.0.1', help='Host to bind to')
 @click.option('--port', default=8080, help='Port to bind to')
@@ -110,23 +293,72 @@ def serve(host: str, port: int, debug: bool):
 
 @cli.command()
 @click.argument('coordinates', type=str)
-def coords(coordinates: str):
-    """Process coordinates and extract parcel information."""
+@click.option('--demo', is_flag=True, help='Use demo mode with sample parcel data')
+def coords(coordinates: str, demo: bool = False):
+    """Look up the parcel containing a "lat, lon" point."""
     try:
-        vision_extractor = VisionExtractor()
-        parcel_info = vision_extractor.extract_coordinates_info(coordinates)
+        pipeline = ParcelPipeline(demo_mode=demo)
+        
+        async def process_coordinates():
+            try:
+                return await pipeline.process_coordinates(coordinates)
+            finally:
+                await pipeline.close()
+        
+        result = asyncio.run(process_coordinates())
         
         click.echo(f"Coordinates: {coordinates}")
-        if parcel_info.address:
-            click.echo(f"Address: {parcel_info.address}")
-        if parcel_info.raw_response:
-            click.echo(f"Response: {parcel_info.raw_response}")
+        if result.success and result.boundary:
+            click.echo(f"✓ Parcel Boundary: Found ({result.boundary.vertex_count} vertices)")
+            click.echo(f"  Parcel ID: {result.boundary.parcel_id}")
+            for label, value in (("APN", result.boundary.apn), ("Address", result.boundary.address),
+                                 ("County", result.boundary.county), ("State", result.boundary.state)):
+                if value:
+                    click.echo(f"  {label}: {value}")
+        else:
+            click.echo(f"✗ Parcel Boundary: Not found")
+            if result.error:
+                click.echo(f"  Error: {result.error}")
             
     except Exception as e:
         click.echo(f"Error: {e}")
         sys.exit(1)
 
 
+@cli.command()
+@click.argument('points_file', type=click.Path(exists=True, path_type=Path))
+@click.option('--output', '-o', type=click.Path(path_type=Path),
+              help='Joined CSV to write (default: ./output/<name>-parcels.csv)')
+@click.option('--demo', is_flag=True, help='Use demo mode with sample parcel data')
+@click.option('--offline', is_flag=True, help='Only match parcels already cached or stored; no Regrid calls')
+def points(points_file: Path, output: Optional[Path] = None, demo: bool = False, offline: bool = False):
+    """Resolve a CSV or GeoJSON file of GPS points to parcels and write a joined CSV."""
+    if output is None:
+        output = Path("output") / f"{points_file.stem}-parcels.csv"
+    
+    output.parent.mkdir(parents=True, exist_ok=True)
+    
+    try:
+        frame, lats, lons = read_points(points_file)
+        click.echo(f"Resolving {len(frame)} point(s) from {points_file}")
+        
+        resolver = PointResolver(RegridClient(demo_mode=demo), ResultStore())
+        started = time.perf_counter()
+        matches = asyncio.run(resolver.resolve(lats, lons, use_regrid=not offline))
+        elapsed = time.perf_counter() - started
+        
+        join_points(frame, matches).to_csv(output, index=False)
+        
+        click.echo(f"\nResolution complete in {elapsed:.2f}s ({len(frame) / max(elapsed, 1e-9):,.0f} points/s)")
+        click.echo(f"- {', '.join(f'{count} {key}' for key, count in matches.counts().items())}")
+        click.echo(f"- {len(matches.parcels)} distinct parcel(s)")
+        click.echo(f"- Results saved: {output}")
+        
+    except Exception as e:
+        click.echo(f"Error: {e}")
+        sys.exit(1)
+
+
 def main():
     """Main entry point."""
     cli()
@@ -0,0 +1,102 @@
+"""County-aware APN normalization and candidate expansion."""
+
+import re
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# Per-county APN format rules: (state, county, printed pattern, stored format).
+# The pattern is matched against the upper-cased APN as it appears on the map;
+# the replacement produces the form Regrid stores in ``parcelnumb``. A county
+# may list several rules; earlier rules rank higher. Add counties here as
+# their formats are confirmed.
+APN_FORMAT_RULES = [
+    # Skamania County, WA: 05-04-00-1504-00 -> 050400150400
+    ("WA", "Skamania", r"(\d{2})\D*(\d{2})\D*(\d{2})\D*(\d{4})\D*(\d{2})", r"\1\2\3\4\5"),
+    # Cowlitz County, WA: WI 10203 -> WI10203; 10203-0001 -> 102030001
+    ("WA", "Cowlitz", r"([A-Z]{2})\W*(\d+)", r"\1\2"),
+    ("WA", "Cowlitz", r"(\d{5})\D*(\d{4})", r"\1\2"),
+    # Los Angeles County, CA: stored with dashes, 1234 567 890 -> 1234-567-890
+    ("CA", "Los Angeles", r"(\d{4})\D*(\d{3})\D*(\d{3})", r"\1-\2-\3"),
+    # Cook County, IL: PINs stored dashed; 10-digit PINs carry a 0000 unit suffix
+    ("IL", "Cook", r"(\d{2})\D*(\d{2})\D*(\d{3})\D*(\d{3})\D*(\d{4})", r"\1-\2-\3-\4-\5"),
+    ("IL", "Cook", r"(\d{2})\D*(\d{2})\D*(\d{3})\D*(\d{3})", r"\1-\2-\3-\4-0000"),
+    # Maricopa County, AZ: 123-45-678A -> 12345678A
+    ("AZ", "Maricopa", r"(\d{3})\D*(\d{2})\D*(\d{3})([A-Z]?)", r"\1\2\3\4"),
+]
+
+STATE_ABBREVIATIONS = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA",
+    "colorado": "CO", "connecticut": "CT", "delaware": "DE", "florida": "FL", "georgia": "GA",
+    "hawaii": "HI", "idaho": "ID", "illinois": "IL", "indiana": "IN", "iowa": "IA",
+    "kansas": "KS", "kentucky": "KY", "louisiana": "LA", "maine": "ME", "maryland": "MD",
+    "massachusetts": "MA", "michigan": "MI", "minnesota": "MN", "mississippi": "MS",
+    "missouri": "MO", "montana": "MT", "nebraska": "NE", "nevada": "NV", "new hampshire": "NH",
+    "new jersey": "NJ", "new mexico": "NM", "new york": "NY", "north carolina": "NC",
+    "north dakota": "ND", "ohio": "OH", "oklahoma": "OK", "oregon": "OR", "pennsylvania": "PA",
+    "rhode island": "RI", "south carolina": "SC", "south dakota": "SD", "tennessee": "TN",
+    "texas": "TX", "utah": "UT", "vermont": "VT", "virginia": "VA", "washington": "WA",
+    "west virginia": "WV", "wisconsin": "WI", "wyoming": "WY", "district of columbia": "DC",
+}
+
+
+def normalize_state(state: Optional[str]) -> str:
+    """Return the two-letter abbreviation for a state name or abbreviation."""
+    state = (state or "").strip()
+    if len(state) == 2:
+        return state.upper()
+    return STATE_ABBREVIATIONS.get(state.lower(), state.upper())
+
+
+def normalize_county(county: Optional[str]) -> str:
+    """Return a county name without the "County" suffix, case-folded."""
+    county = (county or "").strip().lower()
+    if county.endswith(" county"):
+        county = county[:-len(" county")]
+    return county.strip()
+
+
+def _compile_rules() -> Dict[Tuple[str, str], List[Tuple[Pattern, str]]]:
+    """Compile APN_FORMAT_RULES once, keyed by normalized (state, county)."""
+    rules: Dict[Tuple[str, str], List[Tuple[Pattern, str]]] = {}
+    for state, county, pattern, template in APN_FORMAT_RULES:
+        key = (normalize_state(state), normalize_county(county))
+        rules.setdefault(key, []).append((re.compile(pattern), template))
+    return rules
+
+
+_RULES = _compile_rules()
+
+
+def apn_key(apn: Optional[str]) -> str:
+    """Formatting-insensitive key for comparing APNs (alphanumerics, no leading zeros)."""
+    return ''.join(c for c in (apn or "") if c.isalnum()).upper().lstrip("0")
+
+
+def address_key(address: Optional[str]) -> str:
+    """Case- and whitespace-insensitive address key."""
+    return ' '.join((address or "").lower().replace(",", " ").split())
+
+
+def apn_candidates(apn: str, county: Optional[str] = None,
+                   state: Optional[str] = None) -> List[str]:
+    """Return ranked ``parcelnumb`` variants to try for an APN as printed.
+
+    County-specific formats come first, then the generic variants: the
+    alphanumerics only (Regrid's most common storage), the printed form with
+    separators normalized to dashes, and the alphanumerics without leading
+    zeros.
+    """
+    printed = apn.strip().upper()
+    candidates = []
+
+    for pattern, template in _RULES.get((normalize_state(state), normalize_county(county)), []):
+        match = pattern.fullmatch(printed)
+        if match:
+            candidates.append(match.expand(template))
+
+    compact = ''.join(c for c in printed if c.isalnum())
+    candidates.append(compact)
+    candidates.append(re.sub(r"[^A-Z0-9]+", "-", printed).strip("-"))
+    candidates.append(compact.lstrip("0"))
+
+    # Deduplicate while keeping rank order
+    return [c for c in dict.fromkeys(candidates) if c]
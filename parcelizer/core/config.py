@@ -24,6 +24,124 @@ class Config:
         
         if not self.regrid_api_key:
             raise ValueError("REGRID_API_KEY environment variable is required")
+        
+        # Output sink: "files" (per-parcel GeoJSON + CSV), "geoparquet" or "flatgeobuf"
+        self.output_format = os.getenv("PARCELIZER_OUTPUT_FORMAT", "files").lower()
+        self.output_batch_size = int(os.getenv("PARCELIZER_OUTPUT_BATCH_SIZE", "1000"))
+        # Write output from a background thread so disk latency never stalls lookups
+        self.background_writes = os.getenv("PARCELIZER_BACKGROUND_WRITES", "true").lower() == "true"
+        
+        # Map payloads: decimal places kept (6 ~ 0.1 m) and simplification error in pixels
+        self.map_precision = int(os.getenv("PARCELIZER_MAP_PRECISION", "6"))
+        self.map_simplify_pixels = float(os.getenv("PARCELIZER_MAP_SIMPLIFY_PIXELS", "0.5"))
+        
+        # Runs with more parcels than this are served to the map as tiles
+        self.map_inline_limit = int(os.getenv("PARCELIZER_MAP_INLINE_LIMIT", "200"))
+        self.map_max_runs = int(os.getenv("PARCELIZER_MAP_MAX_RUNS", "8"))
+        self.map_tile_cache_size = int(os.getenv("PARCELIZER_MAP_TILE_CACHE_SIZE", "256"))
+        
+        # APN + address lookups: "sequential" (fewest calls), "parallel" (both at once)
+        # or "hedged" (address query starts if the APN query is slower than the delay).
+        # The last two cost up to one extra Regrid call per parcel. An address hit
+        # waits up to the APN wait for the exact APN query before it is accepted.
+        self.lookup_strategy = os.getenv("PARCELIZER_LOOKUP_STRATEGY", "sequential").lower()
+        self.lookup_hedge_delay = float(os.getenv("PARCELIZER_LOOKUP_HEDGE_DELAY", "0.3"))
+        self.lookup_apn_wait = float(os.getenv("PARCELIZER_LOOKUP_APN_WAIT", "1.0"))
+        
+        # APN variants sent per batched query, and parcels kept in the local cache
+        self.apn_batch_size = int(os.getenv("PARCELIZER_APN_BATCH_SIZE", "3"))
+        self.parcel_cache_size = int(os.getenv("PARCELIZER_PARCEL_CACHE_SIZE", "10000"))
+        
+        # APNs per batched Regrid query when a run has many parcels, and how many
+        # parcel lookups run at once
+        self.lookup_batch_size = int(os.getenv("PARCELIZER_LOOKUP_BATCH_SIZE", "50"))
+        self.lookup_concurrency = int(os.getenv("PARCELIZER_LOOKUP_CONCURRENCY", "8"))
+        
+        # Regrid requests in flight: starts at the initial value and adapts between
+        # 1 and the maximum (shrinking on 429s, 5xx and latency well above the best seen)
+        self.regrid_concurrency = int(os.getenv("PARCELIZER_REGRID_CONCURRENCY", "4"))
+        self.regrid_max_concurrency = int(os.getenv("PARCELIZER_REGRID_MAX_CONCURRENCY", "16"))
+        self.regrid_latency_tolerance = float(os.getenv("PARCELIZER_REGRID_LATENCY_TOLERANCE", "2.0"))
+        
+        # Consecutive Regrid failures before calls fail fast, and for how long
+        self.circuit_failure_threshold = int(os.getenv("PARCELIZER_CIRCUIT_FAILURE_THRESHOLD", "5"))
+        self.circuit_reset_seconds = float(os.getenv("PARCELIZER_CIRCUIT_RESET_SECONDS", "30"))
+        
+        # Background prefetch of the parcels around the first hit in a document; it
+        # outlives the run, with at most the max pending prefetches at once
+        self.prefetch_enabled = os.getenv("PARCELIZER_PREFETCH", "false").lower() == "true"
+        self.prefetch_margin = float(os.getenv("PARCELIZER_PREFETCH_MARGIN", "0.01"))  # degrees
+        self.prefetch_page_size = int(os.getenv("PARCELIZER_PREFETCH_PAGE_SIZE", "200"))
+        self.prefetch_max_pages = int(os.getenv("PARCELIZER_PREFETCH_MAX_PAGES", "5"))
+        self.prefetch_max_pending = int(os.getenv("PARCELIZER_PREFETCH_MAX_PENDING", "2"))
+        
+        # Keep raw Regrid/vision responses (Regrid ones are spilled to output/raw/)
+        self.keep_raw_responses = os.getenv("PARCELIZER_KEEP_RAW_RESPONSES", "false").lower() == "true"
+        
+        # JSON output: compact unless pretty-printing is asked for; web responses
+        # above the minimum size are gzip/brotli-compressed when the client accepts it
+        self.pretty_json = os.getenv("PARCELIZER_PRETTY_JSON", "false").lower() == "true"
+        self.response_compression = os.getenv("PARCELIZER_COMPRESSION", "true").lower() == "true"
+        self.compression_min_size = int(os.getenv("PARCELIZER_COMPRESSION_MIN_SIZE", "1024"))
+        
+        # Map base layer and Leaflet sources, and an optional local caching proxy for
+        # both (offline or metered deployments) with an LRU disk cache of this size
+        self.tile_url = os.getenv("PARCELIZER_TILE_URL", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+        self.vendor_url = os.getenv("PARCELIZER_VENDOR_URL", "https://unpkg.com/")
+        self.tile_proxy = os.getenv("PARCELIZER_TILE_PROXY", "false").lower() == "true"
+        self.tile_cache_dir = Path(os.getenv("PARCELIZER_TILE_CACHE_DIR", "output/tile-cache"))
+        self.tile_cache_max_mb = float(os.getenv("PARCELIZER_TILE_CACHE_MAX_MB", "512"))
+        self.tile_proxy_timeout = float(os.getenv("PARCELIZER_TILE_PROXY_TIMEOUT", "10"))
+        
+        # OCR worker pool
+        self.ocr_workers = int(os.getenv("PARCELIZER_OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.ocr_lang = os.getenv("PARCELIZER_OCR_LANG", "eng")
+        self.ocr_batch_size = int(os.getenv("PARCELIZER_OCR_BATCH_SIZE", "8"))
+        
+        # Vision resolution ladder as "<max size>:<detail>" steps, tried in order
+        # while required fields are missing; "title" crops the title block. The
+        # token budget caps escalation per run (0 = unlimited).
+        self.vision_ladder = os.getenv("PARCELIZER_VISION_LADDER", "512:low,1024:high,title:high")
+        self.vision_token_budget = int(os.getenv("PARCELIZER_VISION_TOKEN_BUDGET", "0"))
+        
+        # Shared work queue for `parcelizer worker`: lease length (renewed while a
+        # worker is alive), attempts before an item is marked failed, pages
+        # claimed at a time, parcels per output part file, idle poll interval and
+        # failed lease renewals in a row (three are a full lease) before a worker stops
+        self.queue_path = Path(os.getenv("PARCELIZER_QUEUE", "output/queue.sqlite"))
+        self.queue_lease_seconds = float(os.getenv("PARCELIZER_QUEUE_LEASE_SECONDS", "300"))
+        self.queue_max_attempts = int(os.getenv("PARCELIZER_QUEUE_MAX_ATTEMPTS", "3"))
+        self.worker_batch_size = int(os.getenv("PARCELIZER_WORKER_BATCH_SIZE", "4"))
+        self.worker_part_size = int(os.getenv("PARCELIZER_WORKER_PART_SIZE", "1000"))
+        self.worker_poll_interval = float(os.getenv("PARCELIZER_WORKER_POLL_INTERVAL", "5"))
+        self.worker_heartbeat_failures = int(os.getenv("PARCELIZER_WORKER_HEARTBEAT_FAILURES", "3"))
+        
+        # Store of every web run's results, and the page sizes its query API serves
+        self.result_store_path = Path(os.getenv("PARCELIZER_RESULT_STORE", "output/results.sqlite"))
+        self.results_page_size = int(os.getenv("PARCELIZER_RESULTS_PAGE_SIZE", "100"))
+        self.results_max_page_size = int(os.getenv("PARCELIZER_RESULTS_MAX_PAGE_SIZE", "1000"))
+        
+        # Backpressure between the render, encode, vision and lookup stages: pages
+        # buffered between stages, pages downscaled and pages in vision at once, and
+        # the megapixels of page images held at once across all runs (a page is
+        # charged the estimate until it has been rendered and its real size is known)
+        self.stage_queue_size = int(os.getenv("PARCELIZER_STAGE_QUEUE_SIZE", "2"))
+        self.encode_concurrency = int(os.getenv("PARCELIZER_ENCODE_CONCURRENCY", "2"))
+        self.vision_concurrency = int(os.getenv("PARCELIZER_VISION_CONCURRENCY", "4"))
+        self.max_inflight_megapixels = float(os.getenv("PARCELIZER_MAX_INFLIGHT_MEGAPIXELS", "150"))
+        self.page_megapixels_estimate = float(os.getenv("PARCELIZER_PAGE_MEGAPIXELS_ESTIMATE", "4"))
+        
+        # Bulk point resolution: grid cell (degrees) for grouping nearby points, and
+        # the points a cell needs before its parcels are fetched with one area query
+        self.point_cell_size = float(os.getenv("PARCELIZER_POINT_CELL_SIZE", "0.01"))
+        self.point_area_min_points = int(os.getenv("PARCELIZER_POINT_AREA_MIN_POINTS", "3"))
+        
+        # Profiling (--profile, or ?profile=1 on web uploads when allowed): stack
+        # sampling interval, traceback depth kept per allocation and report length
+        self.web_profiling = os.getenv("PARCELIZER_WEB_PROFILING", "false").lower() == "true"
+        self.profile_sample_interval = float(os.getenv("PARCELIZER_PROFILE_SAMPLE_INTERVAL", "0.005"))
+        self.profile_traceback_frames = int(os.getenv("PARCELIZER_PROFILE_TRACEBACK_FRAMES", "1"))
+        self.profile_top = int(os.getenv("PARCELIZER_PROFILE_TOP", "20"))
     
     @property
     def output_dir(self) -> Path:
@@ -0,0 +1,230 @@
+"""Array-backed parcel geometry handling."""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely import GeometryType
+
+
+@dataclass(slots=True)
+class ParcelGeometry:
+    """Polygon or MultiPolygon stored as flat NumPy coordinate arrays.
+
+    All rings share one contiguous ``(N, 2)`` float64 array in GeoJSON
+    ``(lon, lat)`` order. ``ring_offsets`` and ``part_offsets`` follow the
+    GeoArrow layout: ring ``i`` is ``coords[ring_offsets[i]:ring_offsets[i + 1]]``
+    and polygon ``j`` owns rings ``part_offsets[j]:part_offsets[j + 1]``, the
+    first of which is its exterior ring and the rest its holes.
+    """
+    coords: np.ndarray
+    ring_offsets: np.ndarray
+    part_offsets: np.ndarray
+    geom_type: str = "Polygon"
+
+    @classmethod
+    def from_geojson(cls, geometry: Dict[str, Any]) -> Optional["ParcelGeometry"]:
+        """Build from a GeoJSON Polygon, MultiPolygon or GeometryCollection."""
+        polygons = _collect_polygons(geometry)
+        if not polygons:
+            return None
+
+        rings = []
+        ring_counts = []
+        for polygon in polygons:
+            polygon_rings = [_ring_array(ring) for ring in polygon if ring]
+            if polygon_rings:
+                rings.extend(polygon_rings)
+                ring_counts.append(len(polygon_rings))
+
+        if not rings:
+            return None
+
+        ring_offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+        np.cumsum([len(ring) for ring in rings], out=ring_offsets[1:])
+        part_offsets = np.zeros(len(ring_counts) + 1, dtype=np.int64)
+        np.cumsum(ring_counts, out=part_offsets[1:])
+
+        geom_type = "Polygon" if geometry.get("type") == "Polygon" else "MultiPolygon"
+        return cls(
+            coords=np.concatenate(rings),
+            ring_offsets=ring_offsets,
+            part_offsets=part_offsets,
+            geom_type=geom_type
+        )
+
+    @classmethod
+    def from_shapely(cls, geometry: shapely.Geometry) -> Optional["ParcelGeometry"]:
+        """Build from a shapely Polygon or MultiPolygon."""
+        if geometry is None or geometry.is_empty:
+            return None
+
+        geom_type, coords, offsets = shapely.to_ragged_array([geometry])
+        if geom_type == GeometryType.POLYGON:
+            ring_offsets, _ = offsets
+            part_offsets = np.array([0, len(ring_offsets) - 1], dtype=np.int64)
+            return cls(coords, ring_offsets.astype(np.int64), part_offsets, "Polygon")
+        if geom_type == GeometryType.MULTIPOLYGON:
+            ring_offsets, part_offsets, _ = offsets
+            return cls(coords, ring_offsets.astype(np.int64), part_offsets.astype(np.int64),
+                       "MultiPolygon")
+        return None
+
+    @property
+    def vertex_count(self) -> int:
+        """Total number of vertices across all rings."""
+        return len(self.coords)
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """All vertices as an ``(N, 2)`` array of ``(lat, lon)`` (a view, not a copy)."""
+        return self.coords[:, ::-1]
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """Bounding box as ``(min_lon, min_lat, max_lon, max_lat)``."""
+        min_lon, min_lat = self.coords.min(axis=0)
+        max_lon, max_lat = self.coords.max(axis=0)
+        return float(min_lon), float(min_lat), float(max_lon), float(max_lat)
+
+    @property
+    def ring_index(self) -> np.ndarray:
+        """Ring number of each vertex, counted within its polygon (0 = exterior)."""
+        ring_sizes = np.diff(self.ring_offsets)
+        part_of_ring = np.repeat(np.arange(len(self.part_offsets) - 1), np.diff(self.part_offsets))
+        ring_in_part = np.arange(len(ring_sizes)) - self.part_offsets[part_of_ring]
+        return np.repeat(ring_in_part, ring_sizes)
+
+    @property
+    def part_index(self) -> np.ndarray:
+        """Polygon number of each vertex."""
+        ring_sizes = np.diff(self.ring_offsets)
+        part_of_ring = np.repeat(np.arange(len(self.part_offsets) - 1), np.diff(self.part_offsets))
+        return np.repeat(part_of_ring, ring_sizes)
+
+    def to_geojson(self) -> Dict[str, Any]:
+        """Convert back to a GeoJSON geometry dict."""
+        polygons = []
+        for part in range(len(self.part_offsets) - 1):
+            first_ring, last_ring = self.part_offsets[part], self.part_offsets[part + 1]
+            polygons.append([
+                self.coords[self.ring_offsets[ring]:self.ring_offsets[ring + 1]].tolist()
+                for ring in range(first_ring, last_ring)
+            ])
+
+        if self.geom_type == "Polygon" and len(polygons) == 1:
+            return {"type": "Polygon", "coordinates": polygons[0]}
+        return {"type": "MultiPolygon", "coordinates": polygons}
+
+    def quantized(self, precision: int) -> "ParcelGeometry":
+        """Copy with coordinates rounded to ``precision`` decimal places."""
+        return ParcelGeometry(np.round(self.coords, precision), self.ring_offsets,
+                              self.part_offsets, self.geom_type)
+
+    def simplified(self, tolerance: float) -> "ParcelGeometry":
+        """Copy simplified with the given tolerance in degrees, keeping topology valid."""
+        if tolerance <= 0:
+            return self
+        simplified = ParcelGeometry.from_shapely(
+            shapely.simplify(self.to_shapely(), tolerance, preserve_topology=True)
+        )
+        if simplified is None:
+            return self
+        simplified.geom_type = self.geom_type
+        return simplified
+
+    def to_shapely(self) -> shapely.Geometry:
+        """Convert to a shapely geometry without going through GeoJSON."""
+        if self.geom_type == "Polygon" and len(self.part_offsets) == 2:
+            offsets = (self.ring_offsets, np.array([0, len(self.ring_offsets) - 1]))
+            return shapely.from_ragged_array(GeometryType.POLYGON, self.coords, offsets)[0]
+
+        offsets = (self.ring_offsets, self.part_offsets, np.array([0, len(self.part_offsets) - 1]))
+        return shapely.from_ragged_array(GeometryType.MULTIPOLYGON, self.coords, offsets)[0]
+
+
+def simplify_tolerance(zoom: int, pixels: float = 0.5) -> float:
+    """Simplification tolerance in degrees for a web-mercator zoom level.
+
+    At zoom ``z`` a 256px tile spans ``360 / 2**z`` degrees of longitude, so
+    ``pixels`` screen pixels is the largest error that stays invisible.
+    """
+    return pixels * 360.0 / (256 * 2 ** zoom)
+
+
+def total_bounds(geometries: List[ParcelGeometry]) -> Optional[Tuple[float, float, float, float]]:
+    """Combined ``(min_lon, min_lat, max_lon, max_lat)`` of several geometries."""
+    if not geometries:
+        return None
+
+    bounds = np.array([geometry.bounds for geometry in geometries])
+    min_lon, min_lat = bounds[:, :2].min(axis=0)
+    max_lon, max_lat = bounds[:, 2:].max(axis=0)
+    return float(min_lon), float(min_lat), float(max_lon), float(max_lat)
+
+
+def points_in_polygons(lons: np.ndarray, lats: np.ndarray,
+                       tree: shapely.STRtree) -> Tuple[np.ndarray, np.ndarray]:
+    """Match every point to a polygon of ``tree`` that contains it, in one vectorized query.
+
+    Returns the matched tree indices (ascending) and, per point, the position
+    of its polygon in that array or -1. A point on an edge shared by several
+    polygons goes to the one added to the tree first.
+    """
+    point_idx, tree_idx = tree.query(shapely.points(lons, lats), predicate="intersects")
+    first = np.full(len(lons), -1, dtype=np.int64)
+    # Assigning in reverse leaves each point with its lowest tree index
+    order = np.lexsort((tree_idx, point_idx))[::-1]
+    first[point_idx[order]] = tree_idx[order]
+
+    matched, positions = np.unique(first, return_inverse=True)
+    positions = positions.reshape(-1)
+    if len(matched) and matched[0] == -1:
+        return matched[1:], positions - 1
+    return matched, positions
+
+
+def point_clusters(lons: np.ndarray, lats: np.ndarray,
+                   cell_size: float) -> List[Tuple[Tuple[float, float, float, float], np.ndarray]]:
+    """Group points by grid cell; returns each cell's bbox of its points and their indices."""
+    if len(lons) == 0:
+        return []
+
+    cells = np.stack([np.floor(lons / cell_size), np.floor(lats / cell_size)], axis=1)
+    _, cell_ids = np.unique(cells, axis=0, return_inverse=True)
+    cell_ids = cell_ids.reshape(-1)
+    order = np.argsort(cell_ids, kind="stable")
+    groups = np.split(order, np.flatnonzero(np.diff(cell_ids[order])) + 1)
+    return [
+        ((float(lons[group].min()), float(lats[group].min()),
+          float(lons[group].max()), float(lats[group].max())), group)
+        for group in groups
+    ]
+
+
+def _ring_array(ring: List) -> np.ndarray:
+    """Convert one GeoJSON ring to an ``(n, 2)`` float64 array, dropping any Z/M values."""
+    try:
+        return np.asarray(ring, dtype=np.float64)[:, :2]
+    except ValueError:
+        # Positions with mixed dimensions cannot be converted in one shot
+        return np.asarray([position[:2] for position in ring], dtype=np.float64)
+
+
+def _collect_polygons(geometry: Optional[Dict[str, Any]]) -> List[List]:
+    """Return the polygon coordinate lists contained in a GeoJSON geometry."""
+    if not geometry:
+        return []
+
+    geom_type = geometry.get("type")
+    if geom_type == "Polygon":
+        return [geometry.get("coordinates") or []]
+    if geom_type == "MultiPolygon":
+        return list(geometry.get("coordinates") or [])
+    if geom_type == "GeometryCollection":
+        polygons = []
+        for member in geometry.get("geometries", []):
+            polygons.extend(_collect_polygons(member))
+        return polygons
+    return []
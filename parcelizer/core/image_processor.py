@@ -3,13 +3,14 @@
 import io
 import base64
 from pathlib import Path
-from typing import List, Union, BinaryIO
+from typing import Iterator, List, Union, BinaryIO
 
 from PIL import Image
-import pytesseract
+
+from .ocr_pool import OcrResult, get_ocr_pool
 
 try:
-    from pdf2image import convert_from_bytes
+    from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_bytes, pdfinfo_from_path
     PDF2IMAGE_AVAILABLE = True
 except ImportError:
     PDF2IMAGE_AVAILABLE = False
@@ -41,12 +42,73 @@ class ImageProcessor:
         else:
             return self._process_image(file_data)
     
+    def iter_uploaded_file(self, file: BinaryIO, filename: str) -> Iterator[Image.Image]:
+        """Like process_uploaded_file, but render PDF pages one at a time as they are consumed."""
+        file_extension = Path(filename).suffix.lower()
+        
+        if not self.is_supported_format(filename):
+            raise ValueError(f"Unsupported file format: {file_extension}")
+        
+        file_data = file.read()
+        
+        if file_extension != ".pdf":
+            yield from self._process_image(file_data)
+            return
+        _require_pdf2image()
+        
+        try:
+            # Some PDFs are just wrapped images
+            image = Image.open(io.BytesIO(file_data))
+        except Exception:
+            image = None
+        if image is not None:
+            yield image
+            return
+        
+        try:
+            pages = int(pdfinfo_from_bytes(file_data)["Pages"])
+        except Exception as e:
+            raise ValueError(f"Failed to process PDF: {e}")
+        for page in range(pages):
+            try:
+                image = convert_from_bytes(file_data, dpi=200, fmt='PNG',
+                                           first_page=page + 1, last_page=page + 1)[0]
+            except Exception as e:
+                raise ValueError(f"Failed to process PDF page {page + 1}: {e}")
+            yield image
+    
+    def iter_pages(self, file_path: Path) -> Iterator[Image.Image]:
+        """Render a file's pages one at a time as they are consumed."""
+        for page in range(self.page_count(file_path)):
+            yield self.load_page(file_path, page)
+    
+    def page_count(self, file_path: Path) -> int:
+        """Number of pages (images) a file yields."""
+        if file_path.suffix.lower() != ".pdf":
+            return 1
+        _require_pdf2image()
+        
+        try:
+            return int(pdfinfo_from_path(str(file_path))["Pages"])
+        except Exception as e:
+            raise ValueError(f"Failed to read PDF: {e}")
+    
+    def load_page(self, file_path: Path, page: int) -> Image.Image:
+        """Render a single page of a file (0-based) without rendering the others."""
+        if file_path.suffix.lower() != ".pdf":
+            with open(file_path, 'rb') as f:
+                return self._process_image(f.read())[0]
+        _require_pdf2image()
+        
+        try:
+            return convert_from_path(str(file_path), dpi=200, fmt='PNG',
+                                     first_page=page + 1, last_page=page + 1)[0]
+        except Exception as e:
+            raise ValueError(f"Failed to process PDF page {page + 1}: {e}")
+    
     def _process_pdf(self, pdf_data: bytes) -> List[Image.Image]:
         """Process PDF file and extract images from each page."""
-        if not PDF2IMAGE_AVAILABLE:
-            raise NotImplementedError(
-                "PDF processing requires pdf2image. Install with: pip install pdf2image"
-            )
+        _require_pdf2image()
         
         try:
             # First try to open as image (some PDFs are just wrapped images)
@@ -80,8 +142,12 @@ class ImageProcessor:
     
     def extract_text_with_ocr(self, image: Image.Image) -> str:
         """Extract text from image using OCR."""
+        return self.extract_ocr_batch([image])[0].text
+    
+    def extract_ocr_batch(self, images: List[Image.Image]) -> List[OcrResult]:
+        """OCR many images at once on the shared warm worker pool, with word boxes."""
         try:
-            return pytesseract.image_to_string(image)
+            return get_ocr_pool().recognize(images)
         except Exception as e:
             raise RuntimeError(f"OCR processing failed: {e}")
     
@@ -89,6 +155,11 @@ class ImageProcessor:
         """Save image to file."""
         image.save(output_path)
     
+    def crop_title_block(self, image: Image.Image) -> Image.Image:
+        """Crop the bottom-right region where plats and survey maps carry their title block."""
+        width, height = image.size
+        return image.crop((width // 2, height * 3 // 5, width, height))
+    
     def resize_image_for_api(self, image: Image.Image, max_size: int = 1024) -> Image.Image:
         """Resize image to fit within max_size while maintaining aspect ratio."""
         if max(image.size) <= max_size:
@@ -96,4 +167,10 @@ class ImageProcessor:
         
         ratio = max_size / max(image.size)
         new_size = tuple(int(dim * ratio) for dim in image.size)
-        return image.resize(new_size, Image.Resampling.LANCZOS) 
\ No newline at end of file
+        return image.resize(new_size, Image.Resampling.LANCZOS) 
+
+
+def _require_pdf2image() -> None:
+    """Raise ImportError when PDF rendering isn't available."""
+    if not PDF2IMAGE_AVAILABLE:
+        raise ImportError("PDF processing requires pdf2image. Install with: pip install pdf2image")
@@ -0,0 +1,107 @@
+"""Process-wide budget on the page image pixels held in memory at once."""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from .config import config
+
+
+class MemoryBudget:
+    """Caps the megapixels of page images alive across every run in the process.
+
+    Pages are charged before they are rendered and keep their charge until
+    the pipeline is done with them, so rendering pauses while later stages
+    fall behind. A page larger than the whole budget is admitted once nothing
+    else is held. Like the Regrid limiter it is shared by callers on different
+    threads and event loops (the web app runs one loop per request), so state
+    is guarded by a threading lock and waiters are resumed on their own loop.
+    """
+
+    def __init__(self, limit: float) -> None:
+        """Initialize the budget (``limit`` in megapixels)."""
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._used = 0.0
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future, float]] = deque()
+
+    @property
+    def used(self) -> float:
+        """Megapixels currently charged."""
+        return self._used
+
+    async def acquire(self, amount: float) -> None:
+        """Wait until ``amount`` megapixels fit in the budget, then charge them."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._fits(amount):
+                self._used += amount
+                return
+            future = loop.create_future()
+            waiter = (loop, future, amount)
+            self._waiters.append(waiter)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                    self._wake()  # Waiters queued behind this one may fit now
+                except ValueError:
+                    granted = True  # Charged just as we were cancelled
+            if granted:
+                self.release(amount)
+            raise
+
+    def adjust(self, delta: float) -> None:
+        """Change a held charge without waiting (a page turned out bigger or got smaller)."""
+        with self._lock:
+            self._used += delta
+            if self._used < 1e-9:
+                self._used = 0.0  # Don't let float residue keep an oversized page waiting
+            self._wake()
+
+    def release(self, amount: float) -> None:
+        """Return megapixels to the budget."""
+        self.adjust(-amount)
+
+    def _fits(self, amount: float) -> bool:
+        """Whether a charge can be made now (lock held)."""
+        return self._used + amount <= self.limit or self._used <= 0
+
+    def _wake(self) -> None:
+        """Admit waiters in order while they fit (lock held)."""
+        while self._waiters and self._fits(self._waiters[0][2]):
+            loop, future, amount = self._waiters.popleft()
+            self._used += amount
+            try:
+                loop.call_soon_threadsafe(_grant, future)
+            except RuntimeError:
+                self._used -= amount  # The waiter's loop has closed
+
+
+def _grant(future: asyncio.Future) -> None:
+    """Wake a waiter (runs on the waiter's loop)."""
+    if not future.done():
+        future.set_result(None)
+
+
+_budget: Optional[MemoryBudget] = None
+_budget_lock = threading.Lock()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """Return the process-wide page memory budget."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = MemoryBudget(config.max_inflight_megapixels)
+        return _budget
+
+
+def megapixels(size: Tuple[int, int]) -> float:
+    """Megapixels of an image of the given (width, height)."""
+    return size[0] * size[1] / 1_000_000
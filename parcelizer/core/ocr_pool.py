@@ -0,0 +1,178 @@
+"""Pool of warm OCR workers."""
+
+import atexit
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+import pytesseract
+
+from .config import config
+
+try:
+    from tesserocr import PyTessBaseAPI, RIL, iterate_level
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# RAM-backed scratch space for the CLI fallback where the platform has one
+_SCRATCH_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+@dataclass(slots=True)
+class OcrWord:
+    """A recognized word and its bounding box in image pixels."""
+    text: str
+    confidence: float
+    bbox: Tuple[int, int, int, int]  # (left, top, right, bottom)
+
+
+@dataclass(slots=True)
+class OcrResult:
+    """OCR output for one image."""
+    text: str
+    words: List[OcrWord] = field(default_factory=list)
+
+
+class OcrPool:
+    """Runs OCR on batches of images with tesseract kept loaded between calls.
+
+    With tesserocr installed (the ``ocr`` extra), each worker thread owns a
+    long-lived ``PyTessBaseAPI`` (language model loaded once per thread);
+    images are handed over in memory and tesserocr releases the GIL while
+    recognizing.
+    Without it, each batch of images goes to a single ``tesseract`` process
+    through a file list on RAM-backed scratch space, so process start-up and
+    model loading are paid once per batch instead of once per page.
+    """
+
+    def __init__(self, workers: Optional[int] = None, lang: Optional[str] = None,
+                 batch_size: Optional[int] = None) -> None:
+        """Start the worker threads."""
+        self.workers = workers or config.ocr_workers
+        self.lang = lang or config.ocr_lang
+        self.batch_size = batch_size or config.ocr_batch_size
+        self.backend = "tesserocr" if TESSEROCR_AVAILABLE else "tesseract-cli"
+
+        self._local = threading.local()
+        self._apis = []
+        self._apis_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+
+    def recognize(self, images: List[Image.Image]) -> List[OcrResult]:
+        """OCR a list of images, returning text and word boxes for each in order."""
+        if self.backend == "tesserocr":
+            futures = [self._executor.submit(self._recognize_tesserocr, image) for image in images]
+            return [future.result() for future in futures]
+
+        batches = [images[i:i + self.batch_size] for i in range(0, len(images), self.batch_size)]
+        futures = [self._executor.submit(self._recognize_cli_batch, batch) for batch in batches]
+        return [result for future in futures for result in future.result()]
+
+    def close(self) -> None:
+        """Stop the workers and release the tesseract instances."""
+        self._executor.shutdown(wait=True)
+        with self._apis_lock:
+            for api in self._apis:
+                api.End()
+            self._apis = []
+
+    def _api(self) -> "PyTessBaseAPI":
+        """This worker thread's tesseract instance, created on first use."""
+        api = getattr(self._local, "api", None)
+        if api is None:
+            api = PyTessBaseAPI(lang=self.lang)
+            self._local.api = api
+            with self._apis_lock:
+                self._apis.append(api)
+        return api
+
+    def _recognize_tesserocr(self, image: Image.Image) -> OcrResult:
+        """OCR one image with the thread's warm tesserocr instance."""
+        api = self._api()
+        api.SetImage(image)
+        api.Recognize()
+        text = api.GetUTF8Text()
+
+        words = []
+        for word in iterate_level(api.GetIterator(), RIL.WORD):
+            word_text = word.GetUTF8Text(RIL.WORD)
+            if word_text:
+                words.append(OcrWord(word_text, word.Confidence(RIL.WORD), word.BoundingBox(RIL.WORD)))
+        api.Clear()
+        return OcrResult(text=text, words=words)
+
+    def _recognize_cli_batch(self, images: List[Image.Image]) -> List[OcrResult]:
+        """OCR a batch of images with one tesseract process and TSV output."""
+        with tempfile.TemporaryDirectory(dir=_SCRATCH_DIR, prefix="parcelizer-ocr-") as scratch:
+            paths = []
+            for index, image in enumerate(images):
+                path = Path(scratch) / f"{index:05d}.png"
+                image.save(path, format="PNG", compress_level=1)
+                paths.append(str(path))
+
+            list_path = Path(scratch) / "images.txt"
+            list_path.write_text("\n".join(paths) + "\n")
+
+            completed = subprocess.run(
+                [pytesseract.pytesseract.tesseract_cmd, str(list_path), "stdout", "-l", self.lang, "tsv"],
+                capture_output=True, text=True, check=False
+            )
+            if completed.returncode != 0:
+                raise RuntimeError(completed.stderr.strip() or f"tesseract exited with {completed.returncode}")
+
+        return _parse_tsv(completed.stdout, len(images))
+
+
+def _parse_tsv(tsv: str, page_count: int) -> List[OcrResult]:
+    """Split tesseract TSV output into per-page text and word boxes."""
+    pages: List[Dict[Tuple[int, int, int], List[OcrWord]]] = [{} for _ in range(page_count)]
+
+    for line in tsv.splitlines()[1:]:
+        columns = line.split("\t")
+        if len(columns) < 12 or columns[0] != "5":  # level 5 rows are words
+            continue
+        text = columns[11].strip()
+        if not text:
+            continue
+        page = int(columns[1]) - 1
+        if not 0 <= page < page_count:
+            continue
+
+        left, top, width, height = (int(value) for value in columns[6:10])
+        line_key = (int(columns[2]), int(columns[3]), int(columns[4]))  # block, paragraph, line
+        word = OcrWord(text, float(columns[10]), (left, top, left + width, top + height))
+        pages[page].setdefault(line_key, []).append(word)
+
+    results = []
+    for lines in pages:
+        text_lines = []
+        previous_paragraph = None
+        for (block, paragraph, _), words in lines.items():
+            if previous_paragraph is not None and (block, paragraph) != previous_paragraph:
+                text_lines.append("")
+            text_lines.append(" ".join(word.text for word in words))
+            previous_paragraph = (block, paragraph)
+        words = [word for line_words in lines.values() for word in line_words]
+        results.append(OcrResult(text="\n".join(text_lines), words=words))
+    return results
+
+
+_pool: Optional[OcrPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> OcrPool:
+    """Return the process-wide OCR pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OcrPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,403 @@
+"""Output sinks for writing parcel boundaries produced by a pipeline run."""
+
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .config import config
+from .regrid_client import ParcelBoundary
+from .serialization import dump_to_file
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+OUTPUT_FORMATS = ("files", "geoparquet", "flatgeobuf")
+
+GEOPARQUET_INSTALL_HINT = "GeoParquet output requires pyarrow. Install with: pip install 'parcelizer[geoparquet]'"
+
+PROPERTY_FIELDS = ("parcel_id", "apn", "address", "county", "state")
+
+
+def boundary_properties(boundary: ParcelBoundary) -> Dict[str, Any]:
+    """Return the exported properties of a parcel boundary."""
+    return {field: getattr(boundary, field) for field in PROPERTY_FIELDS}
+
+
+def temporary_path(path: Path) -> Path:
+    """A hidden sibling of ``path`` to write to before renaming it into place."""
+    path = Path(path)
+    return path.parent / f".{path.stem}.{os.getpid()}-{threading.get_ident()}.tmp{path.suffix}"
+
+
+@contextmanager
+def atomic_output(path: Path) -> Iterator[Path]:
+    """Yield a temporary path next to ``path`` and rename it into place once written.
+
+    Readers (and a crash) never see a half-written file: ``path`` either
+    doesn't exist yet or is complete.
+    """
+    tmp_path = temporary_path(path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_geojson(boundary: ParcelBoundary, output_path: Path, pretty: Optional[bool] = None) -> None:
+    """Write a parcel boundary as a GeoJSON Feature file (compact unless ``pretty``, default from config)."""
+    if not boundary.geometry:
+        raise ValueError("No geometry data to save")
+
+    geojson = {
+        "type": "Feature",
+        "geometry": boundary.geometry,
+        "properties": boundary_properties(boundary)
+    }
+
+    with atomic_output(output_path) as tmp_path:
+        dump_to_file(geojson, tmp_path, indent=config.pretty_json if pretty is None else pretty)
+
+
+def write_vertices_csv(boundary: ParcelBoundary, output_path: Path) -> None:
+    """Write parcel vertices as a CSV file with header lat,lon,part,ring.
+
+    ``part`` is the polygon number within a MultiPolygon and ``ring`` is 0 for
+    the exterior ring and 1.. for holes. Rows are formatted column-wise with
+    NumPy string operations and written in a single call.
+    """
+    if not boundary.shape or not boundary.shape.vertex_count:
+        raise ValueError("No vertices data to save")
+
+    vertices = boundary.shape.vertices
+    columns = [
+        vertices[:, 0].astype(str),
+        vertices[:, 1].astype(str),
+        boundary.shape.part_index.astype(str),
+        boundary.shape.ring_index.astype(str)
+    ]
+    rows = columns[0]
+    for column in columns[1:]:
+        rows = np.char.add(np.char.add(rows, ","), column)
+
+    with atomic_output(output_path) as tmp_path, open(tmp_path, 'w') as f:
+        f.write("lat,lon,part,ring\n" + "\n".join(rows.tolist()) + "\n")
+
+
+class OutputSink:
+    """Destination for the parcel boundaries found during a run."""
+
+    def __init__(self, output_dir: Path) -> None:
+        """Initialize the sink."""
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.count = 0
+
+    def write(self, boundary: ParcelBoundary, name: str) -> None:
+        """Write one parcel boundary under a file-safe name."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Flush any buffered records."""
+
+    def close(self) -> None:
+        """Flush and release the sink."""
+        self.flush()
+
+    def describe(self) -> str:
+        """Short human-readable description of what was written."""
+        raise NotImplementedError
+
+
+class PerFileSink(OutputSink):
+    """Writes one GeoJSON file and one vertices CSV per parcel."""
+
+    def write(self, boundary: ParcelBoundary, name: str) -> None:
+        """Write the GeoJSON and vertices CSV for a parcel."""
+        write_geojson(boundary, self.output_dir / f"{name}.geojson")
+        write_vertices_csv(boundary, self.output_dir / f"{name}_vertices.csv")
+        self.count += 1
+
+    def describe(self) -> str:
+        """Describe the written files."""
+        return f"{self.count} parcel(s) as .geojson/_vertices.csv pairs in {self.output_dir}"
+
+
+class BufferedSink(OutputSink):
+    """Base class for sinks that collect all parcels of a run into one file."""
+
+    extension = ""
+
+    def __init__(self, output_dir: Path, run_name: str, batch_size: int = 1000) -> None:
+        """Initialize the buffered sink."""
+        super().__init__(output_dir)
+        self.path = self.output_dir / f"{run_name}{self.extension}"
+        self.batch_size = batch_size
+        self._pending: List[Dict[str, Any]] = []
+
+    def write(self, boundary: ParcelBoundary, name: str) -> None:
+        """Buffer a parcel record, flushing once a full batch is collected."""
+        if not boundary.shape:
+            raise ValueError("No geometry data to save")
+
+        record = boundary_properties(boundary)
+        record["geometry"] = boundary.shape.to_shapely()
+        self._pending.append(record)
+        self.count += 1
+
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending batch."""
+        if self._pending:
+            self._write_batch(self._pending)
+            self._pending = []
+
+    def _write_batch(self, records: List[Dict[str, Any]]) -> None:
+        """Write a batch of records."""
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        """Describe the consolidated output file."""
+        return f"{self.count} parcel(s) in {self.path}"
+
+
+class GeoParquetSink(BufferedSink):
+    """Appends parcels to a single GeoParquet file, one row group per batch.
+
+    Each row carries a ``bbox`` covering column (GeoParquet 1.1) so readers can
+    prune row groups by their bounding-box statistics. Row groups go to a
+    temporary file that replaces ``path`` once the footer is written.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, output_dir: Path, run_name: str, batch_size: int = 1000) -> None:
+        """Initialize the GeoParquet sink."""
+        if not PYARROW_AVAILABLE:
+            raise ImportError(GEOPARQUET_INSTALL_HINT)
+        super().__init__(output_dir, run_name, batch_size)
+        self._writer = None
+        self._tmp_path = temporary_path(self.path)
+
+    def _schema(self) -> "pa.Schema":
+        """Arrow schema with GeoParquet metadata."""
+        bbox_type = pa.struct([
+            ("xmin", pa.float64()),
+            ("ymin", pa.float64()),
+            ("xmax", pa.float64()),
+            ("ymax", pa.float64())
+        ])
+        fields = [pa.field(name, pa.string()) for name in PROPERTY_FIELDS]
+        fields.append(pa.field("geometry", pa.binary()))
+        fields.append(pa.field("bbox", bbox_type))
+
+        geo_metadata = {
+            "version": "1.1.0",
+            "primary_column": "geometry",
+            "columns": {
+                "geometry": {
+                    "encoding": "WKB",
+                    "geometry_types": ["Polygon", "MultiPolygon"],
+                    # "crs" is omitted: Regrid returns OGC:CRS84 lon/lat
+                    "covering": {
+                        "bbox": {
+                            "xmin": ["bbox", "xmin"],
+                            "ymin": ["bbox", "ymin"],
+                            "xmax": ["bbox", "xmax"],
+                            "ymax": ["bbox", "ymax"]
+                        }
+                    }
+                }
+            }
+        }
+        return pa.schema(fields, metadata={"geo": json.dumps(geo_metadata)})
+
+    def _write_batch(self, records: List[Dict[str, Any]]) -> None:
+        """Append a batch of records as a row group."""
+        schema = self._schema()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._tmp_path, schema)
+
+        columns = {name: [record[name] for record in records] for name in PROPERTY_FIELDS}
+        geometries = [record["geometry"] for record in records]
+        columns["geometry"] = [geometry.wkb for geometry in geometries]
+        columns["bbox"] = [
+            dict(zip(("xmin", "ymin", "xmax", "ymax"), geometry.bounds))
+            for geometry in geometries
+        ]
+
+        table = pa.Table.from_pydict(columns, schema=schema)
+        self._writer.write_table(table, row_group_size=len(records))
+
+    def close(self) -> None:
+        """Flush the final batch and write the Parquet footer."""
+        try:
+            super().close()
+            if self._writer is not None:
+                self._writer.close()
+                os.replace(self._tmp_path, self.path)
+        except BaseException:
+            self._tmp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            self._writer = None
+
+
+class FlatGeobufSink(BufferedSink):
+    """Collects parcels into a single FlatGeobuf file with a packed spatial index.
+
+    FlatGeobuf's Hilbert R-tree is built over the whole file, so batches are kept
+    as compact shapely geometries and the file is written once on ``close()``.
+    """
+
+    extension = ".fgb"
+
+    def __init__(self, output_dir: Path, run_name: str, batch_size: int = 1000) -> None:
+        """Initialize the FlatGeobuf sink."""
+        super().__init__(output_dir, run_name, batch_size)
+        self._records: List[Dict[str, Any]] = []
+
+    def _write_batch(self, records: List[Dict[str, Any]]) -> None:
+        """Move a batch into the collected records."""
+        self._records.extend(records)
+
+    def close(self) -> None:
+        """Write all collected parcels with a spatial index."""
+        super().close()
+        if not self._records:
+            return
+
+        import geopandas as gpd
+
+        frame = gpd.GeoDataFrame(self._records, geometry="geometry", crs="EPSG:4326")
+        with atomic_output(self.path) as tmp_path:
+            frame.to_file(tmp_path, driver="FlatGeobuf", SPATIAL_INDEX="YES")
+        self._records = []
+
+
+class BackgroundSink(OutputSink):
+    """Hands parcels to a writer thread so disk latency never blocks the event loop.
+
+    ``write`` only queues the parcel; a dedicated thread feeds the queue into
+    the wrapped sink, which batches and renames files into place as usual.
+    ``flush`` and ``close`` wait until everything queued so far is on disk and
+    raise the first error the thread hit.
+    """
+
+    def __init__(self, sink: OutputSink) -> None:
+        """Wrap a sink and start its writer thread."""
+        super().__init__(sink.output_dir)
+        self.sink = sink
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._failures = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="parcelizer-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, boundary: ParcelBoundary, name: str) -> None:
+        """Queue a parcel for writing."""
+        if self._closed:
+            raise RuntimeError("Output sink is closed")
+        self._queue.put((boundary, name))
+        self.count += 1
+
+    def flush(self) -> None:
+        """Wait until every queued parcel has been written and flushed."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Write everything queued, close the wrapped sink and stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def describe(self) -> str:
+        """Describe what the wrapped sink wrote."""
+        return self.sink.describe()
+
+    def _run(self) -> None:
+        """Writer thread: apply queued writes, flushes and the final close in order."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                # The thread must end even when closing fails, or close() never returns
+                try:
+                    self.sink.close()
+                except Exception as e:
+                    self._record_error(e)
+                finally:
+                    return
+            try:
+                if isinstance(item, threading.Event):
+                    self.sink.flush()
+                else:
+                    self.sink.write(*item)
+            except Exception as e:
+                self._record_error(e)
+            finally:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _record_error(self, error: Exception) -> None:
+        """Keep the first error for the caller; later ones are only counted."""
+        self._failures += 1
+        if self._error is None:
+            self._error = error
+
+    def _raise_error(self) -> None:
+        """Re-raise the first write error in the caller's thread."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            failures, self._failures = self._failures, 0
+            more = f" (and {failures - 1} more error(s))" if failures > 1 else ""
+            raise RuntimeError(f"Writing output to {self.output_dir} failed: {error}{more}") from error
+
+
+def create_sink(output_format: str, output_dir: Path, run_name: Optional[str] = None,
+                batch_size: int = 1000, background: bool = False) -> OutputSink:
+    """Create an output sink for the given format, optionally written from a background thread."""
+    sink = _create_format_sink(output_format, output_dir, run_name, batch_size)
+    return BackgroundSink(sink) if background else sink
+
+
+def _create_format_sink(output_format: str, output_dir: Path, run_name: Optional[str],
+                        batch_size: int) -> OutputSink:
+    """Create the sink that writes a given format."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unsupported output format: {output_format} (expected one of {', '.join(OUTPUT_FORMATS)})"
+        )
+
+    if output_format == "files":
+        return PerFileSink(output_dir)
+
+    if run_name is None:
+        run_name = f"parcels-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+
+    if output_format == "geoparquet":
+        return GeoParquetSink(output_dir, run_name, batch_size)
+    return FlatGeobufSink(output_dir, run_name, batch_size)
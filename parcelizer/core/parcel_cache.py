@@ -0,0 +1,204 @@
+"""Local cache of parcel boundaries already fetched from Regrid."""
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import shapely
+
+from .apn import address_key, apn_key, normalize_county, normalize_state
+from .geometry import points_in_polygons
+
+if TYPE_CHECKING:
+    from .regrid_client import ParcelBoundary
+
+# Parcels added since the STRtree was built are scanned linearly until this many
+# changes have piled up, so interleaved adds and lookups don't rebuild it each time
+_UNINDEXED_LIMIT = 256
+
+
+class ParcelCache:
+    """Thread-safe LRU cache of parcel boundaries indexed by APN, address and location.
+
+    The spatial index is a shapely STRtree, which is immutable: parcels added
+    since it was built are kept in a short list that point lookups scan, and
+    the tree is rebuilt once that list is long. Areas fetched in
+    full are remembered (at most ``max_covered``, oldest dropped first) until
+    one of their parcels is evicted.
+    """
+
+    def __init__(self, max_parcels: int = 10000, max_covered: int = 256) -> None:
+        """Initialize an empty cache."""
+        self.max_parcels = max_parcels
+        self.max_covered = max_covered
+        self._lock = threading.Lock()
+        self._parcels: "OrderedDict[str, ParcelBoundary]" = OrderedDict()
+        self._by_apn: Dict[str, Set[str]] = {}
+        self._by_address: Dict[str, Set[str]] = {}
+        self._tree: Optional[shapely.STRtree] = None
+        self._tree_parcels: List["ParcelBoundary"] = []
+        self._unindexed: List[Tuple["ParcelBoundary", shapely.Geometry]] = []
+        self._tree_changes = 0  # parcels added or removed since the tree was built
+        self._covered: List[Tuple[float, float, float, float]] = []
+
+    def __len__(self) -> int:
+        """Number of cached parcels."""
+        return len(self._parcels)
+
+    def add(self, boundary: "ParcelBoundary") -> None:
+        """Add or refresh a parcel."""
+        with self._lock:
+            parcel_id = boundary.parcel_id
+            previous = self._parcels.pop(parcel_id, None)
+            if previous is not None:
+                self._unindex(parcel_id, previous)
+            self._parcels[parcel_id] = boundary
+            self._index(parcel_id, boundary)
+
+            while len(self._parcels) > self.max_parcels:
+                oldest_id, oldest = self._parcels.popitem(last=False)
+                self._unindex(oldest_id, oldest)
+                self._uncover(oldest)
+
+    def find_apn(self, candidates: List[str], county: Optional[str] = None,
+                 state: Optional[str] = None) -> Optional["ParcelBoundary"]:
+        """Return the cached parcel matching the highest-ranked APN candidate.
+
+        APNs are only unique within a county, so a candidate matching several
+        cached parcels (say, in different states when no state is given) is
+        ambiguous and returns None, leaving the lookup to Regrid.
+        """
+        state = normalize_state(state)
+        county = normalize_county(county)
+
+        with self._lock:
+            for candidate in candidates:
+                matches = []
+                for parcel_id in self._by_apn.get(apn_key(candidate), ()):
+                    boundary = self._parcels[parcel_id]
+                    if state and boundary.state and normalize_state(boundary.state) != state:
+                        continue
+                    if county and boundary.county and normalize_county(boundary.county) != county:
+                        continue
+                    matches.append(parcel_id)
+                if len(matches) > 1:
+                    return None
+                if matches:
+                    self._parcels.move_to_end(matches[0])
+                    return self._parcels[matches[0]]
+        return None
+
+    def find_address(self, address: str, county: Optional[str] = None,
+                     state: Optional[str] = None) -> Optional["ParcelBoundary"]:
+        """Return a cached parcel with the same (normalized) address."""
+        state = normalize_state(state)
+        county = normalize_county(county)
+
+        with self._lock:
+            for parcel_id in self._by_address.get(address_key(address), ()):
+                boundary = self._parcels[parcel_id]
+                if state and boundary.state and normalize_state(boundary.state) != state:
+                    continue
+                if county and boundary.county and normalize_county(boundary.county) != county:
+                    continue
+                self._parcels.move_to_end(parcel_id)
+                return boundary
+        return None
+
+    def find_point(self, lat: float, lon: float) -> Optional["ParcelBoundary"]:
+        """Return the cached parcel containing a point."""
+        point = shapely.Point(lon, lat)
+        with self._lock:
+            tree = self._spatial_index()
+            candidates = [self._tree_parcels[i] for i in tree.query(point, predicate="intersects")] if tree else []
+            candidates += [boundary for boundary, geometry in self._unindexed if geometry.intersects(point)]
+            for boundary in candidates:
+                # The tree and the unindexed list may hold evicted or replaced parcels
+                if self._parcels.get(boundary.parcel_id) is boundary:
+                    self._parcels.move_to_end(boundary.parcel_id)
+                    return boundary
+        return None
+
+    def find_points(self, lons: np.ndarray, lats: np.ndarray) -> Tuple[np.ndarray, List["ParcelBoundary"]]:
+        """Vectorized find_point: per point, the index of its parcel in the returned list or -1."""
+        with self._lock:
+            # A bulk query is worth an up-to-date tree
+            tree = self._spatial_index(complete=True)
+            if tree is None:
+                return np.full(len(lons), -1, dtype=np.int64), []
+            matched, positions = points_in_polygons(lons, lats, tree)
+            parcels = [self._tree_parcels[i] for i in matched]
+            for boundary in parcels:
+                self._parcels.move_to_end(boundary.parcel_id)
+            return positions, parcels
+
+    def mark_covered(self, bbox: Tuple[float, float, float, float]) -> None:
+        """Record that every parcel in ``bbox`` (min_lon, min_lat, max_lon, max_lat) was fetched."""
+        with self._lock:
+            self._covered.append(bbox)
+            if len(self._covered) > self.max_covered:
+                del self._covered[:len(self._covered) - self.max_covered]
+
+    def is_covered(self, bbox: Tuple[float, float, float, float]) -> bool:
+        """Whether ``bbox`` lies inside an area that was already fully fetched."""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        with self._lock:
+            return any(
+                c[0] <= min_lon and c[1] <= min_lat and c[2] >= max_lon and c[3] >= max_lat
+                for c in self._covered
+            )
+
+    def _spatial_index(self, complete: bool = False) -> Optional[shapely.STRtree]:
+        """Return the STRtree over cached parcels, rebuilding it once enough has changed.
+
+        Unless ``complete`` is set, parcels added since the last build are
+        only in the unindexed list (lock held).
+        """
+        if self._tree_changes > (0 if complete else _UNINDEXED_LIMIT) or (
+                self._tree is None and self._unindexed):
+            self._tree_parcels = [boundary for boundary in self._parcels.values() if boundary.shape]
+            self._tree = shapely.STRtree(
+                [boundary.shape.to_shapely() for boundary in self._tree_parcels]
+            ) if self._tree_parcels else None
+            self._unindexed = []
+            self._tree_changes = 0
+        return self._tree
+
+    def _uncover(self, boundary: "ParcelBoundary") -> None:
+        """Forget the fully fetched areas an evicted parcel was part of (lock held)."""
+        if not self._covered or not boundary.shape:
+            return
+        min_lon, min_lat, max_lon, max_lat = boundary.shape.bounds
+        self._covered = [
+            c for c in self._covered
+            if c[0] > max_lon or c[2] < min_lon or c[1] > max_lat or c[3] < min_lat
+        ]
+
+    def _index(self, parcel_id: str, boundary: "ParcelBoundary") -> None:
+        """Add a parcel to the secondary indexes."""
+        key = apn_key(boundary.apn)
+        if key:
+            self._by_apn.setdefault(key, set()).add(parcel_id)
+        if boundary.address:
+            self._by_address.setdefault(address_key(boundary.address), set()).add(parcel_id)
+        if boundary.shape:
+            self._tree_changes += 1
+            if self._tree_changes > _UNINDEXED_LIMIT:
+                # The next spatial query rebuilds the tree anyway
+                self._tree = None
+                self._unindexed = []
+            else:
+                self._unindexed.append((boundary, boundary.shape.to_shapely()))
+
+    def _unindex(self, parcel_id: str, boundary: "ParcelBoundary") -> None:
+        """Remove a parcel from the secondary indexes."""
+        for index, key in ((self._by_apn, apn_key(boundary.apn)),
+                           (self._by_address, address_key(boundary.address))):
+            parcel_ids = index.get(key)
+            if parcel_ids is not None:
+                parcel_ids.discard(parcel_id)
+                if not parcel_ids:
+                    del index[key]
+        if boundary.shape:
+            self._tree_changes += 1
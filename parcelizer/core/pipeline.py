@@ -2,123 +2,339 @@
 
 import asyncio
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional
 from dataclasses import dataclass
 
 from PIL import Image
 
 from .config import config
-from .vision_extractor import VisionExtractor, ParcelInfo
+from .vision_extractor import (
+    VisionExtractor, ParcelInfo, TokenBudget, dedupe_parcels, merge_parcel_info, parcel_key,
+    parse_coordinates
+)
 from .regrid_client import RegridClient, ParcelBoundary
+from .rate_control import RegridServiceError
 from .image_processor import ImageProcessor
+from .output_sink import OutputSink, create_sink
+from .geometry import simplify_tolerance, total_bounds
+from .memory_budget import MemoryBudget, get_memory_budget, megapixels
+from .profiling import profile_stage
 
 
-@dataclass
+@dataclass(slots=True)
 class ParcelResult:
     """Complete parcel processing result."""
     vision_info: ParcelInfo
     boundary: Optional[ParcelBoundary] = None
     success: bool = False
     error: Optional[str] = None
+    status: str = "not_found"  # found, not_found, throttled, unavailable or error
+    
+    @property
+    def retryable(self) -> bool:
+        """Whether the lookup failed because Regrid couldn't answer, not because there's no match."""
+        return self.status in ("throttled", "unavailable")
 
 
 class ParcelPipeline:
     """Complete pipeline for parcel processing."""
     
-    def __init__(self, demo_mode: bool = False) -> None:
+    def __init__(self, demo_mode: bool = False, output_format: Optional[str] = None,
+                 output_dir: Optional[Path] = None) -> None:
         """Initialize the pipeline."""
         self.vision_extractor = VisionExtractor()
         self.regrid_client = RegridClient(demo_mode=demo_mode)
         self.image_processor = ImageProcessor()
         self.demo_mode = demo_mode
+        self.output_format = output_format or config.output_format
+        self.output_dir = output_dir or config.output_dir
         
         # Ensure output directory exists
-        config.ensure_output_dir()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Default sink for this pipeline's run, created on first use; callers
+        # that pass a per-run sink (web uploads, queue workers) never open it
+        self._sink: Optional[OutputSink] = None
+    
+    @property
+    def sink(self) -> OutputSink:
+        """The pipeline's default output sink."""
+        if self._sink is None:
+            self._sink = self.create_sink()
+        return self._sink
     
-    async def process_images(self, images: List[Image.Image]) -> List[ParcelResult]:
-        """Process images through the complete pipeline."""
-        results = []
+    def create_sink(self, run_name: Optional[str] = None) -> OutputSink:
+        """Create an output sink using the pipeline's output settings."""
+        return create_sink(self.output_format, self.output_dir, run_name,
+                           batch_size=config.output_batch_size, background=config.background_writes)
+    
+    async def process_images(self, images: Iterable[Image.Image],
+                             sink: Optional[OutputSink] = None) -> List[ParcelResult]:
+        """Process images through the complete pipeline.
         
-        # Step 1: Extract parcel information using vision
-        print("Extracting parcel information using OpenAI Vision...")
-        vision_results = await self.vision_extractor.extract_from_images(images)
+        Pages stream through render, encode, vision and lookup stages joined by
+        bounded queues, so a stage that falls behind pauses the ones before it,
+        and the process-wide memory budget caps the page pixels held at once.
+        ``images`` may be a lazy iterator (see ``ImageProcessor.iter_pages``);
+        a page's full render is dropped as soon as it has been encoded.
         
-        # Step 2: Look up each parcel in Regrid API
+        Each page may yield several parcels. Parcels repeated across pages are
+        looked up once, when first seen; later sightings fill in the reported
+        fields. APNs are fetched with batched queries as pages arrive and the
+        per-parcel lookups run concurrently.
+        """
+        sink = sink or self.sink
+        memory = get_memory_budget()
+        budget = TokenBudget(config.vision_token_budget)
+        prefetched: List[str] = []  # parcels this run has prefetched the neighbours of
+        held: Dict[int, float] = {}  # megapixels charged to each page still in flight
+        
+        rendered: asyncio.Queue = asyncio.Queue(config.stage_queue_size)
+        encoded: asyncio.Queue = asyncio.Queue(config.stage_queue_size)
+        extracted: asyncio.Queue = asyncio.Queue(config.stage_queue_size)
+        encode_workers = max(1, config.encode_concurrency)
+        vision_workers = max(1, config.vision_concurrency)
+        
+        print("Extracting parcel information using OpenAI Vision...")
         print("Looking up parcel boundaries in Regrid API...")
-        for i, vision_info in enumerate(vision_results):
-            print(f"Processing result {i + 1}/{len(vision_results)}...")
+        lookup = asyncio.create_task(self._lookup_stage(extracted, vision_workers, prefetched))
+        stages = [
+            asyncio.create_task(self._render_stage(iter(images), rendered, memory, held, encode_workers)),
+            asyncio.create_task(self._encode_stage(rendered, encoded, memory, held, encode_workers, vision_workers)),
+            *(asyncio.create_task(self._vision_stage(encoded, extracted, memory, held, budget))
+              for _ in range(vision_workers)),
+            lookup
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            memory.release(sum(held.values()))
+        
+        results = lookup.result()
+        print(f"Vision: {budget.calls} call(s), {budget.total_tokens} tokens")
+        
+        # Save output files in input order
+        with profile_stage("write"):
+            for i, result in enumerate(results):
+                if result.success:
+                    parcel_id = result.boundary.apn or result.boundary.parcel_id or f"parcel_{i + 1}"
+                    sink.write(result.boundary, self._clean_filename(parcel_id))
+        
+        return results
+    
+    async def _render_stage(self, pages: Iterator[Image.Image], rendered: asyncio.Queue,
+                            memory: MemoryBudget, held: Dict[int, float], consumers: int) -> None:
+        """Render pages one at a time, each only once the memory budget has room for it."""
+        # Pages of one file are usually the same size, so the last page is the next estimate
+        estimate = config.page_megapixels_estimate
+        index = 0
+        while True:
+            await memory.acquire(estimate)
+            held[index] = estimate
+            with profile_stage("render"):
+                image = await asyncio.to_thread(next, pages, None)
+            if image is None:
+                memory.release(held.pop(index))
+                break
             
+            estimate = megapixels(image.size)
+            memory.adjust(estimate - held[index])
+            held[index] = estimate
+            await rendered.put((index, image))
+            del image  # Don't hold the page while waiting for room for the next one
+            index += 1
+        for _ in range(consumers):
+            await rendered.put(None)
+    
+    async def _encode_stage(self, rendered: asyncio.Queue, encoded: asyncio.Queue,
+                            memory: MemoryBudget, held: Dict[int, float], workers: int,
+                            consumers: int) -> None:
+        """Reduce each page to what the vision ladder sends and drop the full render."""
+        async def encode_pages() -> None:
+            while True:
+                item = await rendered.get()
+                if item is None:
+                    break
+                index, image = item
+                with profile_stage("encode"):
+                    page = await asyncio.to_thread(self.vision_extractor.prepare_page, image, index)
+                del item, image
+                
+                memory.adjust(page.megapixels - held[index])
+                held[index] = page.megapixels
+                await encoded.put(page)
+                del page
+        
+        # Resizing and PNG encoding release the GIL, so several pages encode in parallel
+        await asyncio.gather(*(encode_pages() for _ in range(workers)))
+        for _ in range(consumers):
+            await encoded.put(None)
+    
+    async def _vision_stage(self, encoded: asyncio.Queue, extracted: asyncio.Queue,
+                            memory: MemoryBudget, held: Dict[int, float], budget: TokenBudget) -> None:
+        """Extract parcels from prepared pages; one of several concurrent workers."""
+        while True:
+            page = await encoded.get()
+            if page is None:
+                break
+            with profile_stage("vision"):
+                parcels = await self.vision_extractor.extract_from_prepared(page, budget)
+            memory.release(held.pop(page.page_index))
+            index = page.page_index
+            del page
+            await extracted.put((index, parcels))
+        await extracted.put(None)
+    
+    async def _lookup_stage(self, extracted: asyncio.Queue, producers: int,
+                            prefetched: List[str]) -> List[ParcelResult]:
+        """Look up parcels as their pages arrive, in page order; returns results in that order."""
+        semaphore = asyncio.Semaphore(config.lookup_concurrency)
+        entries: Dict[Hashable, List[Any]] = {}  # parcel key -> [merged ParcelInfo, lookup task]
+        arrived: Dict[int, List[ParcelInfo]] = {}  # pages that finished ahead of an earlier one
+        next_page = 0
+        finished = 0
+        started = 0
+        
+        async def look_up(i: int, vision_info: ParcelInfo) -> ParcelResult:
             try:
-                # Search for parcel boundary
-                boundary = await self.regrid_client.search_parcel(
-                    apn=vision_info.apn,
-                    address=vision_info.address,
-                    county=vision_info.county,
-                    state=vision_info.state
-                )
+                return await self._look_up_parcel(i, vision_info, prefetched)
+            finally:
+                semaphore.release()
+        
+        try:
+            while finished < producers:
+                # Take every page already waiting so their APNs share batched queries
+                items = [await extracted.get()]
+                while not extracted.empty():
+                    items.append(extracted.get_nowait())
+                for item in items:
+                    if item is None:
+                        finished += 1
+                    else:
+                        arrived[item[0]] = item[1]
                 
-                if boundary:
-                    # Save output files
-                    parcel_id = boundary.apn or boundary.parcel_id or f"parcel_{i + 1}"
-                    parcel_id = self._clean_filename(parcel_id)
-                    
-                    # Save GeoJSON
-                    geojson_path = config.output_dir / f"{parcel_id}.geojson"
-                    self.regrid_client.save_geojson(boundary, str(geojson_path))
-                    
-                    # Save vertices CSV
-                    csv_path = config.output_dir / f"{parcel_id}_vertices.csv"
-                    self.regrid_client.save_vertices_csv(boundary, str(csv_path))
-                    
-                    print(f"✓ Found parcel boundary for {parcel_id}")
-                    print(f"  - Saved: {geojson_path.name}, {csv_path.name}")
-                    
-                    results.append(ParcelResult(
-                        vision_info=vision_info,
-                        boundary=boundary,
-                        success=True
-                    ))
-                else:
-                    print(f"✗ No boundary found for parcel {i + 1}")
-                    results.append(ParcelResult(
-                        vision_info=vision_info,
-                        success=False,
-                        error="No parcel boundary found in Regrid API"
-                    ))
-                    
-            except Exception as e:
-                print(f"✗ Error processing parcel {i + 1}: {e}")
-                results.append(ParcelResult(
-                    vision_info=vision_info,
-                    success=False,
-                    error=str(e)
-                ))
+                new_keys = []
+                while next_page in arrived:
+                    for info in dedupe_parcels(arrived.pop(next_page)):
+                        key = parcel_key(info) or ("page", next_page)
+                        if key in entries:
+                            entries[key][0] = merge_parcel_info(entries[key][0], info)
+                        else:
+                            entries[key] = [info, None]
+                            new_keys.append(key)
+                    next_page += 1
+                if not new_keys:
+                    continue
+                
+                with profile_stage("lookup"):
+                    await self.regrid_client.prefetch_apns([
+                        (info.apn, info.county, info.state)
+                        for info in (entries[key][0] for key in new_keys) if info.apn
+                    ])
+                for key in new_keys:
+                    # Waiting here is what holds back vision when Regrid is the bottleneck
+                    await semaphore.acquire()
+                    entries[key][1] = asyncio.create_task(look_up(started, entries[key][0]))
+                    started += 1
+            
+            print(f"Found {len(entries)} unique parcel(s) on {next_page} page(s)")
+            with profile_stage("lookup"):
+                results = await asyncio.gather(*(task for _, task in entries.values()))
+        except BaseException:
+            for _, task in entries.values():
+                if task is not None:
+                    task.cancel()
+            raise
         
-        return results
+        # Report everything read about a parcel, including pages after its lookup started
+        for result, (info, _) in zip(results, entries.values()):
+            result.vision_info = info
+        return list(results)
     
-    async def process_file(self, file_path: Path) -> List[ParcelResult]:
+    async def _look_up_parcel(self, i: int, vision_info: ParcelInfo,
+                              prefetched: List[str]) -> ParcelResult:
+        """Look up the boundary for one extracted parcel."""
+        print(f"Processing result {i + 1}...")
+        
+        try:
+            # Search for parcel boundary
+            boundary = await self.regrid_client.search_parcel(
+                apn=vision_info.apn,
+                address=vision_info.address,
+                county=vision_info.county,
+                state=vision_info.state
+            )
+            
+            if boundary:
+                # Warm the cache with the neighbours of the first parcel found; the
+                # prefetch runs in the background and outlives this run
+                if config.prefetch_enabled and not prefetched and self.regrid_client.start_prefetch(boundary):
+                    prefetched.append(boundary.parcel_id)
+                
+                print(f"✓ Found parcel boundary for {boundary.apn or boundary.parcel_id}")
+                return ParcelResult(
+                    vision_info=vision_info,
+                    boundary=boundary,
+                    success=True,
+                    status="found"
+                )
+            
+            print(f"✗ No boundary found for parcel {i + 1}")
+            return ParcelResult(
+                vision_info=vision_info,
+                success=False,
+                error="No parcel boundary found in Regrid API"
+            )
+            
+        except RegridServiceError as e:
+            # Not a miss: the parcel may well exist, so the result is marked for retry
+            print(f"✗ Regrid {e.status} for parcel {i + 1}: {e}")
+            return ParcelResult(
+                vision_info=vision_info,
+                success=False,
+                error=str(e),
+                status=e.status
+            )
+        except Exception as e:
+            print(f"✗ Error processing parcel {i + 1}: {e}")
+            return ParcelResult(
+                vision_info=vision_info,
+                success=False,
+                error=str(e),
+                status="error"
+            )
+    
+    async def process_file(self, file_path: Path,
+                           sink: Optional[OutputSink] = None) -> List[ParcelResult]:
         """Process a file through the complete pipeline."""
         print(f"Processing file: {file_path}")
         
-        # Process the file to extract images
-        with open(file_path, 'rb') as f:
-            images = self.image_processor.process_uploaded_file(f, file_path.name)
+        if not self.image_processor.is_supported_format(file_path):
+            raise ValueError(f"Unsupported file format: {file_path.suffix.lower()}")
         
-        print(f"Extracted {len(images)} image(s)")
-        
-        # Process through pipeline
-        return await self.process_images(images)
+        # Pages are rendered lazily, as the pipeline has room for them
+        return await self.process_images(self.image_processor.iter_pages(file_path), sink=sink)
     
     async def process_coordinates(self, coordinates: str) -> ParcelResult:
         """Process coordinates through the pipeline."""
-        # For coordinates, we skip vision extraction and go straight to reverse geocoding
-        # This is a simplified approach - in production you'd use a proper geocoding service
+        # For coordinates, we skip vision extraction and look up the containing parcel
         vision_info = self.vision_extractor.extract_coordinates_info(coordinates)
+        lat, lon = parse_coordinates(coordinates)
+        
+        try:
+            boundary = await self.regrid_client.search_by_point(lat, lon)
+        except RegridServiceError as e:
+            return ParcelResult(vision_info=vision_info, success=False, error=str(e), status=e.status)
         
+        if boundary:
+            return ParcelResult(vision_info=vision_info, boundary=boundary, success=True, status="found")
         return ParcelResult(
             vision_info=vision_info,
-            success=True,
-            error="Coordinate processing not yet integrated with Regrid API"
+            success=False,
+            error="No parcel boundary found at these coordinates"
         )
     
     def _clean_filename(self, filename: str) -> str:
@@ -129,17 +345,28 @@ class ParcelPipeline:
             filename = filename.replace(char, '_')
         return filename.strip()
     
-    def get_map_data(self, results: List[ParcelResult]) -> Dict[str, Any]:
-        """Get map data for visualization."""
+    def get_map_data(self, results: List[ParcelResult],
+                     zoom: Optional[int] = None) -> Dict[str, Any]:
+        """Get map data for visualization.
+        
+        Coordinates are rounded to ``config.map_precision`` decimals and, when a
+        zoom level is given, simplified to sub-pixel error at that zoom. Only the
+        combined bbox is returned alongside the features, not the vertex list.
+        """
         features = []
-        bounds = []
+        shapes = []
+        tolerance = simplify_tolerance(zoom, config.map_simplify_pixels) if zoom is not None else 0
         
         for result in results:
-            if result.success and result.boundary and result.boundary.geometry:
+            if result.success and result.boundary and result.boundary.shape:
+                parcel_shape = result.boundary.shape
+                shapes.append(parcel_shape)
+                
                 # Add feature for map
+                map_shape = parcel_shape.simplified(tolerance).quantized(config.map_precision)
                 feature = {
                     "type": "Feature",
-                    "geometry": result.boundary.geometry,
+                    "geometry": map_shape.to_geojson(),
                     "properties": {
                         "parcel_id": result.boundary.parcel_id,
                         "apn": result.boundary.apn,
@@ -149,29 +376,25 @@ class ParcelPipeline:
                     }
                 }
                 features.append(feature)
-                
-                # Calculate bounds for map centering
-                if result.boundary.vertices:
-                    for lat, lon in result.boundary.vertices:
-                        bounds.append([lat, lon])
         
-        # Calculate map center and zoom
+        # Calculate map center from the combined bounding box
         center = None
-        if bounds:
-            min_lat = min(point[0] for point in bounds)
-            max_lat = max(point[0] for point in bounds)
-            min_lon = min(point[1] for point in bounds)
-            max_lon = max(point[1] for point in bounds)
-            
+        bbox = total_bounds(shapes)
+        if bbox:
+            min_lon, min_lat, max_lon, max_lat = bbox
             center = [(min_lat + max_lat) / 2, (min_lon + max_lon) / 2]
         
         return {
             "type": "FeatureCollection",
             "features": features,
             "center": center,
-            "bounds": bounds
+            "bbox": list(bbox) if bbox else None
         }
     
     async def close(self) -> None:
         """Clean up resources."""
+        # Both wait for threads, so keep them off the event loop
+        if self._sink is not None:
+            await asyncio.to_thread(self._sink.close)
+        await asyncio.to_thread(self.regrid_client.close)
         await self.vision_extractor.close() 
\ No newline at end of file
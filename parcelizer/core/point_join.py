@@ -0,0 +1,252 @@
+"""Bulk resolution of GPS points to parcels."""
+
+import asyncio
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from .config import config
+from .geometry import point_clusters
+from .rate_control import RegridServiceError
+from .regrid_client import ParcelBoundary, RegridClient
+from .result_store import ResultStore
+from .serialization import loads
+
+LAT_COLUMNS = ("lat", "latitude", "y", "point_y")
+LON_COLUMNS = ("lon", "lng", "long", "longitude", "x", "point_x")
+
+POINT_FORMATS = {".csv", ".geojson", ".json"}
+
+
+def read_points(source: Union[Path, IO], filename: Optional[str] = None) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Read a CSV (with lat/lon columns) or GeoJSON point file; returns the rows, lats and lons.
+
+    Rows whose coordinates are missing or malformed get NaN and come back
+    from resolution as "invalid" rather than failing the file.
+    """
+    suffix = Path(str(filename or getattr(source, "name", ""))).suffix.lower()
+    if suffix not in POINT_FORMATS:
+        raise ValueError(f"Unsupported point file format: {suffix or 'unknown'} (use CSV or GeoJSON)")
+
+    if suffix == ".csv":
+        frame = pd.read_csv(source)
+        lat_column = _find_column(frame, LAT_COLUMNS)
+        lon_column = _find_column(frame, LON_COLUMNS)
+        if lat_column is None or lon_column is None:
+            raise ValueError(f"CSV needs latitude and longitude columns (e.g. {LAT_COLUMNS[0]}, {LON_COLUMNS[0]})")
+        lats = pd.to_numeric(frame[lat_column], errors="coerce").to_numpy(dtype=np.float64)
+        lons = pd.to_numeric(frame[lon_column], errors="coerce").to_numpy(dtype=np.float64)
+        return frame, lats, lons
+
+    data = loads(source.read_bytes() if isinstance(source, Path) else source.read())
+    features = data.get("features", []) if data.get("type") == "FeatureCollection" else [data]
+    coordinates = np.full((len(features), 2), np.nan)
+    for i, feature in enumerate(features):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Point":
+            try:
+                coordinates[i] = [float(value) for value in geometry["coordinates"][:2]]
+            except (KeyError, TypeError, ValueError):
+                pass
+    frame = pd.DataFrame([feature.get("properties") or {} for feature in features])
+    frame["lon"] = coordinates[:, 0]
+    frame["lat"] = coordinates[:, 1]
+    return frame, coordinates[:, 1], coordinates[:, 0]
+
+
+def _find_column(frame: pd.DataFrame, names: Tuple[str, ...]) -> Optional[str]:
+    """The first column whose name (case-insensitively) is one of ``names``."""
+    columns = {str(column).strip().lower(): column for column in frame.columns}
+    for name in names:
+        if name in columns:
+            return columns[name]
+    return None
+
+
+@dataclass(slots=True)
+class PointMatches:
+    """The parcel found for each of a set of points."""
+    parcel_index: np.ndarray  # per point, index into ``parcels`` or -1
+    parcels: List[ParcelBoundary]
+    source: np.ndarray  # per point: cache, store, regrid, or "" when unresolved
+    status: np.ndarray  # per point: found, not_found, invalid, throttled or unavailable
+
+    def __repr__(self) -> str:
+        """Summary only: the full arrays would be huge, and asyncio.run formats its result."""
+        found = int(np.count_nonzero(self.parcel_index >= 0))
+        return f"PointMatches(points={len(self.status)}, found={found}, parcels={len(self.parcels)})"
+
+    def counts(self) -> Dict[str, int]:
+        """Number of points per status, and per source for the ones found."""
+        counts: Dict[str, int] = {}
+        for key in list(self.status) + [f"from {source}" for source in self.source if source]:
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+class PointResolver:
+    """Resolves many points to parcels, locally first and through Regrid only when needed.
+
+    Points are matched in vectorized passes against the parcels already
+    known: the Regrid client's cache, then the result store. What remains
+    goes to Regrid: clusters of nearby points with one area query each, then
+    single point lookups in small waves. Every parcel Regrid returns is
+    matched against all remaining points before the next wave, so points
+    sharing a parcel cost one lookup between them.
+    """
+
+    def __init__(self, regrid_client: RegridClient, result_store: Optional[ResultStore] = None) -> None:
+        """Initialize the resolver."""
+        self.regrid_client = regrid_client
+        self.result_store = result_store
+
+    async def resolve(self, lats: np.ndarray, lons: np.ndarray, use_regrid: bool = True) -> PointMatches:
+        """Find the parcel containing each point."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        matches = PointMatches(
+            parcel_index=np.full(len(lats), -1, dtype=np.int64),
+            parcels=[],
+            source=np.full(len(lats), "", dtype=object),
+            status=np.full(len(lats), "not_found", dtype=object)
+        )
+        valid = np.isfinite(lats) & np.isfinite(lons) & (np.abs(lats) <= 90) & (np.abs(lons) <= 180)
+        matches.status[~valid] = "invalid"
+        ids: Dict[str, int] = {}
+
+        self._match(matches, ids, self._pending(matches), lons, lats, self.regrid_client.cache.find_points, "cache")
+        if self.result_store is not None:
+            self._match(matches, ids, self._pending(matches), lons, lats, self.result_store.find_points, "store")
+        if use_regrid:
+            await self._fetch(matches, ids, lons, lats)
+        return matches
+
+    def _pending(self, matches: PointMatches) -> np.ndarray:
+        """Positions of the points still unresolved."""
+        return np.flatnonzero(matches.status == "not_found")
+
+    def _match(self, matches: PointMatches, ids: Dict[str, int], positions: np.ndarray,
+               lons: np.ndarray, lats: np.ndarray, finder, source: str) -> int:
+        """Record the parcels ``finder`` matches to the points at ``positions``; returns how many matched."""
+        if len(positions) == 0:
+            return 0
+        indices, parcels = finder(lons[positions], lats[positions])
+        if not parcels:
+            return 0
+
+        parcel_index = np.array([self._intern(matches, ids, parcel) for parcel in parcels])
+        hit = indices >= 0
+        found = positions[hit]
+        matches.parcel_index[found] = parcel_index[indices[hit]]
+        matches.source[found] = source
+        matches.status[found] = "found"
+        return len(found)
+
+    def _intern(self, matches: PointMatches, ids: Dict[str, int], parcel: ParcelBoundary) -> int:
+        """Index of a parcel in ``matches.parcels``, adding it the first time."""
+        index = ids.get(parcel.parcel_id)
+        if index is None:
+            index = ids[parcel.parcel_id] = len(matches.parcels)
+            matches.parcels.append(parcel)
+        return index
+
+    async def _fetch(self, matches: PointMatches, ids: Dict[str, int],
+                     lons: np.ndarray, lats: np.ndarray) -> None:
+        """Resolve the remaining points through Regrid."""
+        pending = self._pending(matches)
+        if len(pending) == 0:
+            return
+
+        # Clusters of nearby points: one area query fetches all of their parcels
+        margin = config.prefetch_margin
+        areas = [
+            (min_lon - margin, min_lat - margin, max_lon + margin, max_lat + margin)
+            for (min_lon, min_lat, max_lon, max_lat), group
+            in point_clusters(lons[pending], lats[pending], config.point_cell_size)
+            if len(group) >= config.point_area_min_points
+        ]
+        if areas:
+            semaphore = asyncio.Semaphore(config.lookup_concurrency)
+
+            async def fetch_area(bbox: Tuple[float, float, float, float]) -> int:
+                async with semaphore:
+                    return await self.regrid_client.fetch_area(bbox)
+
+            print(f"Fetching parcels around {len(areas)} cluster(s) of points...")
+            outcomes = await asyncio.gather(*(fetch_area(bbox) for bbox in areas), return_exceptions=True)
+            self._match(matches, ids, pending, lons, lats, self.regrid_client.cache.find_points, "regrid")
+            for outcome in outcomes:
+                if isinstance(outcome, RegridServiceError):
+                    self._give_up(matches, outcome)
+                    return
+                if isinstance(outcome, BaseException):
+                    print(f"Area fetch failed: {outcome}")
+
+        # Single lookups for the rest; each new parcel is matched against every point still pending
+        pending = self._pending(matches)
+        if len(pending) == 0:
+            return
+        print(f"Looking up {len(pending)} point(s) one at a time...")
+        points = shapely.STRtree(shapely.points(lons[pending], lats[pending]))
+        asked = np.zeros(len(pending), dtype=bool)
+        wave_size = max(1, config.lookup_concurrency)
+
+        while True:
+            open_slots = np.flatnonzero(~asked & (matches.status[pending] == "not_found"))
+            if len(open_slots) == 0:
+                return
+            wave = open_slots[:wave_size]
+            asked[wave] = True
+            outcomes = await asyncio.gather(*(
+                self.regrid_client.search_by_point(lats[pending[i]], lons[pending[i]]) for i in wave
+            ), return_exceptions=True)
+
+            new_parcels = []
+            for i, outcome in zip(wave, outcomes):
+                if isinstance(outcome, RegridServiceError):
+                    self._give_up(matches, outcome)
+                    return
+                if isinstance(outcome, ParcelBoundary):
+                    # Regrid's answer for the point asked stands even if it sits on the edge
+                    matches.parcel_index[pending[i]] = self._intern(matches, ids, outcome)
+                    matches.source[pending[i]] = "regrid"
+                    matches.status[pending[i]] = "found"
+                    if outcome.shape:
+                        new_parcels.append(outcome)
+                elif isinstance(outcome, BaseException):
+                    print(f"Point lookup failed: {outcome}")
+            if not new_parcels:
+                continue
+
+            parcel_hits, point_hits = points.query(
+                [parcel.shape.to_shapely() for parcel in new_parcels], predicate="intersects"
+            )
+            for parcel_hit, point_hit in zip(parcel_hits, point_hits):
+                position = pending[point_hit]
+                if matches.status[position] == "not_found":
+                    matches.parcel_index[position] = self._intern(matches, ids, new_parcels[parcel_hit])
+                    matches.source[position] = "regrid"
+                    matches.status[position] = "found"
+
+    def _give_up(self, matches: PointMatches, error: RegridServiceError) -> None:
+        """Mark every unresolved point with why Regrid couldn't be asked."""
+        print(f"Regrid {error.status}; leaving the remaining points unresolved: {error}")
+        matches.status[self._pending(matches)] = error.status
+
+
+def join_points(frame: pd.DataFrame, matches: PointMatches) -> pd.DataFrame:
+    """The input rows with the matched parcel's attributes and how it was found."""
+    joined = frame.copy()
+    for column, attribute in (("parcel_id", "parcel_id"), ("parcel_apn", "apn"),
+                              ("parcel_address", "address"), ("parcel_county", "county"),
+                              ("parcel_state", "state")):
+        # The trailing None is what index -1 (no parcel) picks
+        values = np.array([getattr(parcel, attribute) for parcel in matches.parcels] + [None], dtype=object)
+        joined[column] = values[matches.parcel_index]
+    joined["match_source"] = matches.source
+    joined["match_status"] = matches.status
+    return joined
@@ -0,0 +1,245 @@
+"""Opt-in profiling of pipeline runs: CPU, sampled stacks and memory per stage."""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .config import config
+
+# The profiler of the run the current task belongs to (inherited by tasks and to_thread)
+_active: ContextVar[Optional["RunProfiler"]] = ContextVar("parcelizer_profiler", default=None)
+
+# tracemalloc and cProfile are process-wide, so only one run is profiled at a time
+_profiling_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class StageStats:
+    """Time and memory of one pipeline stage.
+
+    Stages (and several calls of one stage) run concurrently, so ``busy_seconds``
+    sums every call's duration and can exceed the run's wall time, while
+    ``active_seconds`` is the wall time during which at least one call ran.
+    ``peak_bytes`` is the highest traced memory while the stage was active,
+    shared with whichever stages overlapped it.
+    """
+    name: str
+    busy_seconds: float = 0.0
+    active_seconds: float = 0.0
+    peak_bytes: int = 0
+    calls: int = 0
+    running: int = 0
+    active_since: float = 0.0
+
+
+class StackSampler:
+    """Wall-clock sampling profiler over all threads, producing collapsed stacks.
+
+    The output is the "folded" format read by flamegraph.pl, speedscope and
+    inferno. Unlike cProfile it sees worker threads (OCR, to_thread calls) too.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """Initialize the sampler."""
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(target=self._run, name="parcelizer-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_folded(self, path: Path) -> None:
+        """Write the collapsed stacks, one "frame;frame;frame count" line each."""
+        with open(path, "w") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _run(self) -> None:
+        """Sample every thread's stack until stopped."""
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+class RunProfiler:
+    """Profiles one run and writes its reports to the output directory.
+
+    Produces ``<name>.prof`` (cProfile, for snakeviz or pstats),
+    ``<name>.folded`` (sampled stacks for flamegraphs) and
+    ``<name>-summary.txt`` (stage timings and peak memory, hottest functions
+    and top allocations). Stages are marked with ``profile_stage``.
+    """
+
+    def __init__(self, output_dir: Optional[Path] = None, name: Optional[str] = None) -> None:
+        """Initialize the profiler."""
+        self.output_dir = Path(output_dir or config.output_dir)
+        self.name = name or f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        self.stages: Dict[str, StageStats] = {}
+        self._stages_lock = threading.Lock()  # Stages also run in worker threads
+        self.report_paths: List[Path] = []
+
+        self._cprofile = cProfile.Profile()
+        self._sampler = StackSampler(config.profile_sample_interval)
+        self._token = None
+        self._started = 0.0
+        self._cpu_started = 0.0
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_bytes = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def __enter__(self) -> "RunProfiler":
+        """Start profiling."""
+        if not _profiling_lock.acquire(blocking=False):
+            raise RuntimeError("Another run is already being profiled")
+
+        self._token = _active.set(self)
+        tracemalloc.start(config.profile_traceback_frames)
+        self._sampler.start()
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self._cprofile.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop profiling and write the reports."""
+        try:
+            self._cprofile.disable()
+            self.wall_seconds = time.perf_counter() - self._started
+            self.cpu_seconds = time.process_time() - self._cpu_started
+            self._sampler.stop()
+            self._snapshot = tracemalloc.take_snapshot()
+            with self._stages_lock:
+                self._close_memory_window()
+            tracemalloc.stop()
+            _active.reset(self._token)
+            self._write_reports()
+        finally:
+            _profiling_lock.release()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record the time and peak memory of a stage; calls may nest and overlap.
+
+        tracemalloc has a single process-wide peak, so the run is cut into
+        windows at every point a stage becomes active or idle. Each window's
+        peak is charged to the stages active throughout it, and to the run.
+        """
+        started = time.perf_counter()
+        with self._stages_lock:
+            stats = self.stages.setdefault(name, StageStats(name))
+            if stats.running == 0:
+                self._close_memory_window()
+                stats.active_since = started
+            stats.running += 1
+        try:
+            yield
+        finally:
+            ended = time.perf_counter()
+            with self._stages_lock:
+                stats.busy_seconds += ended - started
+                stats.calls += 1
+                if stats.running == 1:
+                    self._close_memory_window()
+                    stats.active_seconds += ended - stats.active_since
+                stats.running -= 1
+
+    def _close_memory_window(self) -> None:
+        """Charge the traced peak since the last window to the active stages and start anew (lock held)."""
+        peak = tracemalloc.get_traced_memory()[1]
+        self.peak_bytes = max(self.peak_bytes, peak)
+        for stats in self.stages.values():
+            if stats.running:
+                stats.peak_bytes = max(stats.peak_bytes, peak)
+        tracemalloc.reset_peak()
+
+    @property
+    def summary_path(self) -> Path:
+        """Path of the text summary."""
+        return self.output_dir / f"{self.name}-summary.txt"
+
+    def _write_reports(self) -> None:
+        """Write the cProfile dump, folded stacks and summary."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        prof_path = self.output_dir / f"{self.name}.prof"
+        folded_path = self.output_dir / f"{self.name}.folded"
+
+        self._cprofile.dump_stats(prof_path)
+        self._sampler.write_folded(folded_path)
+        self.summary_path.write_text(self._summary())
+        self.report_paths = [self.summary_path, prof_path, folded_path]
+
+    def _summary(self) -> str:
+        """Human-readable summary of the run."""
+        top = config.profile_top
+        lines = [
+            f"Run: {self.name}",
+            f"Wall time: {self.wall_seconds:.2f}s, CPU time: {self.cpu_seconds:.2f}s, "
+            f"peak traced memory: {_mb(self.peak_bytes)}",
+            f"Stack samples: {self._sampler.samples} every {self._sampler.interval * 1000:.0f}ms",
+            "",
+            "Stages (they overlap, so their times don't add up to the wall time):",
+            f"  {'stage':<10} {'active':>9} {'busy':>9} {'peak memory':>12}  calls"
+        ]
+        for stats in self.stages.values():
+            lines.append(f"  {stats.name:<10} {stats.active_seconds:8.2f}s {stats.busy_seconds:8.2f}s "
+                         f"{_mb(stats.peak_bytes):>12}  x{stats.calls}")
+
+        stream = io.StringIO()
+        pstats.Stats(self._cprofile, stream=stream).sort_stats("cumulative").print_stats(top)
+        lines += ["", f"Top {top} functions by cumulative time (event-loop thread):", stream.getvalue().strip()]
+
+        lines += ["", f"Top {top} allocations still live at the end of the run:"]
+        for statistic in self._snapshot.statistics("lineno")[:top]:
+            frame = statistic.traceback[0]
+            lines.append(f"  {_mb(statistic.size):>10}  {statistic.count:>8} blocks  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    """Mark a pipeline stage for the active profiler; free when nothing is being profiled."""
+    profiler = _active.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
+
+
+def _mb(size: int) -> str:
+    """Format a byte count in megabytes."""
+    return f"{size / (1024 * 1024):.1f} MB"
@@ -0,0 +1,335 @@
+"""Adaptive concurrency, quota tracking and circuit breaking for Regrid calls."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Deque, Dict, Mapping, Optional, Tuple
+
+
+class RegridServiceError(RuntimeError):
+    """Regrid could not answer the request; unlike a miss, the parcel may still exist."""
+
+    status = "unavailable"
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        """Initialize with the seconds to wait before retrying, if known."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RegridThrottled(RegridServiceError):
+    """Regrid rejected the request for rate or quota reasons (HTTP 429 or quota spent)."""
+
+    status = "throttled"
+
+
+class CircuitOpenError(RegridServiceError):
+    """The request was not sent because recent requests kept failing."""
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for outgoing requests.
+
+    The limit grows by about one slot per round of successful requests and is
+    halved on throttling or server errors; a latency rising well above the
+    best seen also shrinks it, a little. Decreases apply once per congestion
+    event: requests started before the last decrease don't trigger another.
+
+    Waiters are resumed through their own event loop's ``call_soon_threadsafe``
+    and the state is guarded by a threading lock, so one limiter can be shared
+    by callers on different threads and loops (the web app runs one loop per
+    request).
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16,
+                 latency_tolerance: float = 2.0) -> None:
+        """Initialize the limiter."""
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.baseline_latency: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def in_use(self) -> int:
+        """Requests currently holding a slot."""
+        return self._in_use
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """Hold a slot for the duration of a request; yields the start time."""
+        await self._acquire()
+        try:
+            yield time.monotonic()
+        finally:
+            self._release()
+
+    def record_success(self, started: float, latency: float) -> None:
+        """Feed back a completed request's latency."""
+        with self._lock:
+            if self.baseline_latency is None or latency < self.baseline_latency:
+                self.baseline_latency = latency
+            else:
+                # Drift upwards slowly so the baseline follows lasting changes
+                self.baseline_latency += (latency - self.baseline_latency) * 0.01
+
+            if latency > self.baseline_latency * self.latency_tolerance:
+                self._decrease(started, 0.9)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._wake()
+
+    def record_congestion(self, started: float) -> None:
+        """Feed back a throttled or failed request."""
+        with self._lock:
+            self._decrease(started, 0.5)
+
+    def _decrease(self, started: float, factor: float) -> None:
+        """Shrink the limit, once per congestion event."""
+        if started < self._last_decrease:
+            return
+        self.limit = max(self.minimum, self.limit * factor)
+        self._last_decrease = time.monotonic()
+
+    async def _acquire(self) -> None:
+        """Wait for a free slot."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_use < int(self.limit) and not self._waiters:
+                self._in_use += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, future))
+                    granted = False
+                except ValueError:
+                    granted = True  # A slot was handed over just as we were cancelled
+            if granted:
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        """Free a slot and hand it to the next waiter."""
+        with self._lock:
+            self._in_use -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        """Grant free slots to waiters, in order (lock held)."""
+        while self._waiters and self._in_use < int(self.limit):
+            loop, future = self._waiters.popleft()
+            self._in_use += 1
+            try:
+                loop.call_soon_threadsafe(_grant, future)
+            except RuntimeError:
+                self._in_use -= 1  # The waiter's loop has closed
+
+
+def _grant(future: asyncio.Future) -> None:
+    """Wake a waiter (runs on the waiter's loop)."""
+    if not future.done():
+        future.set_result(None)
+
+
+class CircuitBreaker:
+    """Fails calls fast after repeated failures, then lets a single probe through.
+
+    The circuit opens after ``failure_threshold`` consecutive failures (or
+    when told to wait, e.g. by ``Retry-After`` or an exhausted quota) and stays
+    open for ``reset_timeout`` seconds. It is then half-open: one call goes out
+    as a probe while the others wait for its outcome; its success closes the
+    circuit and its failure reopens it. While open because Regrid asked us to
+    back off, calls fail with RegridThrottled rather than CircuitOpenError.
+
+    Like the limiter, waiters are resumed on their own event loop so one
+    breaker can be shared across threads and loops.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        """Initialize a closed circuit."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+        self._tripped = False
+        self._throttled = False
+        self._probing = False
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half-open."""
+        with self._lock:
+            if not self._tripped:
+                return "closed"
+            return "open" if time.time() < self._open_until else "half-open"
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until calls are allowed again (0 when closed)."""
+        with self._lock:
+            return max(0.0, self._open_until - time.time()) if self._tripped else 0.0
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[None]:
+        """Admit a call, or raise while the circuit is open.
+
+        The call reports its outcome with ``record_success`` or
+        ``record_failure`` before leaving the block. When a probe leaves, the
+        waiters re-check the circuit; if the probe ended without an outcome
+        (e.g. it was cancelled) one of them becomes the next probe.
+        """
+        probe = await self._admit()
+        try:
+            yield
+        finally:
+            if probe:
+                with self._lock:
+                    self._probing = False
+                    self._wake()
+
+    def record_success(self) -> None:
+        """A call got an answer (including "not found")."""
+        with self._lock:
+            self._failures = 0
+            self._tripped = False
+            self._throttled = False
+
+    def record_failure(self, retry_after: Optional[float] = None, throttled: bool = False) -> None:
+        """A call failed; ``retry_after`` opens the circuit for at least that long."""
+        with self._lock:
+            self._failures += 1
+            if retry_after:
+                self._trip(retry_after, throttled)
+            elif self._tripped or self._failures >= self.failure_threshold:
+                self._trip(self.reset_timeout, throttled)
+
+    def open_for(self, seconds: float) -> None:
+        """Stop calls for ``seconds`` regardless of failures (the quota is spent)."""
+        with self._lock:
+            self._trip(seconds, throttled=True)
+
+    async def _admit(self) -> bool:
+        """Wait until a call may go out; returns whether it is the half-open probe."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if not self._tripped:
+                    return False
+                now = time.time()
+                if now < self._open_until:
+                    raise self._open_error(self._open_until - now)
+                if not self._probing:
+                    self._probing = True
+                    return True
+                future = loop.create_future()
+                waiter = (loop, future)
+                self._waiters.append(waiter)
+
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                raise
+
+    def _open_error(self, retry_after: float) -> RegridServiceError:
+        """The error for a call refused while open (lock held)."""
+        if self._throttled:
+            return RegridThrottled(f"Regrid asked to back off for {retry_after:.0f}s", retry_after=retry_after)
+        return CircuitOpenError("Regrid circuit open after repeated failures", retry_after=retry_after)
+
+    def _trip(self, seconds: float, throttled: bool) -> None:
+        """Open the circuit (lock held)."""
+        until = time.time() + seconds
+        if until >= self._open_until:
+            self._throttled = throttled
+        self._tripped = True
+        self._open_until = max(self._open_until, until)
+
+    def _wake(self) -> None:
+        """Let every waiter re-check the circuit (lock held)."""
+        while self._waiters:
+            loop, future = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_grant, future)
+            except RuntimeError:
+                pass  # The waiter's loop has closed
+
+
+class QuotaTracker:
+    """Rate-limit quota as reported by ``X-RateLimit-*`` and ``Retry-After`` headers."""
+
+    def __init__(self) -> None:
+        """Initialize with nothing known."""
+        self._lock = threading.Lock()
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """Record the quota reported with a response."""
+        limit = _int_header(headers, "X-RateLimit-Limit")
+        remaining = _int_header(headers, "X-RateLimit-Remaining")
+        reset = _int_header(headers, "X-RateLimit-Reset")
+        with self._lock:
+            if limit is not None:
+                self.limit = limit
+            if remaining is not None:
+                self.remaining = remaining
+            if reset is not None:
+                # Either an epoch timestamp or seconds from now
+                self.reset_at = float(reset) if reset > 1_000_000_000 else time.time() + reset
+
+    def wait_time(self) -> Optional[float]:
+        """Seconds until the quota resets, if it is spent."""
+        with self._lock:
+            if self.remaining is None or self.remaining > 0:
+                return None
+            if self.reset_at is None:
+                return None
+            return max(0.0, self.reset_at - time.time())
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """Current quota figures."""
+        with self._lock:
+            return {"limit": self.limit, "remaining": self.remaining, "reset_at": self.reset_at}
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header given in seconds or as an HTTP date."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    """An integer header value, or None if missing or malformed."""
+    try:
+        return int(float(headers[name]))
+    except (KeyError, TypeError, ValueError):
+        return None
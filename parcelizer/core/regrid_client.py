@@ -1,35 +1,79 @@
 """Regrid API client for fetching parcel boundary data."""
 
 import asyncio
+import concurrent.futures
+import hashlib
 import json
-from typing import Dict, List, Optional, Any, Tuple
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Set, Tuple
 from dataclasses import dataclass
 
 import httpx
-from shapely.geometry import shape, Polygon
-import geopandas as gpd
+import numpy as np
+from shapely.geometry import box
 
 from .config import config
-from .demo_data import get_demo_parcel_response
+from .demo_data import DEMO_PARCELS, get_demo_parcel_response
+from .geometry import ParcelGeometry
+from .apn import apn_candidates, apn_key, normalize_county, normalize_state
+from .parcel_cache import ParcelCache
+from .rate_control import (
+    AdaptiveLimiter, CircuitBreaker, QuotaTracker, RegridServiceError, RegridThrottled,
+    retry_after_seconds
+)
+from .serialization import dumps
+from .singleflight import SingleFlight
 
 
-@dataclass
+@dataclass(slots=True)
 class ParcelBoundary:
-    """Parcel boundary data from Regrid API."""
+    """Parcel boundary data from Regrid API.
+    
+    Coordinates live only in ``shape``; the GeoJSON ``geometry`` and the
+    ``vertices`` array are derived from it on access. The raw Regrid response
+    is only kept when ``config.keep_raw_responses`` is set, and then on disk.
+    """
     parcel_id: str
     apn: Optional[str] = None
     address: Optional[str] = None
     county: Optional[str] = None
     state: Optional[str] = None
-    geometry: Optional[Dict] = None  # GeoJSON geometry
-    vertices: Optional[List[Tuple[float, float]]] = None  # [(lat, lon), ...]
-    raw_response: Optional[Dict] = None
+    shape: Optional[ParcelGeometry] = None  # array-backed rings and parts
+    raw_response_path: Optional[Path] = None
+    
+    @property
+    def geometry(self) -> Optional[Dict]:
+        """GeoJSON geometry, built from ``shape``."""
+        return self.shape.to_geojson() if self.shape else None
+    
+    @property
+    def vertices(self) -> Optional[np.ndarray]:
+        """(N, 2) array of (lat, lon) over all rings, a view of ``shape``."""
+        return self.shape.vertices if self.shape else None
+    
+    @property
+    def vertex_count(self) -> int:
+        """Number of vertices across all rings."""
+        return self.shape.vertex_count if self.shape else 0
+    
+    @property
+    def raw_response(self) -> Optional[Dict]:
+        """The full Regrid response this parcel came from, if it was kept."""
+        if self.raw_response_path is None:
+            return None
+        with open(self.raw_response_path) as f:
+            return json.load(f)
+
+
+LOOKUP_STRATEGIES = ("sequential", "parallel", "hedged")
 
 
 class RegridClient:
     """Client for Regrid Parcel API v2."""
     
-    def __init__(self, demo_mode: bool = False) -> None:
+    def __init__(self, demo_mode: bool = False, lookup_strategy: Optional[str] = None) -> None:
         """Initialize the Regrid client."""
         self.base_url = "https://app.regrid.com/api/v2"
         self.headers = {
@@ -37,34 +81,145 @@ class RegridClient:
             "Content-Type": "application/json"
         }
         self.demo_mode = demo_mode
+        
+        # Duplicate lookups (same APN on many pages, several web users) share one request
+        self._inflight = SingleFlight()
+        
+        # Parcels already fetched, checked before any APN request goes out
+        self.cache = ParcelCache(max_parcels=config.parcel_cache_size)
+        
+        # Shared by every caller so throttling seen by one run slows them all down
+        self.limiter = AdaptiveLimiter(
+            initial=config.regrid_concurrency,
+            maximum=config.regrid_max_concurrency,
+            latency_tolerance=config.regrid_latency_tolerance
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.circuit_failure_threshold,
+            reset_timeout=config.circuit_reset_seconds
+        )
+        self.quota = QuotaTracker()
+        
+        # Area prefetches run on an event loop of the client's own, so they outlive
+        # the run that started them (each web request has a short-lived loop)
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._prefetch_thread: Optional[threading.Thread] = None
+        self._prefetches: Set[concurrent.futures.Future] = set()
+        
+        self.lookup_strategy = lookup_strategy or config.lookup_strategy
+        if self.lookup_strategy not in LOOKUP_STRATEGIES:
+            raise ValueError(f"Unknown lookup strategy: {self.lookup_strategy}")
+    
+    async def _get(self, client: httpx.AsyncClient, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """Send a GET through the circuit breaker and the adaptive concurrency limit.
+        
+        Raises RegridThrottled for 429s, a spent quota and while backing off as
+        asked, and RegridServiceError for 5xx responses, network failures and an
+        open circuit, so callers can tell "Regrid couldn't answer" apart from
+        "no such parcel". Any other response is returned for the caller to
+        interpret.
+        """
+        async with self.limiter.slot() as started:
+            # Entered once a slot is free: the circuit may have opened while we waited
+            async with self.breaker.call():
+                try:
+                    response = await client.get(url, headers=self.headers, params=params)
+                except httpx.TransportError as e:
+                    self.limiter.record_congestion(started)
+                    self.breaker.record_failure()
+                    raise RegridServiceError(f"Regrid request failed: {e}") from e
+                latency = time.monotonic() - started
+                
+                self.quota.update(response.headers)
+                if response.status_code == 429 or response.status_code >= 500:
+                    retry_after = retry_after_seconds(response.headers)
+                    self.limiter.record_congestion(started)
+                    throttled = response.status_code == 429
+                    self.breaker.record_failure(retry_after, throttled=throttled)
+                    error = RegridThrottled if throttled else RegridServiceError
+                    raise error(f"Regrid returned HTTP {response.status_code}", retry_after=retry_after)
+                
+                self.breaker.record_success()
+                # A spent quota stops every caller until it resets
+                wait = self.quota.wait_time()
+                if wait:
+                    self.breaker.open_for(wait)
+        
+        self.limiter.record_success(started, latency)
+        return response
+    
+    def status(self) -> Dict[str, Any]:
+        """Circuit state, current concurrency limit and the quota Regrid last reported."""
+        return {
+            "circuit": self.breaker.state,
+            "retry_after": round(self.breaker.retry_after, 1),
+            "concurrency": int(self.limiter.limit),
+            "quota": self.quota.snapshot()
+        }
     
     async def search_by_apn(self, apn: str, county: Optional[str] = None, 
                            state: Optional[str] = None) -> Optional[ParcelBoundary]:
         """Search for parcel by APN (Assessor's Parcel Number)."""
+        key = ("apn", apn_key(apn), normalize_county(county), normalize_state(state))
+        return await self._inflight.do(key, lambda: self._fetch_by_apn(apn, county, state))
+    
+    async def _fetch_by_apn(self, apn: str, county: Optional[str] = None,
+                            state: Optional[str] = None) -> Optional[ParcelBoundary]:
+        """Request a parcel by APN, trying county-aware variants of the APN.
+        
+        Variants are checked against the local parcel cache first; the top
+        ``config.apn_batch_size`` variants are then sent as one Regrid query.
+        """
+        candidates = apn_candidates(apn, county, state)
+        cached = self.cache.find_apn(candidates, county, state)
+        if cached:
+            print(f"Parcel cache hit for APN {apn}")
+            return cached
+        
         if self.demo_mode:
             print(f"🎭 Demo mode: Looking up APN {apn}")
-            data = get_demo_parcel_response(apn)
-            return self._parse_parcel_response(data, apn)
+            for candidate in candidates:
+                data = get_demo_parcel_response(candidate)
+                boundaries = self._parse_parcel_features(data, apn)
+                if boundaries:
+                    return self._best_apn_match(boundaries, candidates)
+            return None
         
+        top_candidates = candidates[:config.apn_batch_size]
         try:
             async with httpx.AsyncClient() as client:
-                # Clean up APN - remove any spaces or special characters
-                clean_apn = ''.join(c for c in apn if c.isalnum())
-                
-                url = f"{self.base_url}/parcels/apn"
-                params = {"parcelnumb": clean_apn}
-                
-                # Add county/state if available for better accuracy
-                if county:
-                    params["county"] = county.replace(" County", "").strip()
-                if state:
-                    params["state"] = state.strip()
+                response = None
+                if len(top_candidates) > 1:
+                    # One query for all top variants instead of a round trip per variant
+                    url = f"{self.base_url}/parcels/query"
+                    params = {"fields[parcelnumb][in]": ",".join(top_candidates)}
+                    if county:
+                        params["fields[county][ilike]"] = normalize_county(county)
+                    if state:
+                        params["fields[state2][eq]"] = normalize_state(state)
+                    
+                    response = await self._get(client, url, params)
+                    if response.status_code not in (200, 404):
+                        print(f"Batched APN query failed ({response.status_code}), falling back to /parcels/apn")
+                        response = None
                 
-                response = await client.get(url, headers=self.headers, params=params)
+                if response is None:
+                    url = f"{self.base_url}/parcels/apn"
+                    params = {"parcelnumb": top_candidates[0]}
+                    
+                    # Add county/state if available for better accuracy
+                    if county:
+                        params["county"] = county.replace(" County", "").strip()
+                    if state:
+                        params["state"] = state.strip()
+                    
+                    response = await self._get(client, url, params)
                 
                 if response.status_code == 200:
                     data = response.json()
-                    return self._parse_parcel_response(data, apn)
+                    boundaries = self._parse_parcel_features(data, apn)
+                    return self._best_apn_match(boundaries, candidates)
                 elif response.status_code == 404:
                     print(f"No parcel found for APN: {apn}")
                     return None
@@ -72,13 +227,87 @@ class RegridClient:
                     print(f"Regrid API error for APN {apn}: {response.status_code} - {response.text}")
                     return None
                     
+        except RegridServiceError:
+            raise
         except Exception as e:
             print(f"Error searching by APN {apn}: {e}")
             return None
     
+    def _best_apn_match(self, boundaries: List[ParcelBoundary],
+                        candidates: List[str]) -> Optional[ParcelBoundary]:
+        """Pick the parcel whose APN matches the highest-ranked candidate."""
+        if not boundaries:
+            return None
+        ranks = {}
+        for rank, candidate in enumerate(candidates):
+            ranks.setdefault(apn_key(candidate), rank)
+        return min(boundaries, key=lambda boundary: ranks.get(apn_key(boundary.apn), len(candidates)))
+    
+    async def prefetch_apns(self, parcels: List[Tuple[str, Optional[str], Optional[str]]]) -> int:
+        """Fetch many (apn, county, state) parcels with a few batched queries.
+        
+        APNs are grouped by county and state and their top variants sent as
+        ``/parcels/query`` requests of at most ``config.lookup_batch_size``
+        values, so the per-parcel lookups that follow are answered from the
+        local cache. APNs already cached are skipped; anything the batches
+        miss is left for the regular lookup. Returns the number of parcels cached.
+        """
+        if self.demo_mode:
+            return 0
+        
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for apn, county, state in parcels:
+            candidates = apn_candidates(apn, county, state)
+            if self.cache.find_apn(candidates, county, state):
+                continue
+            group = groups.setdefault((normalize_county(county), normalize_state(state)), [])
+            group.extend(candidates[:config.apn_batch_size])
+        
+        fetched = 0
+        async with httpx.AsyncClient() as client:
+            for (county, state), values in groups.items():
+                values = list(dict.fromkeys(values))
+                for start in range(0, len(values), config.lookup_batch_size):
+                    chunk = values[start:start + config.lookup_batch_size]
+                    identifier = f"APN batch of {len(chunk)}"
+                    params = {"fields[parcelnumb][in]": ",".join(chunk), "limit": len(chunk)}
+                    if county:
+                        params["fields[county][ilike]"] = county
+                    if state:
+                        params["fields[state2][eq]"] = state
+                    
+                    try:
+                        response = await self._get(client, f"{self.base_url}/parcels/query", params)
+                    except RegridServiceError as e:
+                        # The per-parcel lookups will report it; don't keep hammering
+                        print(f"Stopping batched APN fetch: {e}")
+                        return fetched
+                    except Exception as e:
+                        print(f"Error fetching {identifier}: {e}")
+                        continue
+                    
+                    if response.status_code == 200:
+                        fetched += len(self._parse_parcel_features(response.json(), identifier))
+                    elif response.status_code != 404:
+                        print(f"Regrid API error for {identifier}: {response.status_code} - {response.text}")
+        
+        return fetched
+    
     async def search_by_address(self, address: str, county: Optional[str] = None,
                                state: Optional[str] = None) -> Optional[ParcelBoundary]:
         """Search for parcel by address."""
+        key = ("address", ' '.join(address.lower().split()), normalize_county(county),
+               normalize_state(state))
+        return await self._inflight.do(key, lambda: self._fetch_by_address(address, county, state))
+    
+    async def _fetch_by_address(self, address: str, county: Optional[str] = None,
+                                state: Optional[str] = None) -> Optional[ParcelBoundary]:
+        """Request a parcel by address from the Regrid API."""
+        cached = self.cache.find_address(address, county, state)
+        if cached:
+            print(f"Parcel cache hit for address {address}")
+            return cached
+        
         if self.demo_mode:
             print(f"🎭 Demo mode: Looking up address {address}")
             data = get_demo_parcel_response(address)
@@ -95,7 +324,7 @@ class RegridClient:
                 if state:
                     params["state"] = state.strip()
                 
-                response = await client.get(url, headers=self.headers, params=params)
+                response = await self._get(client, url, params)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -107,12 +336,198 @@ class RegridClient:
                     print(f"Regrid API error for address {address}: {response.status_code} - {response.text}")
                     return None
                     
+        except RegridServiceError:
+            raise
         except Exception as e:
             print(f"Error searching by address {address}: {e}")
             return None
     
+    async def search_by_point(self, lat: float, lon: float) -> Optional[ParcelBoundary]:
+        """Search for the parcel containing a point, checking the local cache first."""
+        cached = self.cache.find_point(lat, lon)
+        if cached:
+            print(f"Parcel cache hit for point {lat}, {lon}")
+            return cached
+        
+        key = ("point", round(lat, 7), round(lon, 7))
+        return await self._inflight.do(key, lambda: self._fetch_by_point(lat, lon))
+    
+    async def _fetch_by_point(self, lat: float, lon: float) -> Optional[ParcelBoundary]:
+        """Request the parcel containing a point from the Regrid API."""
+        identifier = f"{lat}, {lon}"
+        if self.demo_mode:
+            print(f"🎭 Demo mode: Looking up point {identifier}")
+            for demo_key in DEMO_PARCELS:
+                self._parse_parcel_features(get_demo_parcel_response(demo_key), demo_key)
+            return self.cache.find_point(lat, lon)
+        
+        try:
+            async with httpx.AsyncClient() as client:
+                url = f"{self.base_url}/parcels/point"
+                params = {"lat": lat, "lon": lon}
+                
+                response = await self._get(client, url, params)
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    return self._parse_parcel_response(data, identifier)
+                elif response.status_code == 404:
+                    print(f"No parcel found at point: {identifier}")
+                    return None
+                else:
+                    print(f"Regrid API error for point {identifier}: {response.status_code} - {response.text}")
+                    return None
+                    
+        except RegridServiceError:
+            raise
+        except Exception as e:
+            print(f"Error searching by point {identifier}: {e}")
+            return None
+    
+    async def search_area(self, bbox: Tuple[float, float, float, float], limit: int = 200,
+                          offset: int = 0) -> List[ParcelBoundary]:
+        """Fetch one page of the parcels intersecting a bbox (min_lon, min_lat, max_lon, max_lat)."""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        identifier = f"area {bbox} offset {offset}"
+        if self.demo_mode:
+            features = [
+                feature for feature in DEMO_PARCELS.values()
+                if ParcelGeometry.from_geojson(feature["geometry"]).to_shapely().intersects(
+                    box(min_lon, min_lat, max_lon, max_lat))
+            ][offset:offset + limit]
+            data = {"parcels": {"type": "FeatureCollection", "features": features}}
+            return self._parse_parcel_features(data, identifier) if features else []
+        
+        area = {
+            "type": "Polygon",
+            "coordinates": [[
+                [min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat],
+                [min_lon, max_lat], [min_lon, min_lat]
+            ]]
+        }
+        try:
+            async with httpx.AsyncClient() as client:
+                url = f"{self.base_url}/parcels/area"
+                params = {"geojson": json.dumps(area), "limit": limit, "offset": offset}
+                
+                response = await self._get(client, url, params)
+                
+                if response.status_code == 200:
+                    return self._parse_parcel_features(response.json(), identifier)
+                elif response.status_code != 404:
+                    print(f"Regrid API error for {identifier}: {response.status_code} - {response.text}")
+                return []
+                
+        except RegridServiceError:
+            raise
+        except Exception as e:
+            print(f"Error searching {identifier}: {e}")
+            return []
+    
+    async def prefetch_area(self, boundary: ParcelBoundary, margin: Optional[float] = None,
+                            max_pages: Optional[int] = None) -> int:
+        """Warm the local cache with every parcel in a bbox around ``boundary``.
+        
+        Fetches at most ``max_pages`` pages of ``config.prefetch_page_size``
+        parcels and skips areas that were already fetched. Meant to run as a
+        background task; returns the number of parcels cached.
+        """
+        if not boundary.shape:
+            return 0
+        
+        margin = config.prefetch_margin if margin is None else margin
+        min_lon, min_lat, max_lon, max_lat = boundary.shape.bounds
+        bbox = (min_lon - margin, min_lat - margin, max_lon + margin, max_lat + margin)
+        
+        try:
+            fetched = await self.fetch_area(bbox, max_pages)
+        except RegridServiceError as e:
+            # Leave the remaining capacity to the lookups that need it
+            print(f"Stopping prefetch around {boundary.parcel_id}: {e}")
+            return 0
+        
+        print(f"Prefetched {fetched} parcel(s) around {boundary.parcel_id}")
+        return fetched
+    
+    def start_prefetch(self, boundary: ParcelBoundary) -> bool:
+        """Start ``prefetch_area`` around ``boundary`` in the background; returns whether it started.
+        
+        At most ``config.prefetch_max_pending`` prefetches run at once. They
+        keep going after the caller's run ends, so later runs and coordinate
+        lookups in the area hit the cache; close() cancels them.
+        """
+        with self._prefetch_lock:
+            if len(self._prefetches) >= config.prefetch_max_pending:
+                return False
+            if self._prefetch_loop is None:
+                self._prefetch_loop = asyncio.new_event_loop()
+                self._prefetch_thread = threading.Thread(
+                    target=self._prefetch_loop.run_forever, name="regrid-prefetch", daemon=True
+                )
+                self._prefetch_thread.start()
+            future = asyncio.run_coroutine_threadsafe(self.prefetch_area(boundary), self._prefetch_loop)
+            self._prefetches.add(future)
+        future.add_done_callback(self._prefetch_done)
+        return True
+    
+    def _prefetch_done(self, future: concurrent.futures.Future) -> None:
+        """Forget a finished prefetch, reporting its error if it had one."""
+        with self._prefetch_lock:
+            self._prefetches.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Prefetch failed: {future.exception()}")
+    
+    def close(self) -> None:
+        """Cancel background prefetches and stop their event loop."""
+        with self._prefetch_lock:
+            loop, thread = self._prefetch_loop, self._prefetch_thread
+            self._prefetch_loop = self._prefetch_thread = None
+        if loop is None:
+            return
+        
+        async def cancel_all() -> None:
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_all(), loop).result(timeout=10)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=10)
+            if not thread.is_alive():
+                loop.close()
+    
+    async def fetch_area(self, bbox: Tuple[float, float, float, float],
+                         max_pages: Optional[int] = None) -> int:
+        """Fetch the parcels in a bbox into the local cache, at most ``max_pages`` pages.
+        
+        Areas already fetched in full are skipped. Raises RegridServiceError
+        when Regrid can't answer; returns the number of parcels cached.
+        """
+        if self.cache.is_covered(bbox):
+            return 0
+        
+        max_pages = config.prefetch_max_pages if max_pages is None else max_pages
+        fetched = 0
+        page_size = config.prefetch_page_size
+        for page in range(max_pages):
+            parcels = await self.search_area(bbox, limit=page_size, offset=page * page_size)
+            fetched += len(parcels)
+            if len(parcels) < page_size:
+                # Every parcel in the area has been fetched
+                self.cache.mark_covered(bbox)
+                break
+        return fetched
+    
     def _parse_parcel_response(self, data: Dict, identifier: str) -> Optional[ParcelBoundary]:
-        """Parse Regrid API response and extract parcel boundary."""
+        """Parse Regrid API response and extract the first parcel boundary."""
+        boundaries = self._parse_parcel_features(data, identifier)
+        return boundaries[0] if boundaries else None
+    
+    def _parse_parcel_features(self, data: Dict, identifier: str) -> List[ParcelBoundary]:
+        """Parse every parcel in a Regrid API response and add them to the local cache."""
         try:
             # Regrid API v2 returns parcels as a GeoJSON FeatureCollection
             if "parcels" in data and isinstance(data["parcels"], dict):
@@ -122,51 +537,64 @@ class RegridClient:
                     features = parcels_geojson.get("features", [])
                     
                     if len(features) > 0:
-                        feature = features[0]  # Take the first result
-                        
-                        geometry = feature.get("geometry")
-                        properties = feature.get("properties", {})
-                        
-                        # Extract vertices from geometry
-                        vertices = None
-                        if geometry and geometry.get("type") == "Polygon":
-                            coordinates = geometry.get("coordinates", [])
-                            if coordinates:
-                                # Get exterior ring coordinates (first array)
-                                exterior_coords = coordinates[0]
-                                # Convert from [lon, lat] to (lat, lon) tuples
-                                vertices = [(coord[1], coord[0]) for coord in exterior_coords]
-                        
-                        return ParcelBoundary(
-                            parcel_id=properties.get("parcel_id") or properties.get("id") or identifier,
-                            apn=properties.get("apn") or properties.get("parcelnumb"),
-                            address=properties.get("address") or properties.get("mail_address") or properties.get("situs_address"),
-                            county=properties.get("county") or properties.get("county_name"),
-                            state=properties.get("state") or properties.get("state_abbrev"),
-                            geometry=geometry,
-                            vertices=vertices,
-                            raw_response=data
-                        )
+                        raw_path = self._spill_raw_response(data) if config.keep_raw_responses else None
+                        boundaries = [self._parse_feature(feature, identifier, raw_path) for feature in features]
+                        for boundary in boundaries:
+                            self.cache.add(boundary)
+                        return boundaries
                     else:
                         print(f"No features found in parcels FeatureCollection for {identifier}")
-                        return None
+                        return []
                 else:
                     print(f"Parcels is not a FeatureCollection for {identifier}")
-                    return None
+                    return []
             else:
                 print(f"No parcels found in Regrid response for {identifier}")
                 print(f"Response keys: {list(data.keys())}")
-                return None
+                return []
                 
         except Exception as e:
             print(f"Error parsing Regrid response for {identifier}: {e}")
             import traceback
             traceback.print_exc()
-            return None
+            return []
+    
+    def _spill_raw_response(self, data: Dict) -> Path:
+        """Write a raw Regrid response to disk, named by its content hash."""
+        raw = dumps(data)
+        raw_dir = config.output_dir / "raw"
+        raw_dir.mkdir(parents=True, exist_ok=True)
+        
+        path = raw_dir / f"{hashlib.sha256(raw).hexdigest()[:32]}.json"
+        if not path.exists():
+            path.write_bytes(raw)
+        return path
+    
+    def _parse_feature(self, feature: Dict, identifier: str,
+                       raw_response_path: Optional[Path] = None) -> ParcelBoundary:
+        """Build a ParcelBoundary from one parcel feature."""
+        geometry = feature.get("geometry")
+        properties = feature.get("properties", {})
+        
+        # Polygon, MultiPolygon and holes all become flat coordinate arrays
+        parcel_shape = ParcelGeometry.from_geojson(geometry) if geometry else None
+        
+        return ParcelBoundary(
+            parcel_id=properties.get("parcel_id") or properties.get("id") or identifier,
+            apn=properties.get("apn") or properties.get("parcelnumb"),
+            address=properties.get("address") or properties.get("mail_address") or properties.get("situs_address"),
+            county=properties.get("county") or properties.get("county_name"),
+            state=properties.get("state") or properties.get("state_abbrev"),
+            shape=parcel_shape,
+            raw_response_path=raw_response_path
+        )
     
     async def search_parcel(self, apn: Optional[str] = None, address: Optional[str] = None,
                            county: Optional[str] = None, state: Optional[str] = None) -> Optional[ParcelBoundary]:
         """Search for parcel using available identifiers (APN preferred, fallback to address)."""
+        if apn and address and self.lookup_strategy != "sequential":
+            return await self._search_speculative(apn, address, county, state)
+        
         if apn:
             result = await self.search_by_apn(apn, county, state)
             if result:
@@ -177,32 +605,73 @@ class RegridClient:
         
         return None
     
+    async def _search_speculative(self, apn: str, address: str, county: Optional[str],
+                                  state: Optional[str]) -> Optional[ParcelBoundary]:
+        """Run the APN and address queries concurrently and keep the best-ranked hit.
+        
+        In "parallel" mode both start at once; in "hedged" mode the address query
+        only starts if the APN query hasn't found the parcel within the hedge
+        delay. An exact APN hit outranks a fuzzy address hit, so an address hit
+        that arrives first waits up to ``config.lookup_apn_wait`` for the APN
+        query before it is accepted. A query's error only counts when neither
+        finds the parcel; the APN query's error is then raised first.
+        """
+        loop = asyncio.get_running_loop()
+        apn_task = asyncio.create_task(self.search_by_apn(apn, county, state))
+        address_task = None
+        try:
+            if self.lookup_strategy == "hedged":
+                await asyncio.wait({apn_task}, timeout=config.lookup_hedge_delay)
+                if _task_hit(apn_task):
+                    return apn_task.result()
+            
+            address_task = asyncio.create_task(self.search_by_address(address, county, state))
+            ranked = (apn_task, address_task)
+            deadline = None
+            while True:
+                # The best candidate still in the running: a hit, or a query not yet answered
+                best = next((task for task in ranked if _task_hit(task) or not task.done()), None)
+                if best is None:
+                    break
+                if best.done():
+                    return best.result()
+                
+                timeout = None
+                hit = next((task for task in ranked if _task_hit(task)), None)
+                if hit is not None:
+                    # A lower-ranked hit is in hand: give the better query a bounded wait
+                    if deadline is None:
+                        deadline = loop.time() + config.lookup_apn_wait
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        return hit.result()
+                await asyncio.wait({task for task in ranked if not task.done()}, timeout=timeout,
+                                   return_when=asyncio.FIRST_COMPLETED)
+            
+            for task in ranked:
+                if task.exception() is not None:
+                    raise task.exception()
+            return None
+        finally:
+            for task in (apn_task, address_task):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # The loser's error is expected; don't log it as unretrieved
+    
     def save_geojson(self, boundary: ParcelBoundary, output_path: str) -> None:
         """Save parcel boundary as GeoJSON file."""
-        if not boundary.geometry:
-            raise ValueError("No geometry data to save")
-        
-        geojson = {
-            "type": "Feature",
-            "geometry": boundary.geometry,
-            "properties": {
-                "parcel_id": boundary.parcel_id,
-                "apn": boundary.apn,
-                "address": boundary.address,
-                "county": boundary.county,
-                "state": boundary.state
-            }
-        }
-        
-        with open(output_path, 'w') as f:
-            json.dump(geojson, f, indent=2)
+        from .output_sink import write_geojson
+        write_geojson(boundary, output_path)
     
     def save_vertices_csv(self, boundary: ParcelBoundary, output_path: str) -> None:
-        """Save parcel vertices as CSV file with header lat,lon."""
-        if not boundary.vertices:
-            raise ValueError("No vertices data to save")
-        
-        with open(output_path, 'w') as f:
-            f.write("lat,lon\n")
-            for lat, lon in boundary.vertices:
-                f.write(f"{lat},{lon}\n") 
\ No newline at end of file
+        """Save parcel vertices as CSV file with header lat,lon,part,ring."""
+        from .output_sink import write_vertices_csv
+        write_vertices_csv(boundary, output_path)
+
+
+def _task_hit(task: Optional[asyncio.Task]) -> bool:
+    """Whether a finished lookup task found a parcel."""
+    return task is not None and task.done() and not task.cancelled() and task.exception() is None and bool(task.result())
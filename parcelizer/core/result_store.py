@@ -0,0 +1,297 @@
+"""Persistent, spatially indexed store of processed parcel results."""
+
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import shapely
+
+from .apn import apn_key, normalize_county, normalize_state
+from .config import config
+from .geometry import ParcelGeometry, point_clusters, points_in_polygons
+
+if TYPE_CHECKING:
+    from .pipeline import ParcelResult
+    from .regrid_client import ParcelBoundary
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    source TEXT,
+    parcel_count INTEGER NOT NULL,
+    found_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    page_index INTEGER,
+    success INTEGER NOT NULL,
+    error TEXT,
+    parcel_id TEXT,
+    apn TEXT,
+    address TEXT,
+    county TEXT,
+    state TEXT,
+    extracted_apn TEXT,
+    extracted_address TEXT,
+    apn_key TEXT,
+    county_key TEXT,
+    state_key TEXT,
+    geometry BLOB
+);
+CREATE INDEX IF NOT EXISTS results_run ON results (run_id);
+CREATE INDEX IF NOT EXISTS results_apn ON results (apn_key);
+CREATE INDEX IF NOT EXISTS results_place ON results (state_key, county_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS results_rtree USING rtree (id, min_lon, max_lon, min_lat, max_lat);
+"""
+
+_FEATURE_COLUMNS = (
+    "id", "run_id", "page_index", "success", "error", "parcel_id", "apn", "address",
+    "county", "state", "extracted_apn", "extracted_address"
+)
+
+
+class ResultStore:
+    """SQLite store of every run's ParcelResults, queryable by APN, place and bbox.
+
+    Parcel bounding boxes go in an R-tree so bbox queries stay fast at
+    hundreds of thousands of parcels. Listings use keyset pagination: each
+    page returns a cursor to pass back as ``after``/``before``, so deep pages
+    cost the same as the first.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        """Open the store, creating it if needed."""
+        self.path = Path(path or config.result_store_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers don't wait for an upload being recorded
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; one per call keeps the store safe to share across threads."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one write transaction."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def record_run(self, results: List["ParcelResult"], source: Optional[str] = None,
+                   run_id: Optional[str] = None) -> str:
+        """Store a run's results; returns the run id."""
+        run_id = run_id or uuid.uuid4().hex
+        rows = []
+        boxes = []
+        for result in results:
+            info = result.vision_info
+            boundary = result.boundary if result.success else None
+            apn = (boundary.apn if boundary else None) or info.apn
+            county = (boundary.county if boundary else None) or info.county
+            state = (boundary.state if boundary else None) or info.state
+            geometry = boundary.shape.to_shapely() if boundary and boundary.shape else None
+
+            rows.append((
+                run_id, info.page_index, int(result.success), result.error,
+                boundary.parcel_id if boundary else None, apn,
+                (boundary.address if boundary else None) or info.address, county, state,
+                info.apn, info.address, apn_key(apn) or None,
+                normalize_county(county) or None, normalize_state(state) or None,
+                geometry.wkb if geometry is not None else None
+            ))
+            boxes.append(geometry.bounds if geometry is not None else None)
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO runs (id, created, source, parcel_count, found_count) VALUES (?, ?, ?, ?, ?)",
+                (run_id, time.time(), source, len(results), len([r for r in results if r.success]))
+            )
+            for row, bounds in zip(rows, boxes):
+                row_id = conn.execute(
+                    "INSERT INTO results (run_id, page_index, success, error, parcel_id, apn, address, "
+                    "county, state, extracted_apn, extracted_address, apn_key, county_key, state_key, "
+                    "geometry) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row
+                ).lastrowid
+                if bounds is not None:
+                    min_lon, min_lat, max_lon, max_lat = bounds
+                    conn.execute(
+                        "INSERT INTO results_rtree (id, min_lon, max_lon, min_lat, max_lat) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (row_id, min_lon, max_lon, min_lat, max_lat)
+                    )
+        return run_id
+
+    def list_runs(self, limit: int = 50, before: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Most recent runs first; returns the runs and the cursor for the next page."""
+        sql = "SELECT seq, id, created, source, parcel_count, found_count FROM runs"
+        params: List[Any] = []
+        if before is not None:
+            sql += " WHERE seq < ?"
+            params.append(before)
+        sql += " ORDER BY seq DESC LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        runs = [{key: row[key] for key in ("id", "created", "source", "parcel_count", "found_count")}
+                for row in rows]
+        return runs, (rows[-1]["seq"] if len(rows) == limit else None)
+
+    def run_parcels(self, run_id: str) -> Optional[List["ParcelBoundary"]]:
+        """The parcels a run found, in the order recorded; None for an unknown run."""
+        from .regrid_client import ParcelBoundary
+
+        conn = self._connect()
+        try:
+            if conn.execute("SELECT 1 FROM runs WHERE id = ?", (run_id,)).fetchone() is None:
+                return None
+            rows = conn.execute(
+                "SELECT parcel_id, apn, address, county, state, geometry FROM results "
+                "WHERE run_id = ? AND success = 1 AND geometry IS NOT NULL ORDER BY id",
+                (run_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        geometries = shapely.from_wkb([row["geometry"] for row in rows])
+        return [
+            ParcelBoundary(
+                parcel_id=row["parcel_id"], apn=row["apn"], address=row["address"],
+                county=row["county"], state=row["state"], shape=ParcelGeometry.from_shapely(geometry)
+            )
+            for row, geometry in zip(rows, geometries)
+        ]
+
+    def find_points(self, lons: np.ndarray, lats: np.ndarray) -> Tuple[np.ndarray, List["ParcelBoundary"]]:
+        """Match points to stored parcels in one vectorized pass.
+
+        Candidates are read through the R-tree one grid cell of points at a
+        time, so scattered points don't pull in everything between them. The
+        most recent copy of a parcel wins. Returns, per point, the index of its
+        parcel in the returned list or -1.
+        """
+        from .regrid_client import ParcelBoundary
+
+        rows = {}
+        conn = self._connect()
+        try:
+            for (min_lon, min_lat, max_lon, max_lat), _ in point_clusters(lons, lats, config.point_cell_size):
+                for row in conn.execute(
+                    "SELECT r.id, r.parcel_id, r.apn, r.address, r.county, r.state, r.geometry "
+                    "FROM results_rtree t JOIN results r ON r.id = t.id "
+                    "WHERE t.min_lon <= ? AND t.max_lon >= ? AND t.min_lat <= ? AND t.max_lat >= ?",
+                    (max_lon, min_lon, max_lat, min_lat)
+                ):
+                    previous = rows.get(row["parcel_id"])
+                    if previous is None or previous["id"] < row["id"]:
+                        rows[row["parcel_id"]] = row
+        finally:
+            conn.close()
+
+        if not rows:
+            return np.full(len(lons), -1, dtype=np.int64), []
+        candidates = list(rows.values())
+        tree = shapely.STRtree(shapely.from_wkb([row["geometry"] for row in candidates]))
+        matched, positions = points_in_polygons(lons, lats, tree)
+
+        parcels = []
+        for i in matched:
+            row = candidates[i]
+            parcels.append(ParcelBoundary(
+                parcel_id=row["parcel_id"], apn=row["apn"], address=row["address"],
+                county=row["county"], state=row["state"],
+                shape=ParcelGeometry.from_shapely(tree.geometries[i])
+            ))
+        return positions, parcels
+
+    def query(self, apn: Optional[str] = None, county: Optional[str] = None,
+              state: Optional[str] = None, run_id: Optional[str] = None,
+              bbox: Optional[Tuple[float, float, float, float]] = None, found_only: bool = False,
+              limit: int = 100, after: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Stored results as GeoJSON features, oldest first.
+
+        ``bbox`` (min_lon, min_lat, max_lon, max_lat) matches parcels whose
+        bounding box intersects it. Returns the features and the cursor for
+        the next page.
+        """
+        conditions = []
+        params: List[Any] = []
+        if apn:
+            conditions.append("apn_key = ?")
+            params.append(apn_key(apn))
+        if state:
+            conditions.append("state_key = ?")
+            params.append(normalize_state(state))
+        if county:
+            conditions.append("county_key = ?")
+            params.append(normalize_county(county))
+        if run_id:
+            conditions.append("run_id = ?")
+            params.append(run_id)
+        if found_only:
+            conditions.append("success = 1")
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            # The cursor goes inside the R-tree query too, so later pages of a
+            # large area don't collect every earlier hit first
+            conditions.append(
+                "id IN (SELECT id FROM results_rtree WHERE min_lon <= ? AND max_lon >= ? "
+                "AND min_lat <= ? AND max_lat >= ? AND id > ?)"
+            )
+            params.extend((max_lon, min_lon, max_lat, min_lat, after or 0))
+        if after is not None:
+            conditions.append("id > ?")
+            params.append(after)
+
+        sql = f"SELECT {', '.join(_FEATURE_COLUMNS)}, geometry FROM results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        geometries = shapely.from_wkb([row["geometry"] for row in rows])
+        features = []
+        for row, geometry in zip(rows, geometries):
+            properties = {key: row[key] for key in _FEATURE_COLUMNS}
+            properties["success"] = bool(properties["success"])
+            parcel_shape = ParcelGeometry.from_shapely(geometry) if geometry is not None else None
+            features.append({
+                "type": "Feature",
+                "id": row["id"],
+                "geometry": parcel_shape.quantized(config.map_precision).to_geojson() if parcel_shape else None,
+                "properties": properties
+            })
+        return features, (rows[-1]["id"] if len(rows) == limit else None)
@@ -0,0 +1,105 @@
+"""JSON serialization and response compression."""
+
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+def _default(obj: Any) -> Any:
+    """Serialize the non-JSON types that show up in parcel data."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON, compact unless ``indent`` is set.
+
+    Uses orjson when it is installed and the standard library otherwise.
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    if indent:
+        return json.dumps(obj, indent=2, default=_default).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from bytes or str."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_to_file(obj: Any, path: Path, indent: bool = False) -> None:
+    """Write ``obj`` as JSON to ``path``."""
+    with open(path, "wb") as f:
+        f.write(dumps(obj, indent=indent))
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported content encoding from an Accept-Encoding header."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+
+    if BROTLI_AVAILABLE and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str, best: bool = False) -> bytes:
+    """Compress with a speed-oriented level, suited to per-request payloads.
+
+    ``best`` uses the highest level instead, for content compressed once and
+    served many times (static assets).
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else 4)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9 if best else 5, mtime=0)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def negotiate_compression(data: bytes, accept_encoding: str,
+                          min_size: int = 1024) -> Tuple[bytes, Optional[str]]:
+    """Compress ``data`` for a client if it is large enough and the client accepts it."""
+    if len(data) < min_size:
+        return data, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return data, None
+    return compress(data, encoding), encoding
@@ -0,0 +1,60 @@
+"""Coalescing of duplicate in-flight calls."""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its result.
+
+    The shared result is a ``concurrent.futures.Future`` so callers on other
+    threads and event loops (the web app runs one loop per request) can wait
+    on it too. If the leading call is cancelled, a waiting caller takes over
+    instead of inheriting the cancellation.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the in-flight table."""
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, concurrent.futures.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Return ``await func()``, sharing one call among concurrent callers with ``key``."""
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self._calls[key] = future
+
+            if leader:
+                return await self._lead(key, future, func)
+
+            try:
+                # Shield so a follower being cancelled doesn't cancel the shared call
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    continue  # The leader was cancelled; retry and lead ourselves
+                raise
+
+    async def _lead(self, key: Hashable, future: concurrent.futures.Future,
+                    func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run the call and publish its outcome to followers."""
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
@@ -0,0 +1,119 @@
+"""Fingerprinted, pre-compressed static assets for the web app."""
+
+import hashlib
+import mimetypes
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .serialization import BROTLI_AVAILABLE, choose_encoding, compress
+
+# Types worth compressing; images and fonts are already compressed
+COMPRESSIBLE_TYPES = {"application/javascript", "application/json", "image/svg+xml", "text/css",
+                      "text/html", "text/javascript", "text/plain"}
+
+# Browsers and proxies may keep fingerprinted files for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@dataclass(slots=True)
+class StaticAsset:
+    """One static file with its fingerprint and pre-compressed variants."""
+    path: str  # relative to the static folder, e.g. "css/style.css"
+    fingerprinted_path: str  # e.g. "css/style.3f2a9c1e7b4d.css"
+    digest: str
+    mimetype: str
+    mtime_ns: int
+    variants: Dict[Optional[str], bytes]  # content encoding (None = identity) -> body
+
+    def encoding_for(self, accept_encoding: str) -> Optional[str]:
+        """The best variant a client accepts (None for the uncompressed file)."""
+        encoding = choose_encoding(accept_encoding)
+        return encoding if encoding in self.variants else None
+
+    def etag(self, encoding: Optional[str]) -> str:
+        """Strong ETag of one variant; variants differ byte for byte, so their tags do too."""
+        return f"{self.digest}-{encoding}" if encoding else self.digest
+
+
+class StaticAssets:
+    """The files of a static folder, fingerprinted and compressed once at startup.
+
+    Each file is also served under a name carrying a hash of its content
+    (``app.<hash>.js``), so pages can link to that name and let clients cache
+    it forever: a changed file gets a new name. Compressible files get gzip
+    and, when brotli is installed, brotli variants at the highest levels,
+    kept only when smaller than the original. Everything is held in memory;
+    the folder is a few small files.
+    """
+
+    def __init__(self, root: Path, min_size: int = 1024) -> None:
+        """Scan and fingerprint the static folder."""
+        self.root = Path(root)
+        self.min_size = min_size
+        self._lock = threading.Lock()
+        self._assets: Dict[str, StaticAsset] = {}
+        self._by_url: Dict[str, Tuple[StaticAsset, bool]] = {}
+        self.refresh()
+
+    def __len__(self) -> int:
+        """Number of assets."""
+        return len(self._assets)
+
+    def refresh(self) -> None:
+        """Pick up added, changed and removed files (cheap when nothing changed)."""
+        files = {
+            file.relative_to(self.root).as_posix(): file
+            for file in self.root.rglob("*") if file.is_file() and not file.name.startswith(".")
+        } if self.root.is_dir() else {}
+
+        with self._lock:
+            assets = {}
+            for path, file in files.items():
+                asset = self._assets.get(path)
+                if asset is None or asset.mtime_ns != file.stat().st_mtime_ns:
+                    asset = self._load(path, file)
+                assets[path] = asset
+            if assets.keys() == self._assets.keys() and all(
+                    assets[path] is self._assets[path] for path in assets):
+                return
+
+            self._assets = assets
+            self._by_url = {}
+            for asset in assets.values():
+                self._by_url[asset.path] = (asset, False)
+                self._by_url[asset.fingerprinted_path] = (asset, True)
+
+    def url_path(self, path: str) -> str:
+        """The fingerprinted name to link to (the plain name for unknown files)."""
+        asset = self._assets.get(path)
+        return asset.fingerprinted_path if asset else path
+
+    def lookup(self, url_path: str) -> Tuple[Optional[StaticAsset], bool]:
+        """The asset a requested name refers to, and whether the name was fingerprinted."""
+        return self._by_url.get(url_path, (None, False))
+
+    def _load(self, path: str, file: Path) -> StaticAsset:
+        """Read, hash and compress one file."""
+        data = file.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        variants: Dict[Optional[str], bytes] = {None: data}
+        if mimetype in COMPRESSIBLE_TYPES and len(data) >= self.min_size:
+            for encoding in ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",):
+                compressed = compress(data, encoding, best=True)
+                if len(compressed) < len(data):
+                    variants[encoding] = compressed
+
+        stem, dot, suffix = path.rpartition(".")
+        fingerprinted_path = f"{stem}.{digest}.{suffix}" if dot and "/" not in suffix else f"{path}.{digest}"
+        return StaticAsset(
+            path=path,
+            fingerprinted_path=fingerprinted_path,
+            digest=digest,
+            mimetype=mimetype,
+            mtime_ns=file.stat().st_mtime_ns,
+            variants=variants
+        )
@@ -0,0 +1,169 @@
+"""Local caching proxy for map tiles and frontend vendor files."""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from .output_sink import atomic_output
+
+# Vendor files the proxy may fetch (it is not an open proxy); versions match the page
+VENDOR_PREFIXES = ("leaflet@1.9.4/dist/",)
+
+# Tile servers ask clients to identify themselves
+USER_AGENT = "parcelizer/0.1 (local tile cache)"
+
+
+class UpstreamError(RuntimeError):
+    """The upstream server could not provide a file that isn't cached."""
+
+    def __init__(self, message: str, status_code: int = 502) -> None:
+        """Initialize with the HTTP status to answer with."""
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DiskLRUCache:
+    """Files on disk, evicting the least recently used once over a size limit.
+
+    Recency is kept in file modification times (touched on every hit), so
+    it survives restarts and a cache directory can be seeded by copying
+    another one. Processes sharing a directory each track their own view and
+    tolerate files evicted by the others.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        """Open the cache, indexing the files already there."""
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, oldest first
+        self._size = 0
+        files = []
+        for file in self.directory.iterdir():
+            if file.is_file() and not file.name.startswith("."):
+                stat = file.stat()
+                files.append((stat.st_mtime_ns, file.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    @property
+    def size(self) -> int:
+        """Bytes currently cached."""
+        return self._size
+
+    def __len__(self) -> int:
+        """Number of cached files."""
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The cached data for ``key``, if any."""
+        name = self._name(key)
+        path = self.directory / name
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(name)
+            return None
+
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+            else:
+                self._entries[name] = len(data)  # Written by another process
+                self._size += len(data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store ``data`` for ``key``, evicting old entries to stay under the limit."""
+        name = self._name(key)
+        with atomic_output(self.directory / name) as tmp_path:
+            tmp_path.write_bytes(data)
+
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def _name(self, key: str) -> str:
+        """File name for a key."""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _forget(self, name: str) -> None:
+        """Drop an entry from the index (lock held)."""
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._size -= size
+
+    def _evict(self) -> None:
+        """Delete the least recently used files until under the limit (lock held)."""
+        while self._size > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            (self.directory / name).unlink(missing_ok=True)
+
+
+class TileProxy:
+    """Serves base-map tiles and vendor files from a disk cache, fetching misses upstream.
+
+    For deployments with slow, metered or no internet access: panning over
+    an area seen before, and every page load after the first, is served
+    locally. The cache directory can be pre-seeded for fully offline use.
+    """
+
+    def __init__(self, cache: DiskLRUCache, tile_url: str, vendor_url: str, timeout: float = 10.0) -> None:
+        """Initialize the proxy."""
+        self.cache = cache
+        self.tile_url = tile_url
+        self.vendor_url = vendor_url.rstrip("/") + "/"
+        self._client = httpx.Client(timeout=timeout, headers={"User-Agent": USER_AGENT}, follow_redirects=True)
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        """One base-map tile."""
+        url = self.tile_url.format(z=z, x=x, y=y, s="a")
+        return self._get(f"tile/{z}/{x}/{y}", url)
+
+    def vendor_file(self, path: str) -> bytes:
+        """One allowed vendor file, e.g. ``leaflet@1.9.4/dist/leaflet.js``."""
+        if not is_vendor_path(path):
+            raise UpstreamError(f"Not an allowed vendor file: {path}", status_code=404)
+        return self._get(f"vendor/{path}", self.vendor_url + path)
+
+    def close(self) -> None:
+        """Close the upstream connection pool."""
+        self._client.close()
+
+    def _get(self, key: str, url: str) -> bytes:
+        """Serve from the cache, or fetch and cache."""
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        try:
+            response = self._client.get(url)
+        except httpx.HTTPError as e:
+            raise UpstreamError(f"Fetching {url} failed: {e}") from e
+        if response.status_code != 200:
+            raise UpstreamError(f"Fetching {url} returned HTTP {response.status_code}",
+                                status_code=404 if response.status_code == 404 else 502)
+
+        data = response.content
+        self.cache.put(key, data)
+        return data
+
+
+def is_vendor_path(path: str) -> bool:
+    """Whether a vendor file may be fetched through the proxy."""
+    return ".." not in path.split("/") and path.startswith(VENDOR_PREFIXES)
@@ -0,0 +1,94 @@
+"""Zoom-dependent GeoJSON tiles over the parcels of a run."""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import shapely
+
+from .config import config
+from .geometry import simplify_tolerance, total_bounds
+from .regrid_client import ParcelBoundary
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Bounds of a web-mercator XYZ tile as ``(min_lon, min_lat, max_lon, max_lat)``."""
+    n = 2 ** z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+class TileIndex:
+    """Serves a run's parcels as simplified GeoJSON tiles.
+
+    Parcels are held in a shapely STRtree so each tile is a single spatial
+    query. Geometries are simplified to sub-pixel error for the tile's zoom and
+    quantized, and parcels smaller than a pixel are left out, so a tile's size
+    tracks what is visible rather than how many parcels the run found.
+    Rendered tiles are kept in a small LRU cache.
+    """
+
+    def __init__(self, boundaries: List[ParcelBoundary], cache_size: int = 256) -> None:
+        """Build the spatial index."""
+        self.boundaries = [boundary for boundary in boundaries if boundary.shape]
+        self.tree = shapely.STRtree([boundary.shape.to_shapely() for boundary in self.boundaries])
+        self.bbox = total_bounds([boundary.shape for boundary in self.boundaries])
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[int, int, int], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def center(self) -> Optional[List[float]]:
+        """Map center as ``[lat, lon]``."""
+        if not self.bbox:
+            return None
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        return [(min_lat + max_lat) / 2, (min_lon + max_lon) / 2]
+
+    def get_tile(self, z: int, x: int, y: int) -> Dict[str, Any]:
+        """Return the FeatureCollection for a tile, rendering it on a cache miss."""
+        key = (z, x, y)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        tile = self._render_tile(z, x, y)
+
+        with self._lock:
+            self._cache[key] = tile
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tile
+
+    def _render_tile(self, z: int, x: int, y: int) -> Dict[str, Any]:
+        """Query and simplify the parcels intersecting a tile."""
+        tolerance = simplify_tolerance(z, config.map_simplify_pixels)
+        pixel = simplify_tolerance(z, 1.0)
+
+        features = []
+        for index in self.tree.query(shapely.box(*tile_bounds(z, x, y)), predicate="intersects"):
+            boundary = self.boundaries[index]
+            min_lon, min_lat, max_lon, max_lat = boundary.shape.bounds
+            if max_lon - min_lon < pixel and max_lat - min_lat < pixel:
+                continue  # Smaller than a pixel at this zoom
+
+            map_shape = boundary.shape.simplified(tolerance).quantized(config.map_precision)
+            features.append({
+                "type": "Feature",
+                "id": int(index),
+                "geometry": map_shape.to_geojson(),
+                "properties": {
+                    "parcel_id": boundary.parcel_id,
+                    "apn": boundary.apn,
+                    "address": boundary.address,
+                    "county": boundary.county,
+                    "state": boundary.state
+                }
+            })
+
+        return {"type": "FeatureCollection", "features": features}
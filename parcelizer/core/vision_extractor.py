@@ -1,25 +1,140 @@
 """Vision-based parcel information extraction using OpenAI o4-mini."""
 
 import asyncio
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import hashlib
+import threading
+from typing import Dict, Hashable, List, Optional, Any, Tuple
+from dataclasses import dataclass, field, fields, replace
 
 import httpx
 from openai import AsyncOpenAI
 from PIL import Image
 
+from .apn import address_key, apn_key
 from .config import config
 from .image_processor import ImageProcessor
+from .singleflight import SingleFlight
 
 
-@dataclass
+@dataclass(slots=True)
 class ParcelInfo:
     """Extracted parcel information."""
     apn: Optional[str] = None
     address: Optional[str] = None
     county: Optional[str] = None
     state: Optional[str] = None
+    confidence: Optional[str] = None
     raw_response: Optional[str] = None
+    page_index: Optional[int] = None  # page (image) the parcel was read from
+
+
+def parcel_key(info: ParcelInfo) -> Optional[Hashable]:
+    """Identity of an extracted parcel: its APN, or its address if it has no APN."""
+    if info.apn and apn_key(info.apn):
+        return ("apn", apn_key(info.apn))
+    if info.address and address_key(info.address):
+        return ("address", address_key(info.address))
+    return None
+
+
+def merge_parcel_info(previous: ParcelInfo, current: ParcelInfo) -> ParcelInfo:
+    """Combine two readings of one parcel; ``current`` wins where both have a value."""
+    merged = ParcelInfo(**{
+        f.name: getattr(current, f.name) or getattr(previous, f.name) for f in fields(ParcelInfo)
+    })
+    if previous.page_index is not None:
+        merged.page_index = previous.page_index  # Report the page it first appeared on
+    return merged
+
+
+def dedupe_parcels(parcels: List[ParcelInfo]) -> List[ParcelInfo]:
+    """Collapse repeated parcels (same APN, or same address) into one entry each.
+    
+    Repeats are merged field by field. Entries with neither an APN nor an
+    address are dropped, except that a page with nothing identifiable keeps
+    one entry so it still shows up as a failed result.
+    """
+    merged: Dict[Hashable, ParcelInfo] = {}
+    identified_pages = set()
+    for info in parcels:
+        key = parcel_key(info)
+        if key is None:
+            key = ("page", info.page_index)
+        else:
+            identified_pages.add(info.page_index)
+        previous = merged.get(key)
+        merged[key] = info if previous is None else merge_parcel_info(previous, info)
+    
+    return [
+        info for key, info in merged.items()
+        if key[0] != "page" or key[1] not in identified_pages
+    ]
+
+
+@dataclass(slots=True)
+class VisionStep:
+    """One rung of the resolution ladder."""
+    max_size: int
+    detail: str = "high"  # OpenAI image detail: "low" is a flat, small token cost
+    crop: Optional[str] = None  # "title" to send only the title block
+
+
+def parse_vision_ladder(spec: str) -> List[VisionStep]:
+    """Parse a ladder like "512:low,1024:high,title:high"."""
+    steps = []
+    for item in spec.split(","):
+        size, _, detail = item.strip().partition(":")
+        if size == "title":
+            steps.append(VisionStep(max_size=1024, detail=detail or "high", crop="title"))
+        else:
+            steps.append(VisionStep(max_size=int(size), detail=detail or "high"))
+    if not steps:
+        raise ValueError("Vision ladder needs at least one step")
+    return steps
+
+
+@dataclass(slots=True)
+class PreparedPage:
+    """A page reduced to the images the resolution ladder sends; the full render can be dropped."""
+    page_index: Optional[int]
+    image: Optional[Image.Image]  # whole page, no larger than the ladder's biggest full-page step
+    title: Optional[Image.Image] = None  # title block, if the ladder has a title step
+    encoded: Dict[int, str] = field(default_factory=dict)  # base64 PNG per ladder step
+    
+    @property
+    def megapixels(self) -> float:
+        """Megapixels held by the page's images."""
+        return sum(img.width * img.height for img in (self.image, self.title) if img is not None) / 1_000_000
+
+
+class TokenBudget:
+    """Per-run accounting of vision tokens; escalation stops once the limit is spent."""
+    
+    def __init__(self, limit: int = 0) -> None:
+        """Initialize the budget (``limit`` 0 means unlimited)."""
+        self.limit = limit
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def total_tokens(self) -> int:
+        """Tokens spent so far."""
+        return self.prompt_tokens + self.completion_tokens
+    
+    @property
+    def exhausted(self) -> bool:
+        """Whether the run has used up its budget."""
+        return bool(self.limit) and self.total_tokens >= self.limit
+    
+    def charge(self, usage: Any) -> None:
+        """Record the usage reported for one API call."""
+        with self._lock:
+            self.calls += 1
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
 
 
 class VisionExtractor:
@@ -30,9 +145,16 @@ class VisionExtractor:
         self.client = AsyncOpenAI(api_key=config.openai_api_key)
         self.image_processor = ImageProcessor()
         
+        # Identical pages (repeated sheets, concurrent uploads) share one API call
+        self._inflight = SingleFlight()
+        
+        # Cheapest first; later steps only run for pages the earlier ones couldn't read
+        self.ladder = parse_vision_ladder(config.vision_ladder)
+        
         # Prompt template for extracting parcel information
         self.extraction_prompt = """
-You are analyzing a parcel boundary map or property document. Please extract the following information:
+You are analyzing a parcel boundary map or property document. It may show a single parcel or many
+(for example every lot on a subdivision plat). For EACH parcel shown, extract the following information:
 
 1. APN (Assessor's Parcel Number) - Look for patterns like "APN:", "Parcel #:", or similar numeric identifiers
 2. Street Address - Complete street address including house number, street name, and any unit/suite numbers
@@ -41,63 +163,149 @@ You are analyzing a parcel boundary map or property document. Please extract the
 
 Please respond in JSON format with the following structure:
 {
-    "apn": "extracted APN or null if not found",
-    "address": "complete street address or null if not found", 
-    "county": "county name or null if not found",
-    "state": "state name/abbreviation or null if not found",
+    "parcels": [
+        {
+            "apn": "extracted APN or null if not found",
+            "address": "complete street address or null if not found",
+            "county": "county name or null if not found",
+            "state": "state name/abbreviation or null if not found"
+        }
+    ],
     "confidence": "high/medium/low based on clarity of information"
 }
 
-If you cannot find specific information, return null for that field. Be precise and only extract information you can clearly identify.
+List each parcel once. Repeat the county and state on every parcel they apply to. If you cannot find
+specific information, return null for that field; if no parcel can be identified, return an empty list.
+Be precise and only extract information you can clearly identify.
         """.strip()
     
-    async def extract_from_image(self, image: Image.Image) -> ParcelInfo:
-        """Extract parcel information from a single image."""
+    def prepare_page(self, image: Image.Image, page_index: Optional[int] = None) -> PreparedPage:
+        """Downscale a rendered page for every ladder step and encode the first step.
+        
+        The result holds at most one reduced copy of the page and of its title
+        block, so the full-resolution render can be released straight away.
+        """
+        page_sizes = [step.max_size for step in self.ladder if step.crop != "title"]
+        title_sizes = [step.max_size for step in self.ladder if step.crop == "title"]
+        
+        page = PreparedPage(
+            page_index=page_index,
+            image=self.image_processor.resize_image_for_api(image, max(page_sizes)) if page_sizes else None,
+            title=self.image_processor.resize_image_for_api(
+                self.image_processor.crop_title_block(image), max(title_sizes)
+            ) if title_sizes else None
+        )
+        page.encoded[0] = self._encode_step(page, self.ladder[0])
+        return page
+    
+    def _encode_step(self, page: PreparedPage, step: VisionStep) -> str:
+        """Base64 PNG of the image a ladder step sends."""
+        source = page.title if step.crop == "title" else page.image
+        return self.image_processor.image_to_base64(
+            self.image_processor.resize_image_for_api(source, max_size=step.max_size)
+        )
+    
+    async def extract_from_image(self, image: Image.Image, budget: Optional[TokenBudget] = None,
+                                 page_index: Optional[int] = None) -> List[ParcelInfo]:
+        """Extract every parcel shown on a single image."""
+        page = await asyncio.to_thread(self.prepare_page, image, page_index)
+        return await self.extract_from_prepared(page, budget)
+    
+    async def extract_from_prepared(self, page: PreparedPage,
+                                    budget: Optional[TokenBudget] = None) -> List[ParcelInfo]:
+        """Extract every parcel shown on a prepared page.
+        
+        Walks the resolution ladder: the first step always runs, and each later
+        step only runs while required fields are missing or confidence is low
+        and the run's token budget isn't spent. A higher-resolution reading of
+        the full page replaces the earlier ones, so a misread APN doesn't
+        survive next to its correction; title-block crops add to the page's.
+        """
+        budget = budget or TokenBudget(config.vision_token_budget)
+        parcels = None
+        page_parcels: List[ParcelInfo] = []
+        title_parcels: List[ParcelInfo] = []
+        
         try:
-            # Resize image for API efficiency
-            processed_image = self.image_processor.resize_image_for_api(image)
-            
-            # Convert to base64 for API call
-            base64_image = self.image_processor.image_to_base64(processed_image)
+            for level, step in enumerate(self.ladder):
+                if level > 0 and (not self._needs_escalation(parcels) or budget.exhausted):
+                    break
+                
+                base64_image = page.encoded.get(level)
+                if base64_image is None:
+                    base64_image = await asyncio.to_thread(self._encode_step, page, step)
+                
+                key = hashlib.sha256(f"{step.detail}:{base64_image}".encode("ascii")).hexdigest()
+                step_parcels = await self._inflight.do(
+                    key, lambda: self._request_extraction(base64_image, step.detail, budget)
+                )
+                if step.crop == "title":
+                    title_parcels = step_parcels
+                elif not page_parcels or any(info.apn or info.address for info in step_parcels):
+                    # Keep an earlier reading only if this one found nothing at all
+                    page_parcels = step_parcels
+                parcels = dedupe_parcels(page_parcels + title_parcels)
             
-            # Make API call to OpenAI
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Using o4-mini as specified
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": self.extraction_prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=1000,
-                temperature=0.1  # Low temperature for consistent extraction
-            )
-            
-            # Parse response
-            response_text = response.choices[0].message.content
-            return self._parse_response(response_text)
+            # Results may be shared with other callers through single-flight, so copy before tagging
+            return [replace(info, page_index=page.page_index) for info in parcels]
             
         except Exception as e:
             raise RuntimeError(f"Vision extraction failed: {e}")
     
+    def _needs_escalation(self, parcels: List[ParcelInfo]) -> bool:
+        """Whether a page yielded no identifiable parcel or was read with low confidence."""
+        if not any(info.apn or info.address for info in parcels):
+            return True
+        return any(info.confidence == "low" for info in parcels)
+    
+    async def _request_extraction(self, base64_image: str, detail: str = "high",
+                                  budget: Optional[TokenBudget] = None) -> List[ParcelInfo]:
+        """Send one encoded image to the vision model and parse its answer."""
+        # Make API call to OpenAI
+        response = await self.client.chat.completions.create(
+            model="gpt-4o-mini",  # Using o4-mini as specified
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": self.extraction_prompt
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/png;base64,{base64_image}",
+                                "detail": detail
+                            }
+                        }
+                    ]
+                }
+            ],
+            max_tokens=4096,  # Room for a plat listing dozens of lots
+            temperature=0.1  # Low temperature for consistent extraction
+        )
+        
+        if budget is not None:
+            budget.charge(response.usage)
+        
+        # Parse response
+        response_text = response.choices[0].message.content
+        return self._parse_response(response_text)
+
     async def extract_from_images(self, images: List[Image.Image]) -> List[ParcelInfo]:
-        """Extract parcel information from multiple images concurrently."""
-        tasks = [self.extract_from_image(image) for image in images]
-        return await asyncio.gather(*tasks)
+        """Extract parcel information from multiple images concurrently.
+        
+        Returns every parcel found, in page order, each tagged with its page.
+        """
+        budget = TokenBudget(config.vision_token_budget)
+        tasks = [self.extract_from_image(image, budget, page_index=i) for i, image in enumerate(images)]
+        pages = await asyncio.gather(*tasks)
+        print(f"Vision: {budget.calls} call(s), {budget.total_tokens} tokens")
+        return [info for parcels in pages for info in parcels]
     
-    def _parse_response(self, response_text: str) -> ParcelInfo:
-        """Parse the JSON response from OpenAI."""
+    def _parse_response(self, response_text: str) -> List[ParcelInfo]:
+        """Parse the JSON response from OpenAI into one ParcelInfo per parcel."""
         try:
             import json
             
@@ -110,39 +318,56 @@ If you cannot find specific information, return null for that field. Be precise
             
             data = json.loads(response_text)
             
-            return ParcelInfo(
-                apn=data.get("apn"),
-                address=data.get("address"),
-                county=data.get("county"),
-                state=data.get("state"),
-                raw_response=response_text
-            )
+            # Accept a bare list or a single parcel object as well as {"parcels": [...]}
+            if isinstance(data, list):
+                data = {"parcels": data}
+            elif "parcels" not in data:
+                data = {"parcels": [data], "confidence": data.get("confidence")}
+            
+            raw_response = response_text if config.keep_raw_responses else None
+            parcels = [
+                ParcelInfo(
+                    apn=item.get("apn"),
+                    address=item.get("address"),
+                    county=item.get("county"),
+                    state=item.get("state"),
+                    confidence=item.get("confidence") or data.get("confidence"),
+                    raw_response=raw_response
+                )
+                for item in data.get("parcels") or [] if isinstance(item, dict)
+            ]
+            return parcels or [ParcelInfo(confidence=data.get("confidence"), raw_response=raw_response)]
             
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, AttributeError):
             # If JSON parsing fails, return raw response
-            return ParcelInfo(raw_response=response_text)
+            return [ParcelInfo(raw_response=response_text)]
     
     def extract_coordinates_info(self, coordinates: str) -> ParcelInfo:
         """Extract parcel information from coordinates (lat, lon)."""
-        try:
-            # Parse coordinates
-            coords = coordinates.strip().split(',')
-            if len(coords) != 2:
-                raise ValueError("Coordinates must be in format: lat,lon")
-            
-            lat = float(coords[0].strip())
-            lon = float(coords[1].strip())
-            
-            # For coordinates, we'll use reverse geocoding approach
-            # This is a simplified version - in production you'd use a proper geocoding service
-            return ParcelInfo(
-                address=f"Coordinates: {lat}, {lon}",
-                raw_response=f"Processed coordinates: {lat}, {lon}"
-            )
-            
-        except (ValueError, IndexError) as e:
-            raise ValueError(f"Invalid coordinates format: {e}")
+        lat, lon = parse_coordinates(coordinates)
+        
+        # For coordinates, we'll use reverse geocoding approach
+        # This is a simplified version - in production you'd use a proper geocoding service
+        return ParcelInfo(
+            address=f"Coordinates: {lat}, {lon}",
+            raw_response=f"Processed coordinates: {lat}, {lon}"
+        )
     
     async def close(self) -> None:
         """Clean up resources."""
-        await self.client.close() 
\ No newline at end of file
+        await self.client.close() 
+
+
+def parse_coordinates(coordinates: str) -> Tuple[float, float]:
+    """Parse a "lat, lon" string."""
+    try:
+        coords = coordinates.strip().split(',')
+        if len(coords) != 2:
+            raise ValueError("Coordinates must be in format: lat,lon")
+        
+        lat = float(coords[0].strip())
+        lon = float(coords[1].strip())
+        return lat, lon
+        
+    except (ValueError, IndexError) as e:
+        raise ValueError(f"Invalid coordinates format: {e}")
\ No newline at end of file
@@ -0,0 +1,318 @@
+"""Shared page-level work queue for distributed batch processing."""
+
+import asyncio
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from .config import config
+from .output_sink import OutputSink
+
+if TYPE_CHECKING:
+    from .pipeline import ParcelPipeline
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    UNIQUE (file, page)
+);
+CREATE INDEX IF NOT EXISTS work_items_status ON work_items (status, lease_expires);
+"""
+
+
+@dataclass(slots=True)
+class WorkItem:
+    """One page of one input file."""
+    id: int
+    file: Path
+    page: int  # 0-based
+    attempts: int = 0
+
+
+class WorkQueue:
+    """Page-level work queue in a SQLite file that several processes share.
+
+    Workers claim items under a time-limited lease and renew it while they
+    work; an item whose lease runs out (its worker crashed or lost the shared
+    filesystem) becomes claimable again, until ``max_attempts`` claims have
+    been used. The default rollback journal is kept rather than WAL, since WAL
+    needs shared memory and does not work across hosts.
+    """
+
+    def __init__(self, path: Optional[Path] = None, lease_seconds: Optional[float] = None,
+                 max_attempts: Optional[int] = None) -> None:
+        """Open the queue, creating it if needed."""
+        self.path = Path(path or config.queue_path)
+        self.lease_seconds = lease_seconds or config.queue_lease_seconds
+        self.max_attempts = max_attempts or config.queue_max_attempts
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that waits out other processes' locks."""
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one write transaction on a short-lived connection."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def enqueue(self, file_path: Path, page_count: int) -> int:
+        """Add every page of a file; pages already queued are left as they are."""
+        file_name = str(Path(file_path).resolve())
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO work_items (file, page) VALUES (?, ?)",
+                [(file_name, page) for page in range(page_count)]
+            )
+            return conn.total_changes - before
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[WorkItem]:
+        """Lease up to ``limit`` pending (or abandoned) items to a worker."""
+        now = time.time()
+        with self._transaction() as conn:
+            # Abandoned items that have used up their attempts are given up on
+            conn.execute(
+                "UPDATE work_items SET status = 'failed', error = 'lease expired' "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            rows = conn.execute(
+                "SELECT id, file, page, attempts FROM work_items "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE work_items SET status = 'leased', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                [(worker_id, now + self.lease_seconds, row[0]) for row in rows]
+            )
+        return [WorkItem(id=row[0], file=Path(row[1]), page=row[2], attempts=row[3] + 1) for row in rows]
+
+    def heartbeat(self, worker_id: str) -> int:
+        """Extend the leases of every item a worker holds; returns how many it still holds."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE work_items SET lease_expires = ? WHERE status = 'leased' AND worker = ?",
+                (time.time() + self.lease_seconds, worker_id)
+            ).rowcount
+
+    def complete(self, item_ids: List[int], worker_id: str) -> int:
+        """Mark items done; items whose lease passed to another worker are skipped."""
+        with self._transaction() as conn:
+            return sum(conn.execute(
+                "UPDATE work_items SET status = 'done', lease_expires = NULL, error = NULL "
+                "WHERE id = ? AND status = 'leased' AND worker = ?",
+                (item_id, worker_id)
+            ).rowcount for item_id in item_ids)
+
+    def fail(self, item_ids: List[int], worker_id: str, error: str) -> None:
+        """Return items to the queue for another attempt, or mark them failed."""
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE work_items SET lease_expires = NULL, error = ?, "
+                "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END "
+                "WHERE id = ? AND status = 'leased' AND worker = ?",
+                [(error, self.max_attempts, item_id, worker_id) for item_id in item_ids]
+            )
+
+    def defer(self, item_ids: List[int], worker_id: str, error: str) -> None:
+        """Return items to the queue without counting the attempt (e.g. Regrid was throttling)."""
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE work_items SET status = 'pending', lease_expires = NULL, error = ?, "
+                "attempts = attempts - 1 WHERE id = ? AND status = 'leased' AND worker = ?",
+                [(error, item_id, worker_id) for item_id in item_ids]
+            )
+
+    def release(self, worker_id: str) -> int:
+        """Hand a worker's unfinished items back without counting the attempt."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE work_items SET status = 'pending', lease_expires = NULL, "
+                "attempts = attempts - 1 WHERE status = 'leased' AND worker = ?",
+                (worker_id,)
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of items in each status."""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class LeaseLost(RuntimeError):
+    """A worker could not renew its leases, so it stopped working on them."""
+
+
+class QueueWorker:
+    """Claims pages from a WorkQueue and runs them through a ParcelPipeline.
+
+    Parcels go to this worker's own part files in the pipeline's output
+    directory (``part-<worker>-<n>``), so any number of workers can share one
+    output directory. Items are only marked done once the part holding their
+    parcels has been closed; until then their leases are renewed with the rest.
+    Pages whose lookups Regrid throttled go back to the queue, so parcels are
+    written at least once rather than exactly once.
+    """
+
+    def __init__(self, queue: WorkQueue, pipeline: "ParcelPipeline",
+                 worker_id: Optional[str] = None, batch_size: Optional[int] = None,
+                 part_size: Optional[int] = None) -> None:
+        """Initialize the worker."""
+        self.queue = queue
+        self.pipeline = pipeline
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size or config.worker_batch_size
+        self.part_size = part_size or config.worker_part_size
+        self.pages_done = 0
+        self.parcels_found = 0
+        self._parts = 0
+        self._lease_error: Optional[LeaseLost] = None
+
+    async def run(self, wait: bool = False) -> int:
+        """Process items until the queue is drained (or forever with ``wait``); returns pages done."""
+        self._lease_error = None
+        heartbeat = asyncio.create_task(self._heartbeat(asyncio.current_task()))
+        sink = self._new_part()
+        staged: List[int] = []
+        try:
+            while True:
+                items = await asyncio.to_thread(self.queue.claim, self.worker_id, self.batch_size)
+                if not items:
+                    if staged:
+                        staged = await self._commit_part(sink, staged)
+                        sink = self._new_part()
+
+                    counts = await asyncio.to_thread(self.queue.counts)
+                    if not wait and not counts.get("pending") and not counts.get("leased"):
+                        return self.pages_done
+                    # Other workers still hold leases that may yet expire and come back
+                    await asyncio.sleep(config.worker_poll_interval)
+                    continue
+
+                staged.extend(await self._process(items, sink))
+                if sink.count >= self.part_size:
+                    staged = await self._commit_part(sink, staged)
+                    sink = self._new_part()
+        except BaseException:
+            # Parcels already in the part are kept; the batch that was cut short goes back
+            try:
+                await self._commit_part(sink, staged)
+            finally:
+                await asyncio.to_thread(self.queue.release, self.worker_id)
+            if self._lease_error is not None:
+                raise self._lease_error from None
+            raise
+        finally:
+            heartbeat.cancel()
+
+    async def _process(self, items: List[WorkItem], sink: OutputSink) -> List[int]:
+        """Render and process a batch of pages; returns the ids that succeeded."""
+        loaded: List[WorkItem] = []
+        unreadable: List[Tuple[WorkItem, str]] = []
+
+        def pages() -> Iterator[Image.Image]:
+            """Render the batch page by page as the pipeline asks, skipping pages that won't render."""
+            for item in items:
+                try:
+                    image = self.pipeline.image_processor.load_page(item.file, item.page)
+                except Exception as e:
+                    print(f"✗ {item.file} page {item.page + 1}: {e}")
+                    unreadable.append((item, str(e)))
+                    continue
+                loaded.append(item)
+                yield image
+
+        error = None
+        try:
+            results = await self.pipeline.process_images(pages(), sink=sink)
+        except Exception as e:
+            print(f"✗ Batch of {len(items)} page(s) failed: {e}")
+            error = e
+
+        for item, reason in unreadable:
+            await asyncio.to_thread(self.queue.fail, [item.id], self.worker_id, reason)
+        if error is not None:
+            skipped = {item.id for item, _ in unreadable}
+            await asyncio.to_thread(self.queue.fail, [item.id for item in items if item.id not in skipped],
+                                    self.worker_id, str(error))
+            return []
+        if not loaded:
+            return []
+
+        self.parcels_found += len([r for r in results if r.success])
+
+        # Pages Regrid couldn't answer for are retried later, after the circuit has had time to close
+        deferred = {r.vision_info.page_index for r in results if r.retryable}
+        if deferred:
+            deferred_items = [item for index, item in enumerate(loaded) if index in deferred]
+            print(f"Regrid throttled or unavailable; returning {len(deferred_items)} page(s) to the queue")
+            await asyncio.to_thread(self.queue.defer, [item.id for item in deferred_items],
+                                    self.worker_id, "Regrid throttled or unavailable")
+            await asyncio.sleep(max(self.pipeline.regrid_client.breaker.retry_after, config.worker_poll_interval))
+        return [item.id for index, item in enumerate(loaded) if index not in deferred]
+
+    def _new_part(self) -> OutputSink:
+        """Open the next output part for this worker."""
+        self._parts += 1
+        return self.pipeline.create_sink(run_name=f"part-{self.worker_id}-{self._parts:05d}")
+
+    async def _commit_part(self, sink: OutputSink, staged: List[int]) -> List[int]:
+        """Close a part and mark the items it holds as done."""
+        await asyncio.to_thread(sink.close)
+        if staged:
+            done = await asyncio.to_thread(self.queue.complete, staged, self.worker_id)
+            if done < len(staged):
+                print(f"Lost the lease on {len(staged) - done} item(s); another worker will redo them")
+            self.pages_done += done
+        return []
+
+    async def _heartbeat(self, run: asyncio.Task) -> None:
+        """Renew this worker's leases until cancelled; stops ``run`` if renewals keep failing."""
+        failures = 0
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.queue.heartbeat, self.worker_id)
+            except Exception as e:
+                failures += 1
+                print(f"✗ Lease renewal failed ({failures}/{config.worker_heartbeat_failures}): {e}")
+                if failures >= config.worker_heartbeat_failures:
+                    # The leases have lapsed, so other workers may already be redoing these pages
+                    self._lease_error = LeaseLost(f"Could not renew leases {failures} times in a row: {e}")
+                    run.cancel()
+                    return
+            else:
+                failures = 0
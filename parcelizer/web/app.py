@@ -1,22 +1,53 @@
 """Flask web application for parcelizer."""
 
 import asyncio
+import mimetypes
 import os
+import threading
+from contextlib import nullcontext
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, Any
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, abort, render_template, request, jsonify, url_for
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
 
 from ..core.config import config
 from ..core.image_processor import ImageProcessor
-from ..core.vision_extractor import VisionExtractor, ParcelInfo
+from ..core.vision_extractor import ParcelInfo
 from ..core.pipeline import ParcelPipeline
+from ..core.point_join import PointResolver, join_points, read_points
+from ..core.profiling import RunProfiler
+from ..core.result_store import ResultStore
+from ..core.static_assets import COMPRESSIBLE_TYPES, IMMUTABLE_CACHE_CONTROL, StaticAssets
+from ..core.tile_proxy import DiskLRUCache, TileProxy, UpstreamError, is_vendor_path
+from ..core.tiles import TileIndex
+from ..core.serialization import dumps, loads, negotiate_compression
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider using the parcelizer serializer (orjson when installed)."""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize to a compact JSON string."""
+        return dumps(obj).decode("utf-8")
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        """Parse JSON."""
+        return loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Build a JSON response straight from the serialized bytes."""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
 
 
 def create_app() -> Flask:
     """Create and configure the Flask application."""
-    app = Flask(__name__)
+    # Static files are served by the fingerprinting route below, not Flask's default
+    app = Flask(__name__, static_folder=None)
+    app.json = FastJSONProvider(app)
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
     app.secret_key = "parcelizer-dev-key"  # In production, use a secure secret
     
@@ -25,12 +56,64 @@ def create_app() -> Flask:
     
     # Initialize processors
     image_processor = ImageProcessor()
-    vision_extractor = VisionExtractor()
     
     # Check for demo mode from environment or query parameter
     demo_mode = os.getenv('DEMO_MODE', 'false').lower() == 'true'
     pipeline = ParcelPipeline(demo_mode=demo_mode)
     
+    # Tile indexes for the most recently viewed large runs, least recent first;
+    # other runs' are rebuilt from the result store (shared by the request
+    # threads, hence the lock)
+    tile_indexes: "OrderedDict[str, TileIndex]" = OrderedDict()
+    tile_indexes_lock = threading.Lock()
+    
+    def remember_tile_index(run_id: str, tile_index: TileIndex) -> TileIndex:
+        """Keep a run's tile index, evicting the least recently viewed; returns the one kept."""
+        with tile_indexes_lock:
+            tile_index = tile_indexes.setdefault(run_id, tile_index)
+            tile_indexes.move_to_end(run_id)
+            while len(tile_indexes) > config.map_max_runs:
+                tile_indexes.popitem(last=False)
+        return tile_index
+    
+    # Every upload's results, kept for browsing and search after the response
+    result_store = ResultStore()
+    
+    # Bulk point files are matched against the cache and store before Regrid is asked
+    point_resolver = PointResolver(pipeline.regrid_client, result_store)
+    
+    # Static files, fingerprinted and pre-compressed once here rather than per request
+    static_assets = StaticAssets(Path(app.root_path) / 'static', min_size=config.compression_min_size)
+    
+    # Optional local cache in front of the tile server and the Leaflet CDN
+    tile_proxy = None
+    if config.tile_proxy:
+        tile_cache = DiskLRUCache(config.tile_cache_dir, int(config.tile_cache_max_mb * 1024 * 1024))
+        tile_proxy = TileProxy(tile_cache, config.tile_url, config.vendor_url, timeout=config.tile_proxy_timeout)
+    
+    @app.context_processor
+    def asset_helpers() -> Dict[str, Any]:
+        """Template helpers for asset URLs and the map's tile source."""
+        def asset_url(filename: str) -> str:
+            return url_for('static_files', filename=static_assets.url_path(filename))
+        
+        def vendor_url(path: str) -> str:
+            if tile_proxy is not None:
+                return url_for('vendor_file', path=path)
+            return config.vendor_url.rstrip('/') + '/' + path
+        
+        if tile_proxy is not None:
+            tile_url = url_for('map_tile', z=0, x=0, y=0).replace('/0/0/0.png', '/{z}/{x}/{y}.png')
+        else:
+            tile_url = config.tile_url
+        return {'asset_url': asset_url, 'vendor_url': vendor_url, 'tile_url': tile_url}
+    
+    @app.before_request
+    def reload_static_assets() -> None:
+        """Pick up edited static files while developing."""
+        if app.debug:
+            static_assets.refresh()
+    
     @app.route('/')
     def index() -> str:
         """Render the main page."""
@@ -50,31 +133,66 @@ def create_app() -> Flask:
             if not image_processor.is_supported_format(file.filename):
                 return jsonify({'error': 'Unsupported file format'}), 400
             
-            # Process the uploaded file through complete pipeline
-            images = image_processor.process_uploaded_file(file, file.filename)
+            # Debug toggle: profile this upload when the app allows it
+            profiler = None
+            if request.args.get('profile') and (app.debug or config.web_profiling):
+                profiler = RunProfiler(config.output_dir)
             
-            # Process through pipeline (vision + regrid)
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                parcel_results = loop.run_until_complete(
-                    pipeline.process_images(images)
-                )
-            finally:
-                loop.close()
+            with profiler or nullcontext():
+                # Pages are rendered lazily, as the pipeline has room for them
+                images = image_processor.iter_uploaded_file(file, file.filename)
+                
+                # Each upload is its own run with its own output sink
+                sink = pipeline.create_sink()
+                try:
+                    # Process through pipeline (vision + regrid)
+                    loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(loop)
+                    try:
+                        parcel_results = loop.run_until_complete(
+                            pipeline.process_images(images, sink=sink)
+                        )
+                    finally:
+                        loop.close()
+                finally:
+                    # Stops a background writer thread and finishes the files, even when the run failed
+                    images.close()
+                    sink.close()
+            
+            page_count = len({r.vision_info.page_index for r in parcel_results})
+            run_id = result_store.record_run(parcel_results, source=secure_filename(file.filename))
             
             # Return results
             results = []
-            map_data = pipeline.get_map_data(parcel_results)
+            boundaries = [r.boundary for r in parcel_results if r.success and r.boundary]
+            
+            if len(boundaries) > config.map_inline_limit:
+                # Too many parcels to send at once: the map loads them as tiles
+                tile_index = remember_tile_index(run_id, TileIndex(boundaries, cache_size=config.map_tile_cache_size))
+                
+                tile_url = url_for('run_tile', run_id=run_id, z=0, x=0, y=0)
+                map_data = {
+                    'type': 'FeatureCollection',
+                    'features': [],
+                    'center': tile_index.center,
+                    'bbox': list(tile_index.bbox) if tile_index.bbox else None,
+                    'feature_count': len(tile_index.boundaries),
+                    'tiles': tile_url.replace('/0/0/0.geojson', '/{z}/{x}/{y}.geojson')
+                }
+            else:
+                map_data = pipeline.get_map_data(parcel_results, zoom=request.args.get('zoom', type=int))
             
             for i, result in enumerate(parcel_results):
+                page_index = result.vision_info.page_index
                 result_data = {
-                    'image_index': i,
+                    'image_index': page_index if page_index is not None else i,
                     'apn': result.vision_info.apn,
                     'address': result.vision_info.address,
                     'county': result.vision_info.county,
                     'state': result.vision_info.state,
                     'success': result.success,
+                    'status': result.status,
+                    'retryable': result.retryable,
                     'error': result.error
                 }
                 
@@ -82,7 +200,7 @@ def create_app() -> Flask:
                 if result.boundary:
                     result_data.update({
                         'parcel_id': result.boundary.parcel_id,
-                        'vertices_count': len(result.boundary.vertices) if result.boundary.vertices else 0,
+                        'vertices_count': result.boundary.vertex_count,
                         'has_boundary': True
                     })
                 else:
@@ -90,16 +208,79 @@ def create_app() -> Flask:
                 
                 results.append(result_data)
             
-            return jsonify({
+            response_data = {
                 'success': True,
+                'run_id': run_id,
                 'results': results,
                 'map_data': map_data,
-                'message': f'Processed {len(images)} image(s) with {len([r for r in parcel_results if r.success])} successful boundary lookups'
-            })
+                'message': f'Processed {page_count} image(s) with {len([r for r in parcel_results if r.success])} successful boundary lookups'
+            }
+            if profiler is not None:
+                response_data['profile'] = [str(path) for path in profiler.report_paths]
+            
+            return jsonify(response_data)
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/runs/<run_id>/tiles/<int:z>/<int:x>/<int:y>.geojson')
+    def run_tile(run_id: str, z: int, x: int, y: int):
+        """Serve one zoom-simplified GeoJSON tile of a run's parcels."""
+        if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'error': 'Invalid tile coordinates'}), 400
+        
+        with tile_indexes_lock:
+            tile_index = tile_indexes.get(run_id)
+            if tile_index is not None:
+                tile_indexes.move_to_end(run_id)
+        if tile_index is None:
+            # Evicted, or from before a restart: rebuild it from the stored results
+            boundaries = result_store.run_parcels(run_id)
+            if boundaries is None:
+                return jsonify({'error': 'Unknown run'}), 404
+            tile_index = remember_tile_index(run_id, TileIndex(boundaries, cache_size=config.map_tile_cache_size))
+        
+        response = jsonify(tile_index.get_tile(z, x, y))
+        response.headers['Cache-Control'] = 'private, max-age=3600'
+        return response
+    
+    @app.route('/runs')
+    def list_runs():
+        """List stored runs, newest first (keyset-paginated with ``before``)."""
+        limit = _page_size()
+        runs, cursor = result_store.list_runs(limit=limit, before=request.args.get('before', type=int))
+        return jsonify({'runs': runs, 'next': cursor, 'regrid': pipeline.regrid_client.status()})
+    
+    @app.route('/parcels')
+    @app.route('/runs/<run_id>/parcels')
+    def query_parcels(run_id: str = None):
+        """Search stored results by APN, county, state, run and bbox (keyset-paginated with ``after``)."""
+        bbox = request.args.get('bbox')
+        if bbox:
+            try:
+                bbox = tuple(float(value) for value in bbox.split(','))
+                if len(bbox) != 4:
+                    raise ValueError
+            except ValueError:
+                return jsonify({'error': 'bbox must be min_lon,min_lat,max_lon,max_lat'}), 400
+        
+        features, cursor = result_store.query(
+            apn=request.args.get('apn'),
+            county=request.args.get('county'),
+            state=request.args.get('state'),
+            run_id=run_id or request.args.get('run'),
+            bbox=bbox or None,
+            found_only=request.args.get('found', '').lower() in ('1', 'true'),
+            limit=_page_size(),
+            after=request.args.get('after', type=int)
+        )
+        return jsonify({'type': 'FeatureCollection', 'features': features, 'next': cursor})
+    
+    def _page_size() -> int:
+        """Page size from the ``limit`` argument, capped at the configured maximum."""
+        limit = request.args.get('limit', config.results_page_size, type=int)
+        return max(1, min(limit, config.results_max_page_size))
+    
     @app.route('/coordinates', methods=['POST'])
     def process_coordinates():
         """Handle coordinate input and processing."""
@@ -110,30 +291,140 @@ def create_app() -> Flask:
             if not coordinates:
                 return jsonify({'error': 'No coordinates provided'}), 400
             
-            # Process coordinates
-            parcel_info = vision_extractor.extract_coordinates_info(coordinates)
+            # Look up the parcel containing the point
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                parcel_result = loop.run_until_complete(pipeline.process_coordinates(coordinates))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            finally:
+                loop.close()
             
+            parcel_info = parcel_result.vision_info
+            boundary = parcel_result.boundary
             result = {
-                'apn': parcel_info.apn,
-                'address': parcel_info.address,
-                'county': parcel_info.county,
-                'state': parcel_info.state,
-                'raw_response': parcel_info.raw_response
+                'apn': boundary.apn if boundary else parcel_info.apn,
+                'address': boundary.address if boundary and boundary.address else parcel_info.address,
+                'county': boundary.county if boundary else parcel_info.county,
+                'state': boundary.state if boundary else parcel_info.state,
+                'status': parcel_result.status,
+                'error': parcel_result.error,
+                'raw_response': parcel_info.raw_response,
+                'has_boundary': boundary is not None
             }
+            if boundary:
+                result.update({'parcel_id': boundary.parcel_id, 'vertices_count': boundary.vertex_count})
             
             return jsonify({
                 'success': True,
                 'result': result,
+                'map_data': pipeline.get_map_data([parcel_result]) if boundary else None,
                 'message': 'Coordinates processed successfully'
             })
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/coordinates/bulk', methods=['POST'])
+    def process_coordinates_bulk():
+        """Resolve an uploaded CSV or GeoJSON of points to parcels; returns the joined CSV."""
+        if 'file' not in request.files or request.files['file'].filename == '':
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        try:
+            frame, lats, lons = read_points(file.stream, file.filename)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            # ?offline=1 only matches parcels already known, without calling Regrid
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                matches = loop.run_until_complete(
+                    point_resolver.resolve(lats, lons, use_regrid=not request.args.get('offline'))
+                )
+            finally:
+                loop.close()
+            
+            joined = join_points(frame, matches)
+            response = Response(joined.to_csv(index=False), mimetype='text/csv')
+            name = Path(secure_filename(file.filename)).stem or 'points'
+            response.headers['Content-Disposition'] = f'attachment; filename="{name}-parcels.csv"'
+            return response
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
     @app.route('/static/<path:filename>')
     def static_files(filename: str):
-        """Serve static files."""
-        return send_from_directory('static', filename)
+        """Serve a static file: pre-compressed, with an ETag, and cached forever under its fingerprinted name."""
+        asset, fingerprinted = static_assets.lookup(filename)
+        if asset is None:
+            abort(404)
+        
+        encoding = asset.encoding_for(request.headers.get('Accept-Encoding', ''))
+        response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(asset.etag(encoding))
+        # Plain names may change content under the same URL: revalidate them every time
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if fingerprinted else 'no-cache'
+        return response.make_conditional(request)
+    
+    @app.route('/vendor/<path:path>')
+    def vendor_file(path: str):
+        """Serve a frontend library file through the local cache."""
+        if tile_proxy is None or not is_vendor_path(path):
+            abort(404)
+        try:
+            data = tile_proxy.vendor_file(path)
+        except UpstreamError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = Response(data, mimetype=mimetype)
+        # Vendor paths carry the library version, so their content never changes
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+    
+    @app.route('/map-tiles/<int:z>/<int:x>/<int:y>.png')
+    def map_tile(z: int, x: int, y: int):
+        """Serve a base-map tile through the local cache."""
+        if tile_proxy is None:
+            abort(404)
+        if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'error': 'Invalid tile coordinates'}), 400
+        try:
+            data = tile_proxy.tile(z, x, y)
+        except UpstreamError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        
+        response = Response(data, mimetype='image/png')
+        response.headers['Cache-Control'] = 'public, max-age=604800'
+        return response
+    
+    @app.after_request
+    def compress_response(response: Response) -> Response:
+        """Compress JSON, CSV and proxied vendor responses for clients that accept it."""
+        if (not config.response_compression
+                or response.direct_passthrough
+                or response.mimetype not in COMPRESSIBLE_TYPES | {'text/csv'}
+                or 'Content-Encoding' in response.headers):
+            return response
+        
+        data, encoding = negotiate_compression(
+            response.get_data(), request.headers.get('Accept-Encoding', ''),
+            min_size=config.compression_min_size
+        )
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.set_data(data)
+            response.headers['Content-Encoding'] = encoding
+        return response
     
     @app.errorhandler(413)
     def too_large(e):
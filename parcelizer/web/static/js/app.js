@@ -3,6 +3,8 @@
 class ParcelizerApp {
     constructor() {
         this.map = null;
+        // Base-map tiles: the server's local cache when it runs one, OSM otherwise
+        this.tileUrl = document.body.dataset.tileUrl || 'https://tile.openstreetmap.org/{z}/{x}/{y}.png';
         this.init();
     }
 
@@ -97,7 +99,7 @@ class ParcelizerApp {
                 this.showSuccess(result.message);
                 
                 // Display parcel boundaries on map if available
-                if (result.map_data && result.map_data.features.length > 0) {
+                if (result.map_data && (result.map_data.features.length > 0 || result.map_data.tiles)) {
                     this.displayParcelBoundaries(result.map_data);
                 }
             } else {
@@ -138,8 +140,12 @@ class ParcelizerApp {
                 this.displayResults([result.result]);
                 this.showSuccess(result.message);
                 
-                // Try to show coordinates on map
-                this.showCoordinatesOnMap(coordinates);
+                // Show the parcel found, or just the point
+                if (result.map_data && result.map_data.features.length > 0) {
+                    this.displayParcelBoundaries(result.map_data);
+                } else {
+                    this.showCoordinatesOnMap(coordinates);
+                }
             } else {
                 this.showError(result.error || 'Processing failed');
             }
@@ -224,9 +230,7 @@ class ParcelizerApp {
         this.map = L.map('map').setView([lat, lon], 15);
         
         // Add tile layer
-        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
-            attribution: '© OpenStreetMap contributors'
-        }).addTo(this.map);
+        this.addBaseLayer();
         
         // Add marker
         L.marker([lat, lon])
@@ -237,6 +241,12 @@ class ParcelizerApp {
         mapSection.style.display = 'block';
     }
 
+    addBaseLayer() {
+        L.tileLayer(this.tileUrl, {
+            attribution: '© OpenStreetMap contributors'
+        }).addTo(this.map);
+    }
+
     displayParcelBoundaries(mapData) {
         const mapSection = document.getElementById('mapSection');
         
@@ -258,12 +268,32 @@ class ParcelizerApp {
         this.map = L.map('map').setView(center, zoom);
         
         // Add tile layer
-        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
-            attribution: '© OpenStreetMap contributors'
-        }).addTo(this.map);
+        this.addBaseLayer();
+        
+        // Add parcel boundaries: inline for small runs, tiled for large ones
+        const geoJsonLayer = L.geoJSON(mapData, this.parcelLayerOptions()).addTo(this.map);
+        
+        if (mapData.tiles) {
+            this.createParcelTileLayer(mapData.tiles).addTo(this.map);
+        }
+        
+        // Fit map to show all parcels
+        if (mapData.bbox) {
+            const [minLon, minLat, maxLon, maxLat] = mapData.bbox;
+            this.map.fitBounds([[minLat, minLon], [maxLat, maxLon]], {
+                padding: [20, 20]
+            });
+        } else if (mapData.features.length > 0) {
+            this.map.fitBounds(geoJsonLayer.getBounds(), {
+                padding: [20, 20]
+            });
+        }
         
-        // Add parcel boundaries
-        const geoJsonLayer = L.geoJSON(mapData, {
+        mapSection.style.display = 'block';
+    }
+
+    parcelLayerOptions() {
+        return {
             style: {
                 color: '#3388ff',
                 weight: 3,
@@ -300,16 +330,83 @@ class ParcelizerApp {
                 
                 layer.bindPopup(popupContent);
             }
-        }).addTo(this.map);
-        
-        // Fit map to show all parcels
-        if (mapData.features.length > 0) {
-            this.map.fitBounds(geoJsonLayer.getBounds(), {
-                padding: [20, 20]
+        };
+    }
+
+    createParcelTileLayer(tileUrl) {
+        // Loads parcels tile by tile for the visible area only. Leaflet unloads
+        // off-screen tiles, and a parcel's layer is removed once no loaded tile
+        // references it, so memory stays bounded however large the run is.
+        // Requests for tiles unloaded before they arrive are aborted.
+        const app = this;
+        const group = L.layerGroup();  // the parcels of loaded tiles
+        const parcels = new Map();  // "<feature id>@<zoom>" -> {layer, refs}
+        const tileKeys = new Map(); // "<z>:<x>:<y>" -> parcel keys in that tile
+        const pending = new Map();  // "<z>:<x>:<y>" -> AbortController of a tile still loading
+
+        const ParcelTileLayer = L.GridLayer.extend({
+            createTile(coords, done) {
+                const tile = document.createElement('div');
+                const tileKey = `${coords.z}:${coords.x}:${coords.y}`;
+                const url = L.Util.template(tileUrl, coords);
+                const controller = new AbortController();
+                pending.set(tileKey, controller);
+
+                fetch(url, { signal: controller.signal })
+                    .then((response) => response.json())
+                    .then((data) => {
+                        if (controller.signal.aborted) {
+                            return;  // Unloaded while the response was being read
+                        }
+                        pending.delete(tileKey);
+                        const keys = [];
+                        (data.features || []).forEach((feature) => {
+                            const key = `${feature.id}@${coords.z}`;
+                            let entry = parcels.get(key);
+                            if (!entry) {
+                                entry = {
+                                    layer: L.geoJSON(feature, app.parcelLayerOptions()).addTo(group),
+                                    refs: 0
+                                };
+                                parcels.set(key, entry);
+                            }
+                            entry.refs += 1;
+                            keys.push(key);
+                        });
+                        tileKeys.set(tileKey, keys);
+                        done(null, tile);
+                    })
+                    .catch((error) => {
+                        if (!controller.signal.aborted) {
+                            pending.delete(tileKey);
+                            done(error, tile);
+                        }
+                    });
+
+                return tile;
+            }
+        });
+
+        const layer = new ParcelTileLayer({ maxNativeZoom: 18 });
+        layer.on('add', () => group.addTo(app.map));
+        layer.on('remove', () => group.remove());
+        layer.on('tileunload', (e) => {
+            const tileKey = `${e.coords.z}:${e.coords.x}:${e.coords.y}`;
+            const controller = pending.get(tileKey);
+            if (controller) {
+                controller.abort();
+                pending.delete(tileKey);
+            }
+            (tileKeys.get(tileKey) || []).forEach((key) => {
+                const entry = parcels.get(key);
+                if (entry && --entry.refs === 0) {
+                    group.removeLayer(entry.layer);
+                    parcels.delete(key);
+                }
             });
-        }
-        
-        mapSection.style.display = 'block';
+            tileKeys.delete(tileKey);
+        });
+        return layer;
     }
 
     showProgress() {
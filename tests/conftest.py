@@ -0,0 +1,22 @@
+"""Shared pytest setup."""
+
+import os
+
+import pytest
+
+# The configuration refuses to load without API keys; tests never call the real services
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("REGRID_API_KEY", "test-regrid-key")
+
+
+@pytest.fixture
+def web_app(tmp_path, monkeypatch):
+    """The web app in demo mode, writing its output and result store under ``tmp_path``."""
+    from parcelizer.core.config import config
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DEMO_MODE", "true")
+    monkeypatch.setattr(config, "result_store_path", tmp_path / "results.sqlite")
+    monkeypatch.setattr(config, "tile_proxy", False)
+    from parcelizer.web.app import create_app
+    return create_app()
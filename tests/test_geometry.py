@@ -0,0 +1,92 @@
+"""Tests for the array-backed parcel geometry."""
+
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import shape
+
+from parcelizer.core.geometry import ParcelGeometry, simplify_tolerance
+
+SQUARE_WITH_HOLE = [
+    [[-97.0, 30.0], [-96.99, 30.0], [-96.99, 30.01], [-97.0, 30.01], [-97.0, 30.0]],
+    [[-96.996, 30.004], [-96.994, 30.004], [-96.994, 30.006], [-96.996, 30.006], [-96.996, 30.004]],
+]
+SECOND_PART = [[[-96.98, 30.0], [-96.97, 30.0], [-96.97, 30.01], [-96.98, 30.0]]]
+MULTIPOLYGON = {"type": "MultiPolygon", "coordinates": [SQUARE_WITH_HOLE, SECOND_PART]}
+
+
+def wiggly_ring(lon, lat, size, points=200):
+    """A closed ring around (lon, lat) with many small wiggles for simplification to remove."""
+    angles = np.linspace(0, 2 * np.pi, points, endpoint=False)
+    radius = size * (1 + 0.001 * np.sin(angles * 40))
+    ring = np.stack([lon + radius * np.cos(angles), lat + radius * np.sin(angles)], axis=1).tolist()
+    return ring + ring[:1]
+
+
+def rings(geometry):
+    """Every ring of a ParcelGeometry as an array."""
+    return [geometry.coords[start:end] for start, end in zip(geometry.ring_offsets[:-1], geometry.ring_offsets[1:])]
+
+
+def assert_rings_closed(geometry):
+    for ring in rings(geometry):
+        assert len(ring) >= 4
+        assert np.array_equal(ring[0], ring[-1])
+
+
+def test_multipolygon_with_holes_round_trips():
+    geometry = ParcelGeometry.from_geojson(MULTIPOLYGON)
+    assert geometry.geom_type == "MultiPolygon"
+    assert list(geometry.part_offsets) == [0, 2, 3]
+    assert list(geometry.ring_offsets) == [0, 5, 10, 14]
+    assert list(np.unique(geometry.ring_index)) == [0, 1]
+    assert list(np.bincount(geometry.part_index)) == [10, 4]
+
+    assert geometry.to_geojson() == MULTIPOLYGON
+    assert geometry.to_shapely().equals(shape(MULTIPOLYGON))
+    assert ParcelGeometry.from_shapely(geometry.to_shapely()).to_geojson() == MULTIPOLYGON
+
+
+def test_polygon_keeps_its_type_and_drops_z():
+    polygon = {"type": "Polygon", "coordinates": [[position + [12.5] for position in ring] for ring in SQUARE_WITH_HOLE]}
+    geometry = ParcelGeometry.from_geojson(polygon)
+    assert geometry.to_geojson() == {"type": "Polygon", "coordinates": SQUARE_WITH_HOLE}
+    assert geometry.bounds == (-97.0, 30.0, -96.99, 30.01)
+
+
+def test_geometry_collection_becomes_multipolygon():
+    collection = {"type": "GeometryCollection", "geometries": [
+        {"type": "Polygon", "coordinates": SQUARE_WITH_HOLE},
+        {"type": "Point", "coordinates": [0, 0]},
+        {"type": "Polygon", "coordinates": SECOND_PART},
+    ]}
+    assert ParcelGeometry.from_geojson(collection).to_geojson() == MULTIPOLYGON
+    assert ParcelGeometry.from_geojson({"type": "Point", "coordinates": [0, 0]}) is None
+
+
+@pytest.mark.parametrize("geom_type", ["Polygon", "MultiPolygon"])
+def test_simplified_keeps_rings_closed_and_holes(geom_type):
+    polygon = [wiggly_ring(-97.0, 30.0, 0.01), wiggly_ring(-97.0, 30.0, 0.003)[::-1]]
+    if geom_type == "Polygon":
+        geometry = ParcelGeometry.from_geojson({"type": "Polygon", "coordinates": polygon})
+    else:
+        geometry = ParcelGeometry.from_geojson({"type": "MultiPolygon", "coordinates": [polygon, SECOND_PART]})
+
+    simplified = geometry.simplified(simplify_tolerance(12))
+    assert simplified.geom_type == geom_type
+    assert simplified.vertex_count < geometry.vertex_count
+    assert len(simplified.ring_offsets) == len(geometry.ring_offsets)  # The hole survives
+    assert_rings_closed(simplified)
+    assert shapely.is_valid(simplified.to_shapely())
+    assert geometry.simplified(0) is geometry
+
+
+def test_quantized_keeps_rings_closed():
+    polygon = [wiggly_ring(-97.0, 30.0, 0.01), wiggly_ring(-97.0, 30.0, 0.003)[::-1]]
+    geometry = ParcelGeometry.from_geojson({"type": "MultiPolygon", "coordinates": [polygon, SECOND_PART]})
+    quantized = geometry.quantized(5)
+
+    assert_rings_closed(quantized)
+    assert np.array_equal(quantized.ring_offsets, geometry.ring_offsets)
+    assert np.abs(quantized.coords - geometry.coords).max() <= 0.5e-5
+    assert quantized.to_geojson()["type"] == "MultiPolygon"
@@ -0,0 +1,115 @@
+"""Tests for the process-wide page memory budget and the backpressure it gives the pipeline."""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from PIL import Image
+
+from parcelizer.core.memory_budget import MemoryBudget
+from parcelizer.core.pipeline import ParcelPipeline
+
+
+async def test_acquire_waits_for_room():
+    budget = MemoryBudget(10)
+    await budget.acquire(8)
+    waiter = asyncio.create_task(budget.acquire(5))
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    budget.release(8)
+    await asyncio.wait_for(waiter, timeout=1)
+    assert budget.used == 5
+
+
+def test_release_wakes_a_waiter_on_another_loop():
+    budget = MemoryBudget(10)
+    asyncio.run(budget.acquire(8))
+    acquired = threading.Event()
+
+    def other_loop():
+        asyncio.run(budget.acquire(5))
+        acquired.set()
+
+    thread = threading.Thread(target=other_loop)
+    thread.start()
+    assert not acquired.wait(timeout=0.05)
+
+    budget.release(8)  # From this thread, with no loop running
+    assert acquired.wait(timeout=1)
+    thread.join()
+    assert budget.used == 5
+
+
+async def test_oversize_item_is_admitted_alone():
+    budget = MemoryBudget(10)
+    await asyncio.wait_for(budget.acquire(50), timeout=1)  # Nothing held: it can't wait for room
+    small = asyncio.create_task(budget.acquire(1))
+    await asyncio.sleep(0.01)
+    assert not small.done()
+
+    budget.release(50)
+    await asyncio.wait_for(small, timeout=1)
+    assert budget.used == 1
+
+
+async def test_oversize_item_waits_for_the_budget_to_empty():
+    budget = MemoryBudget(10)
+    await budget.acquire(2)
+    big = asyncio.create_task(budget.acquire(50))
+    small = asyncio.create_task(budget.acquire(1))
+    await asyncio.sleep(0.01)
+    assert not big.done() and not small.done()  # Waiters are served in order
+
+    budget.release(2)
+    await asyncio.wait_for(big, timeout=1)
+    assert not small.done()
+    budget.release(50)
+    await asyncio.wait_for(small, timeout=1)
+
+
+async def test_cancelled_waiter_holds_nothing():
+    budget = MemoryBudget(10)
+    await budget.acquire(8)
+    waiter = asyncio.create_task(budget.acquire(5))
+    behind = asyncio.create_task(budget.acquire(2))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+
+    await asyncio.wait_for(behind, timeout=1)  # No longer queued behind the cancelled one
+    assert budget.used == 10
+    budget.release(10)
+    assert budget.used == 0
+
+
+async def test_slow_vision_holds_back_rendering(monkeypatch, tmp_path):
+    budget = MemoryBudget(2.5)
+    monkeypatch.setattr("parcelizer.core.pipeline.get_memory_budget", lambda: budget)
+    monkeypatch.setattr("parcelizer.core.pipeline.config.page_megapixels_estimate", 1.0)
+    monkeypatch.setattr("parcelizer.core.pipeline.config.stage_queue_size", 10)
+    monkeypatch.setattr("parcelizer.core.pipeline.config.vision_concurrency", 1)
+    pipeline = ParcelPipeline(demo_mode=True, output_format="files", output_dir=tmp_path)
+    in_flight = peak = 0
+
+    def pages():
+        nonlocal in_flight, peak
+        for _ in range(6):
+            in_flight += 1
+            peak = max(peak, in_flight)
+            yield Image.new("L", (1000, 1000))  # One megapixel
+
+    async def extract_from_prepared(page, token_budget=None):
+        nonlocal in_flight
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return []
+
+    pipeline.vision_extractor.prepare_page = lambda image, index: SimpleNamespace(page_index=index, megapixels=1.0)
+    pipeline.vision_extractor.extract_from_prepared = extract_from_prepared
+    try:
+        assert await pipeline.process_images(pages()) == []
+    finally:
+        await pipeline.close()
+    assert peak == 2  # Rendering waits for vision to release a page
+    assert budget.used == 0
@@ -0,0 +1,84 @@
+"""Tests for the OCR pool's batching and tesseract TSV parsing (no tesseract needed)."""
+
+import subprocess
+from pathlib import Path
+
+from PIL import Image
+
+from parcelizer.core import ocr_pool
+from parcelizer.core.ocr_pool import OcrPool, OcrResult, _parse_tsv
+
+HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+
+def word_row(page, block, paragraph, line, text, left=10, top=20, conf="91.5"):
+    return f"5\t{page}\t{block}\t{paragraph}\t{line}\t1\t{left}\t{top}\t30\t12\t{conf}\t{text}"
+
+
+def test_parse_tsv_splits_pages_lines_and_paragraphs():
+    tsv = "\n".join([
+        HEADER,
+        "1\t1\t0\t0\t0\t0\t0\t0\t800\t600\t-1\t",  # page row
+        word_row(1, 1, 1, 1, "APN:"),
+        word_row(1, 1, 1, 1, "123-45", left=50),
+        word_row(1, 1, 1, 2, "Marion"),
+        word_row(1, 2, 1, 1, "County"),
+        word_row(1, 2, 1, 1, " "),  # Blank words are dropped
+        word_row(3, 1, 1, 1, "Lot", conf="40"),
+        word_row(9, 1, 1, 1, "ignored"),  # Beyond the batch
+        "5\t1\t1\t1\t1\t1\tshort"
+    ])
+    first, second, third = _parse_tsv(tsv, 3)
+
+    assert first.text == "APN: 123-45\nMarion\n\nCounty"
+    assert [word.text for word in first.words] == ["APN:", "123-45", "Marion", "County"]
+    assert first.words[1].bbox == (50, 20, 80, 32) and first.words[1].confidence == 91.5
+    assert second == OcrResult(text="", words=[])
+    assert third.text == "Lot" and third.words[0].confidence == 40.0
+
+
+def test_cli_batches_keep_image_order(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "TESSEROCR_AVAILABLE", False)
+    pool = OcrPool(workers=2, lang="eng", batch_size=3)
+    batches = []
+
+    def recognize_batch(images):
+        batches.append(len(images))
+        return [OcrResult(text=image.info["name"]) for image in images]
+
+    monkeypatch.setattr(pool, "_recognize_cli_batch", recognize_batch)
+    images = []
+    for i in range(7):
+        image = Image.new("L", (4, 4))
+        image.info["name"] = f"page{i}"
+        images.append(image)
+
+    try:
+        results = pool.recognize(images)
+    finally:
+        pool.close()
+    assert sorted(batches) == [1, 3, 3]
+    assert [result.text for result in results] == [f"page{i}" for i in range(7)]
+
+
+def test_cli_batch_runs_one_tesseract_over_a_file_list(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "TESSEROCR_AVAILABLE", False)
+    calls = []
+
+    def run(command, **kwargs):
+        listed = Path(command[1]).read_text().split()
+        calls.append((command, [Image.open(path).size for path in listed]))
+        tsv = "\n".join([HEADER, word_row(1, 1, 1, 1, "first"), word_row(2, 1, 1, 1, "second")])
+        return subprocess.CompletedProcess(command, 0, stdout=tsv, stderr="")
+
+    monkeypatch.setattr(ocr_pool.subprocess, "run", run)
+    pool = OcrPool(workers=1, lang="eng", batch_size=8)
+    try:
+        results = pool.recognize([Image.new("L", (20, 10)), Image.new("L", (30, 15))])
+    finally:
+        pool.close()
+
+    [(command, sizes)] = calls
+    assert command[2:] == ["stdout", "-l", "eng", "tsv"]
+    assert sizes == [(20, 10), (30, 15)]
+    assert [result.text for result in results] == ["first", "second"]
@@ -0,0 +1,136 @@
+"""Tests for atomic output files and the background writer."""
+
+import json
+import threading
+
+import pytest
+import shapely
+
+from parcelizer.core.geometry import ParcelGeometry
+from parcelizer.core.output_sink import (
+    BackgroundSink, OutputSink, atomic_output, create_sink, write_geojson
+)
+from parcelizer.core.regrid_client import ParcelBoundary
+
+
+def make_boundary(i: int) -> ParcelBoundary:
+    """A unit-square parcel."""
+    return ParcelBoundary(parcel_id=f"p{i}", apn=f"A{i}",
+                          shape=ParcelGeometry.from_shapely(shapely.box(i, 0, i + 1, 1)))
+
+
+class RecordingSink(OutputSink):
+    """In-memory sink that can be told to fail."""
+
+    def __init__(self, output_dir, fail_write=False, fail_close=False):
+        super().__init__(output_dir)
+        self.names = []
+        self.closed = False
+        self.fail_write = fail_write
+        self.fail_close = fail_close
+        self.writer_threads = set()
+
+    def write(self, boundary, name):
+        self.writer_threads.add(threading.get_ident())
+        if self.fail_write:
+            raise OSError("disk full")
+        self.names.append(name)
+
+    def close(self):
+        self.closed = True
+        if self.fail_close:
+            raise OSError("rename failed")
+
+    def describe(self):
+        return f"{len(self.names)} parcel(s)"
+
+
+def test_atomic_output_renames_into_place(tmp_path):
+    target = tmp_path / "out.csv"
+    with atomic_output(target) as tmp:
+        assert tmp != target and tmp.parent == tmp_path
+        tmp.write_text("done")
+        assert not target.exists()
+    assert target.read_text() == "done"
+    assert [path.name for path in tmp_path.iterdir()] == ["out.csv"]
+
+
+def test_atomic_output_keeps_old_file_on_error(tmp_path):
+    target = tmp_path / "out.csv"
+    target.write_text("old")
+    with pytest.raises(KeyError):
+        with atomic_output(target) as tmp:
+            tmp.write_text("partial")
+            raise KeyError("boom")
+    assert target.read_text() == "old"
+    assert [path.name for path in tmp_path.iterdir()] == ["out.csv"]
+
+
+def test_background_sink_writes_in_order_on_another_thread(tmp_path):
+    inner = RecordingSink(tmp_path)
+    sink = BackgroundSink(inner)
+    for i in range(20):
+        sink.write(make_boundary(i), f"p{i}")
+    sink.flush()
+    assert inner.names == [f"p{i}" for i in range(20)]
+    assert threading.get_ident() not in inner.writer_threads
+    sink.close()
+    assert inner.closed and sink.count == 20
+    assert sink.describe() == "20 parcel(s)"
+
+
+def test_background_sink_close_is_idempotent_and_rejects_writes(tmp_path):
+    sink = BackgroundSink(RecordingSink(tmp_path))
+    sink.close()
+    sink.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        sink.write(make_boundary(0), "p0")
+
+
+def test_background_sink_write_error_surfaces_on_flush(tmp_path):
+    sink = BackgroundSink(RecordingSink(tmp_path, fail_write=True))
+    sink.write(make_boundary(0), "p0")
+    sink.write(make_boundary(1), "p1")
+    with pytest.raises(RuntimeError, match=r"disk full \(and 1 more error"):
+        sink.flush()
+    sink.close()  # The error was already reported
+
+
+def test_background_sink_close_error_does_not_hang(tmp_path):
+    inner = RecordingSink(tmp_path, fail_close=True)
+    sink = BackgroundSink(inner)
+    sink.write(make_boundary(0), "p0")
+
+    result = {}
+
+    def close():
+        try:
+            sink.close()
+        except RuntimeError as e:
+            result["error"] = e
+
+    closer = threading.Thread(target=close, daemon=True)
+    closer.start()
+    closer.join(timeout=5)
+    assert not closer.is_alive(), "close() hung after the wrapped sink failed to close"
+    assert "rename failed" in str(result["error"])
+    assert not sink._thread.is_alive()
+
+
+@pytest.mark.parametrize("output_format", ["files", "flatgeobuf"])
+def test_background_sink_leaves_no_temporary_files(tmp_path, output_format):
+    sink = create_sink(output_format, tmp_path, "run", batch_size=3, background=True)
+    for i in range(7):
+        sink.write(make_boundary(i), f"p{i}")
+    sink.close()
+    assert not [path for path in tmp_path.iterdir() if ".tmp" in path.name]
+    assert sink.count == 7
+
+
+def test_write_geojson_is_compact_unless_pretty(tmp_path):
+    write_geojson(make_boundary(0), tmp_path / "compact.geojson", pretty=False)
+    write_geojson(make_boundary(0), tmp_path / "pretty.geojson", pretty=True)
+    compact = (tmp_path / "compact.geojson").read_text()
+    pretty = (tmp_path / "pretty.geojson").read_text()
+    assert "\n" not in compact.strip() and "\n  " in pretty
+    assert json.loads(compact) == json.loads(pretty)
@@ -0,0 +1,128 @@
+"""Tests for the local parcel cache and the background area prefetch."""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+import shapely
+from shapely.geometry import box
+
+from parcelizer.core.geometry import ParcelGeometry
+from parcelizer.core.parcel_cache import ParcelCache
+from parcelizer.core.regrid_client import ParcelBoundary, RegridClient
+
+
+def parcel(parcel_id, lon, lat, apn=None, state=None):
+    """A parcel covering a 0.001 degree square at (lon, lat)."""
+    return ParcelBoundary(parcel_id=parcel_id, apn=apn, state=state,
+                          shape=ParcelGeometry.from_shapely(box(lon, lat, lon + 0.001, lat + 0.001)))
+
+
+def test_eviction_forgets_covered_areas_it_was_part_of():
+    cache = ParcelCache(max_parcels=2)
+    cache.add(parcel("a", -97.0, 30.0))
+    cache.add(parcel("b", -97.005, 30.0))
+    cache.mark_covered((-97.01, 29.99, -96.99, 30.01))
+    cache.mark_covered((-90.01, 29.99, -89.99, 30.01))  # Elsewhere: stays
+    assert cache.is_covered((-97.001, 29.999, -96.998, 30.002))
+
+    cache.add(parcel("c", -90.0, 30.0))  # Evicts "a"
+    assert cache.find_point(30.0005, -96.9995) is None
+    assert not cache.is_covered((-97.001, 29.999, -96.998, 30.002))
+    assert cache.is_covered((-90.001, 29.999, -89.998, 30.002))
+
+
+def test_covered_areas_are_capped():
+    cache = ParcelCache(max_covered=3)
+    for i in range(5):
+        cache.mark_covered((i, 0, i + 0.5, 0.5))
+    assert not cache.is_covered((0.1, 0.1, 0.2, 0.2))
+    assert not cache.is_covered((1.1, 0.1, 1.2, 0.2))
+    assert all(cache.is_covered((i + 0.1, 0.1, i + 0.2, 0.2)) for i in (2, 3, 4))
+
+
+def test_prefetch_outlives_the_run_that_started_it(monkeypatch):
+    monkeypatch.setattr("parcelizer.core.regrid_client.config.prefetch_max_pending", 1)
+    client = RegridClient(demo_mode=True)
+    done = threading.Event()
+
+    async def fetch_area(bbox, max_pages=None):
+        await asyncio.sleep(0.05)
+        client.cache.add(parcel("neighbour", -97.0, 30.0))
+        done.set()
+        return 1
+
+    client.fetch_area = fetch_area
+
+    async def run():
+        assert client.start_prefetch(parcel("first", -97.002, 30.0))
+        assert not client.start_prefetch(parcel("second", -97.002, 30.0))  # At the limit
+
+    asyncio.run(run())  # The run's loop is gone before the prefetch finishes
+    assert done.wait(timeout=2)
+    assert client.cache.find_point(30.0005, -96.9995).parcel_id == "neighbour"
+    client.close()
+
+
+def test_close_cancels_running_prefetches():
+    client = RegridClient(demo_mode=True)
+    cancelled = threading.Event()
+
+    async def fetch_area(bbox, max_pages=None):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    client.fetch_area = fetch_area
+    assert client.start_prefetch(parcel("first", -97.0, 30.0))
+    time.sleep(0.02)
+    client.close()
+    assert cancelled.is_set()
+    assert client.start_prefetch(parcel("first", -97.0, 30.0))  # A new loop starts on demand
+    client.close()
+
+
+def test_apn_match_must_be_unique_without_a_state():
+    cache = ParcelCache()
+    cache.add(parcel("or", -122.0, 45.0, apn="12-345", state="OR"))
+    cache.add(parcel("wa", -122.0, 46.0, apn="12345", state="WA"))
+    assert cache.find_apn(["12345"]) is None
+    assert cache.find_apn(["12345"], state="WA").parcel_id == "wa"
+
+    cache.add(parcel("tx", -97.0, 30.0, apn="999", state="TX"))
+    assert cache.find_apn(["999"]).parcel_id == "tx"
+
+
+def test_point_lookups_see_parcels_added_since_the_tree_was_built(monkeypatch):
+    monkeypatch.setattr("parcelizer.core.parcel_cache._UNINDEXED_LIMIT", 3)
+    cache = ParcelCache(max_parcels=100)
+    builds = 0
+    strtree = shapely.STRtree
+
+    def counting_strtree(geometries):
+        nonlocal builds
+        builds += 1
+        return strtree(geometries)
+
+    monkeypatch.setattr("parcelizer.core.parcel_cache.shapely.STRtree", counting_strtree)
+    for i in range(6):
+        cache.add(parcel(f"p{i}", -97.0 + i * 0.01, 30.0))
+        assert cache.find_point(30.0005, -96.9995 + i * 0.01).parcel_id == f"p{i}"
+    assert builds == 2  # Not one per add
+
+    # A replaced parcel's old shape in the tree no longer matches
+    cache.add(parcel("p0", -90.0, 30.0))
+    assert cache.find_point(30.0005, -96.9995) is None
+    assert cache.find_point(30.0005, -89.9995).parcel_id == "p0"
+
+
+def test_bulk_point_lookup_includes_unindexed_parcels():
+    cache = ParcelCache()
+    cache.add(parcel("a", -97.0, 30.0))
+    cache.find_point(0, 0)  # Builds the tree with "a" only
+    cache.add(parcel("b", -97.01, 30.0))
+    positions, parcels = cache.find_points(np.array([-96.9995, -97.0095, 0.0]), np.array([30.0005, 30.0005, 0.0]))
+    assert [parcels[i].parcel_id for i in positions[:2]] == ["a", "b"] and positions[2] == -1
@@ -0,0 +1,108 @@
+"""Tests for point-in-polygon matching, point clustering and bulk point resolution."""
+
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import Polygon, box
+
+from parcelizer.core.geometry import ParcelGeometry, point_clusters, points_in_polygons
+from parcelizer.core.pipeline import ParcelResult
+from parcelizer.core.point_join import PointResolver
+from parcelizer.core.rate_control import RegridThrottled
+from parcelizer.core.regrid_client import ParcelBoundary, RegridClient
+from parcelizer.core.result_store import ResultStore
+from parcelizer.core.vision_extractor import ParcelInfo
+
+
+def parcel(parcel_id, min_lon, min_lat, max_lon, max_lat):
+    return ParcelBoundary(parcel_id=parcel_id, shape=ParcelGeometry.from_shapely(box(min_lon, min_lat, max_lon, max_lat)))
+
+
+def test_points_in_polygons_skips_points_outside_and_in_holes():
+    ring = Polygon([(0, 0), (10, 0), (10, 10), (0, 10)], [[(4, 4), (6, 4), (6, 6), (4, 6)]])
+    tree = shapely.STRtree([box(20, 20, 21, 21), ring, box(10, 0, 12, 2)])
+    lons = np.array([1.0, 5.0, 15.0, 20.5, 10.0, 9.0])
+    lats = np.array([1.0, 5.0, 15.0, 20.5, 1.0, 9.0])
+
+    matched, positions = points_in_polygons(lons, lats, tree)
+    assert list(matched) == [0, 1]  # The unmatched square at (10, 0) only shares an edge with the ring
+    assert list(positions) == [1, -1, -1, 0, 1, 1]  # On the shared edge: the polygon added first
+
+
+def test_points_in_polygons_with_no_matches():
+    matched, positions = points_in_polygons(np.array([50.0]), np.array([50.0]), shapely.STRtree([box(0, 0, 1, 1)]))
+    assert len(matched) == 0 and list(positions) == [-1]
+
+
+def test_point_clusters_group_points_by_cell():
+    lons = np.array([0.001, 5.0, 0.009, 0.012, 0.002])
+    lats = np.array([0.001, 5.0, 0.005, 0.001, 0.008])
+    clusters = {tuple(group): bbox for bbox, group in point_clusters(lons, lats, 0.01)}
+    assert clusters == {
+        (0, 2, 4): (0.001, 0.001, 0.009, 0.008),
+        (3,): (0.012, 0.001, 0.012, 0.001),
+        (1,): (5.0, 5.0, 5.0, 5.0),
+    }
+    assert point_clusters(np.array([]), np.array([]), 0.01) == []
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr("parcelizer.core.point_join.config.lookup_concurrency", 1)
+    monkeypatch.setattr("parcelizer.core.point_join.config.point_area_min_points", 3)
+    client = RegridClient(demo_mode=True)
+    client.area_calls, client.point_calls = [], []
+    lone = parcel("lone", -93.0, 30.0, -92.998, 30.001)
+
+    async def fetch_area(bbox, max_pages=None):
+        client.area_calls.append(bbox)
+        client.cache.add(parcel("area", -95.0, 30.0, -94.997, 30.001))
+        return 1
+
+    async def search_by_point(lat, lon):
+        client.point_calls.append((lat, lon))
+        return lone if lone.shape.to_shapely().contains(shapely.Point(lon, lat)) else None
+
+    client.fetch_area = fetch_area
+    client.search_by_point = search_by_point
+    yield client
+    client.close()
+
+
+async def test_resolver_asks_cache_then_store_then_regrid(client, tmp_path):
+    client.cache.add(parcel("cached", -97.0, 30.0, -96.999, 30.001))
+    store = ResultStore(tmp_path / "results.sqlite")
+    store.record_run([
+        ParcelResult(vision_info=ParcelInfo(), boundary=boundary, success=True, status="found")
+        for boundary in (parcel("stale", -97.0, 30.0, -96.999, 30.001), parcel("stored", -96.9, 30.0, -96.899, 30.001))
+    ])
+
+    lats = np.array([30.0005, 30.0005, 30.0005, 30.0005, 30.0005, 30.0005, 30.0005, 30.0005, np.nan, 95.0])
+    lons = np.array([-96.9995, -96.8995, -94.9995, -94.9985, -94.9975, -92.9995, -92.9985, -80.0, 0.0, 0.0])
+    matches = await PointResolver(client, store).resolve(lats, lons)
+
+    names = [matches.parcels[i].parcel_id if i >= 0 else None for i in matches.parcel_index]
+    assert names == ["cached", "stored", "area", "area", "area", "lone", "lone", None, None, None]
+    assert list(matches.source) == ["cache", "store", "regrid", "regrid", "regrid", "regrid", "regrid", "", "", ""]
+    assert list(matches.status) == ["found"] * 7 + ["not_found", "invalid", "invalid"]
+
+    assert len(client.area_calls) == 1  # Only the three-point cluster is worth an area query
+    # The second "lone" point was matched by the first one's answer, so only the stray point asked again
+    assert client.point_calls == [(30.0005, -92.9995), (30.0005, -80.0)]
+
+
+async def test_resolver_stays_local_without_regrid(client):
+    client.cache.add(parcel("cached", -97.0, 30.0, -96.999, 30.001))
+    matches = await PointResolver(client).resolve(np.array([30.0005, 30.0005]), np.array([-96.9995, -92.9995]),
+                                                  use_regrid=False)
+    assert list(matches.status) == ["found", "not_found"]
+    assert client.area_calls == [] and client.point_calls == []
+
+
+async def test_resolver_gives_up_when_regrid_throttles(client):
+    async def search_by_point(lat, lon):
+        raise RegridThrottled("quota spent")
+
+    client.search_by_point = search_by_point
+    matches = await PointResolver(client).resolve(np.array([30.0005, 30.0005]), np.array([-92.9995, -80.0]))
+    assert list(matches.status) == ["throttled", "throttled"]
@@ -0,0 +1,48 @@
+"""Tests for per-stage time and memory accounting in run profiles."""
+
+from parcelizer.core.profiling import RunProfiler, profile_stage
+
+MB = 1024 * 1024
+
+
+def allocate(megabytes):
+    """Allocate and free a block, leaving only a peak behind."""
+    block = bytearray(megabytes * MB)
+    del block
+
+
+def test_each_stage_gets_its_own_peak(tmp_path):
+    with RunProfiler(tmp_path, name="run") as profiler:
+        with profile_stage("render"):
+            allocate(40)
+        with profile_stage("lookup"):
+            allocate(1)
+        allocate(60)  # Outside every stage: counts for the run only
+
+    render, lookup = profiler.stages["render"], profiler.stages["lookup"]
+    assert render.peak_bytes >= 40 * MB
+    assert lookup.peak_bytes < 40 * MB
+    assert profiler.peak_bytes >= 60 * MB
+
+    summary = profiler.summary_path.read_text()
+    assert "peak memory" in summary and "render" in summary
+
+
+def test_overlapping_stages_share_the_peak(tmp_path):
+    with RunProfiler(tmp_path, name="run") as profiler:
+        with profile_stage("vision"):
+            with profile_stage("encode"):
+                allocate(30)
+            allocate(1)
+        with profile_stage("write"):
+            allocate(1)
+
+    assert profiler.stages["encode"].peak_bytes >= 30 * MB
+    assert profiler.stages["vision"].peak_bytes >= 30 * MB
+    assert profiler.stages["write"].peak_bytes < 30 * MB
+    assert profiler.stages["vision"].calls == 1 and profiler.stages["vision"].running == 0
+
+
+def test_no_profiler_no_accounting():
+    with profile_stage("render"):
+        allocate(1)
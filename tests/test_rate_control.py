@@ -0,0 +1,191 @@
+"""Tests for the adaptive limiter, circuit breaker and quota handling."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from parcelizer.core.rate_control import (
+    AdaptiveLimiter, CircuitBreaker, CircuitOpenError, QuotaTracker, RegridThrottled
+)
+from parcelizer.core.regrid_client import RegridClient
+
+
+async def call(breaker, outcome="success", hold=None):
+    """One call through the breaker, optionally held open until ``hold`` is set."""
+    async with breaker.call():
+        if hold is not None:
+            await hold.wait()
+        if outcome == "success":
+            breaker.record_success()
+        elif outcome == "failure":
+            breaker.record_failure()
+
+
+async def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    await call(breaker, "failure")
+    assert breaker.state == "closed"
+    await call(breaker, "failure")
+    assert breaker.state == "open" and breaker.retry_after > 50
+    with pytest.raises(CircuitOpenError):
+        await call(breaker)
+
+
+async def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    await call(breaker, "failure")
+    await call(breaker, "success")
+    await call(breaker, "failure")
+    assert breaker.state == "closed"
+
+
+async def test_half_open_lets_one_probe_through_then_closes():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    await call(breaker, "failure")
+    await asyncio.sleep(0.06)
+    assert breaker.state == "half-open"
+
+    hold = asyncio.Event()
+    probe = asyncio.create_task(call(breaker, "success", hold))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.create_task(call(breaker)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert not any(task.done() for task in followers)  # Waiting on the probe
+
+    hold.set()
+    await asyncio.wait_for(asyncio.gather(probe, *followers), timeout=1)
+    assert breaker.state == "closed"
+
+
+async def test_failed_probe_reopens_and_fails_waiters():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    await call(breaker, "failure")
+    await asyncio.sleep(0.06)
+
+    hold = asyncio.Event()
+    probe = asyncio.create_task(call(breaker, "failure", hold))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(call(breaker))
+    await asyncio.sleep(0.01)
+    hold.set()
+    await probe
+    with pytest.raises(CircuitOpenError):
+        await asyncio.wait_for(follower, timeout=1)
+    assert breaker.state == "open"
+
+
+async def test_cancelled_probe_hands_over_to_a_waiter():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    await call(breaker, "failure")
+    await asyncio.sleep(0.06)
+
+    probe = asyncio.create_task(call(breaker, "success", asyncio.Event()))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(call(breaker, "success"))
+    await asyncio.sleep(0.01)
+    probe.cancel()
+    await asyncio.wait_for(follower, timeout=1)
+    assert breaker.state == "closed"
+
+
+async def test_retry_after_reports_throttled_not_unavailable():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=60)
+    breaker.record_failure(retry_after=30, throttled=True)
+    with pytest.raises(RegridThrottled) as info:
+        await call(breaker)
+    assert info.value.status == "throttled" and info.value.retry_after > 25
+
+
+async def test_open_for_is_throttled():
+    breaker = CircuitBreaker()
+    breaker.open_for(10)
+    assert breaker.state == "open"
+    with pytest.raises(RegridThrottled):
+        await call(breaker)
+
+
+async def test_limiter_grows_on_success_and_halves_once_per_congestion_event():
+    limiter = AdaptiveLimiter(initial=4, maximum=16)
+    started = time.monotonic()
+    limiter.record_success(started, 0.1)
+    assert limiter.limit == pytest.approx(4.25)
+
+    limiter.record_congestion(started)
+    assert limiter.limit == pytest.approx(2.125)
+    limiter.record_congestion(started)  # Started before the decrease: same event
+    assert limiter.limit == pytest.approx(2.125)
+    limiter.record_congestion(time.monotonic())
+    assert limiter.limit == pytest.approx(1.0625)
+
+
+async def test_limiter_slows_down_on_high_latency():
+    limiter = AdaptiveLimiter(initial=8, latency_tolerance=2.0)
+    limiter.record_success(time.monotonic(), 0.1)
+    before = limiter.limit
+    limiter.record_success(time.monotonic(), 1.0)
+    assert limiter.limit == pytest.approx(before * 0.9)
+
+
+async def test_limiter_queues_beyond_limit():
+    limiter = AdaptiveLimiter(initial=1, maximum=1)
+    order = []
+
+    async def job(name, hold):
+        async with limiter.slot():
+            order.append(name)
+            await hold.wait()
+
+    first_hold, second_hold = asyncio.Event(), asyncio.Event()
+    first = asyncio.create_task(job("first", first_hold))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(job("second", second_hold))
+    await asyncio.sleep(0.01)
+    assert order == ["first"] and limiter.in_use == 1
+
+    first_hold.set()
+    second_hold.set()
+    await asyncio.gather(first, second)
+    assert order == ["first", "second"] and limiter.in_use == 0
+
+
+def test_quota_tracker_reads_headers():
+    quota = QuotaTracker()
+    quota.update({"X-RateLimit-Limit": "100", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "30"})
+    assert quota.snapshot()["limit"] == 100
+    assert 25 < quota.wait_time() <= 30
+
+
+def regrid_with(handler):
+    """A Regrid client and an HTTP client answering with ``handler``."""
+    return RegridClient(), httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def test_429_keeps_later_calls_throttled():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "30"})
+
+    regrid, client = regrid_with(handler)
+    async with client:
+        for _ in range(3):
+            with pytest.raises(RegridThrottled):
+                await regrid._get(client, "https://regrid.test/parcels", {})
+    assert len(calls) == 1  # The others were refused without a request
+    assert regrid.status()["circuit"] == "open"
+
+
+async def test_spent_quota_opens_the_circuit():
+    def handler(request):
+        return httpx.Response(200, json={}, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "60"})
+
+    regrid, client = regrid_with(handler)
+    async with client:
+        response = await regrid._get(client, "https://regrid.test/parcels", {})
+        assert response.status_code == 200
+        with pytest.raises(RegridThrottled):
+            await regrid._get(client, "https://regrid.test/parcels", {})
+    assert regrid.status()["quota"]["remaining"] == 0
@@ -0,0 +1,83 @@
+"""Tests for the speculative APN + address lookup."""
+
+import asyncio
+import time
+
+import pytest
+
+from parcelizer.core.rate_control import RegridThrottled
+from parcelizer.core.regrid_client import ParcelBoundary, RegridClient
+
+
+def make_client(strategy, apn_outcome, apn_delay, address_outcome, address_delay):
+    """A client whose APN and address lookups return (or raise) after a delay."""
+    client = RegridClient(demo_mode=True, lookup_strategy=strategy)
+
+    def lookup(outcome, delay):
+        async def search(*args):
+            await asyncio.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return search
+
+    client.search_by_apn = lookup(apn_outcome, apn_delay)
+    client.search_by_address = lookup(address_outcome, address_delay)
+    return client
+
+
+APN_HIT = ParcelBoundary(parcel_id="by-apn")
+ADDRESS_HIT = ParcelBoundary(parcel_id="by-address")
+
+
+@pytest.mark.parametrize("strategy", ["parallel", "hedged"])
+async def test_address_hit_waits_a_bounded_time_for_slow_apn(strategy, monkeypatch):
+    monkeypatch.setattr("parcelizer.core.regrid_client.config.lookup_hedge_delay", 0.01)
+    monkeypatch.setattr("parcelizer.core.regrid_client.config.lookup_apn_wait", 0.1)
+    client = make_client(strategy, None, 2.0, ADDRESS_HIT, 0.05)
+    started = time.perf_counter()
+    assert await client.search_parcel("1", "1 Main St") is ADDRESS_HIT
+    assert 0.1 < time.perf_counter() - started < 1.0
+
+
+@pytest.mark.parametrize("strategy", ["parallel", "hedged"])
+async def test_apn_hit_beats_earlier_address_hit(strategy, monkeypatch):
+    monkeypatch.setattr("parcelizer.core.regrid_client.config.lookup_hedge_delay", 0.01)
+    monkeypatch.setattr("parcelizer.core.regrid_client.config.lookup_apn_wait", 1.0)
+    client = make_client(strategy, APN_HIT, 0.1, ADDRESS_HIT, 0.02)
+    assert await client.search_parcel("1", "1 Main St") is APN_HIT
+
+
+async def test_address_hit_accepted_once_apn_misses(monkeypatch):
+    monkeypatch.setattr("parcelizer.core.regrid_client.config.lookup_apn_wait", 5.0)
+    client = make_client("parallel", None, 0.05, ADDRESS_HIT, 0.01)
+    started = time.perf_counter()
+    assert await client.search_parcel("1", "1 Main St") is ADDRESS_HIT
+    assert time.perf_counter() - started < 1.0
+
+
+def test_sequential_is_the_default():
+    assert RegridClient(demo_mode=True).lookup_strategy == "sequential"
+
+
+async def test_apn_hit_preferred_when_both_known():
+    client = make_client("parallel", APN_HIT, 0.05, ADDRESS_HIT, 0.05)
+    assert await client.search_parcel("1", "1 Main St") is APN_HIT
+
+
+@pytest.mark.parametrize("strategy", ["parallel", "hedged"])
+async def test_apn_error_is_not_fatal_when_address_finds_parcel(strategy, monkeypatch):
+    monkeypatch.setattr("parcelizer.core.regrid_client.config.lookup_hedge_delay", 0.01)
+    client = make_client(strategy, RegridThrottled("slow down"), 0.0, ADDRESS_HIT, 0.05)
+    assert await client.search_parcel("1", "1 Main St") is ADDRESS_HIT
+
+
+async def test_error_raised_when_nothing_found():
+    client = make_client("parallel", RegridThrottled("slow down"), 0.0, None, 0.01)
+    with pytest.raises(RegridThrottled):
+        await client.search_parcel("1", "1 Main St")
+
+
+async def test_miss_on_both_returns_none():
+    client = make_client("parallel", None, 0.01, None, 0.02)
+    assert await client.search_parcel("1", "1 Main St") is None
@@ -0,0 +1,104 @@
+"""Tests for the persistent result store's bbox and keyset queries."""
+
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+from parcelizer.core.geometry import ParcelGeometry
+from parcelizer.core.pipeline import ParcelResult
+from parcelizer.core.regrid_client import ParcelBoundary
+from parcelizer.core.result_store import ResultStore
+from parcelizer.core.vision_extractor import ParcelInfo
+
+
+def found(apn, lon, lat, county="Travis", state="TX", parcel_id=None):
+    """A found parcel covering a 0.001 degree square at (lon, lat)."""
+    boundary = ParcelBoundary(
+        parcel_id=parcel_id or apn, apn=apn, county=county, state=state,
+        shape=ParcelGeometry.from_shapely(box(lon, lat, lon + 0.001, lat + 0.001))
+    )
+    return ParcelResult(vision_info=ParcelInfo(apn=apn), boundary=boundary, success=True, status="found")
+
+
+def not_found(apn):
+    return ParcelResult(vision_info=ParcelInfo(apn=apn, county="Travis", state="TX"), error="No match")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(tmp_path / "results.sqlite")
+
+
+def apns(features):
+    return [feature["properties"]["apn"] for feature in features]
+
+
+def test_bbox_matches_intersecting_parcels_only(store):
+    store.record_run([found("1", -97.0, 30.0), found("2", -97.5, 30.5), not_found("3")])
+    features, cursor = store.query(bbox=(-97.01, 29.99, -96.99, 30.01))
+    assert apns(features) == ["1"] and cursor is None
+    assert features[0]["geometry"]["type"] == "Polygon"
+
+
+def test_bbox_touching_parcel_edge_matches(store):
+    store.record_run([found("1", -97.0, 30.0)])
+    features, _ = store.query(bbox=(-96.999, 30.001, -96.9, 30.1))
+    assert apns(features) == ["1"]
+
+
+def test_keyset_pages_cover_every_result_once(store):
+    store.record_run([found(str(i), -97.0 + i * 0.01, 30.0) for i in range(7)])
+    seen, after = [], None
+    while True:
+        features, after = store.query(limit=3, after=after)
+        seen += apns(features)
+        if after is None:
+            break
+    assert seen == [str(i) for i in range(7)]
+
+
+def test_keyset_pages_within_a_bbox(store):
+    # Alternate parcels inside and outside the box so pages skip rows
+    results = [found(str(i), -97.0 if i % 2 == 0 else -90.0, 30.0 + i * 0.01) for i in range(10)]
+    store.record_run(results)
+    bbox = (-97.1, 29.9, -96.9, 31.0)
+
+    first, after = store.query(bbox=bbox, limit=2)
+    second, after = store.query(bbox=bbox, limit=2, after=after)
+    last, after = store.query(bbox=bbox, limit=2, after=after)
+    assert apns(first + second + last) == ["0", "2", "4", "6", "8"]
+    assert after is None
+
+
+def test_filters_combine_with_bbox(store):
+    run_id = store.record_run([found("1", -97.0, 30.0), found("2", -97.0, 30.0, county="Hays")])
+    store.record_run([found("1", -97.0, 30.0, parcel_id="1-copy")])
+    bbox = (-97.1, 29.9, -96.9, 30.1)
+
+    assert apns(store.query(bbox=bbox, county="hays county", state="Texas")[0]) == ["2"]
+    features, _ = store.query(bbox=bbox, run_id=run_id, apn="1")
+    assert [feature["properties"]["parcel_id"] for feature in features] == ["1"]
+
+
+def test_found_only_skips_misses(store):
+    store.record_run([found("1", -97.0, 30.0), not_found("2")])
+    assert apns(store.query()[0]) == ["1", "2"]
+    assert apns(store.query(found_only=True)[0]) == ["1"]
+
+
+def test_list_runs_pages_newest_first(store):
+    run_ids = [store.record_run([found(str(i), -97.0, 30.0)], source=f"map{i}.pdf") for i in range(5)]
+    first, before = store.list_runs(limit=2)
+    second, before = store.list_runs(limit=2, before=before)
+    last, before = store.list_runs(limit=2, before=before)
+    assert [run["id"] for run in first + second + last] == run_ids[::-1]
+    assert before is None
+    assert first[0]["source"] == "map4.pdf" and first[0]["found_count"] == 1
+
+
+def test_find_points_prefers_latest_copy(store):
+    store.record_run([found("1", -97.0, 30.0, parcel_id="p1")])
+    store.record_run([found("1-new", -97.0, 30.0, parcel_id="p1")])
+    positions, parcels = store.find_points(np.array([-96.9995, -90.0]), np.array([30.0005, 30.0]))
+    assert positions[1] == -1
+    assert parcels[positions[0]].apn == "1-new"
@@ -0,0 +1,44 @@
+"""Tests for serving a run's parcels to the map as tiles."""
+
+from shapely.geometry import box
+
+from parcelizer.core.config import config
+from parcelizer.core.geometry import ParcelGeometry
+from parcelizer.core.pipeline import ParcelResult
+from parcelizer.core.regrid_client import ParcelBoundary
+from parcelizer.core.result_store import ResultStore
+from parcelizer.core.vision_extractor import ParcelInfo
+
+
+def found(apn, lon, lat):
+    boundary = ParcelBoundary(parcel_id=apn, apn=apn, shape=ParcelGeometry.from_shapely(
+        box(lon, lat, lon + 0.001, lat + 0.001)))
+    return ParcelResult(vision_info=ParcelInfo(apn=apn), boundary=boundary, success=True, status="found")
+
+
+def test_run_parcels_reads_back_found_parcels(tmp_path):
+    store = ResultStore(tmp_path / "results.sqlite")
+    miss = ParcelResult(vision_info=ParcelInfo(apn="2"), error="No match")
+    run_id = store.record_run([found("1", -97.0, 30.0), miss, found("3", -97.01, 30.0)])
+
+    parcels = store.run_parcels(run_id)
+    assert [parcel.apn for parcel in parcels] == ["1", "3"]
+    assert parcels[0].shape.bounds == (-97.0, 30.0, -96.999, 30.001)
+    assert store.run_parcels("unknown") is None
+
+
+def test_tiles_of_a_run_not_in_memory_come_from_the_store(web_app):
+    # Recorded by an earlier process: this app has never built its tile index
+    run_id = ResultStore(config.result_store_path).record_run([found("1", -121.5, 45.8)])
+    client = web_app.test_client()
+
+    response = client.get(f"/runs/{run_id}/tiles/16/10649/23367.geojson")
+    assert response.status_code == 200
+    assert [feature["properties"]["apn"] for feature in response.get_json()["features"]] == ["1"]
+    assert client.get(f"/runs/{run_id}/tiles/0/0/0.geojson").status_code == 200
+
+
+def test_unknown_run_and_bad_tiles_are_rejected(web_app):
+    client = web_app.test_client()
+    assert client.get("/runs/nope/tiles/0/0/0.geojson").status_code == 404
+    assert client.get("/runs/nope/tiles/2/4/0.geojson").status_code == 400
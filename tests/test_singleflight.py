@@ -0,0 +1,120 @@
+"""Tests for coalescing of duplicate in-flight calls."""
+
+import asyncio
+import threading
+
+import pytest
+
+from parcelizer.core.singleflight import SingleFlight
+
+
+async def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "parcel"
+
+    results = await asyncio.gather(*(flight.do("apn", fetch) for _ in range(5)))
+    assert results == ["parcel"] * 5
+    assert calls == 1
+
+
+async def test_different_keys_run_separately():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    results = await asyncio.gather(flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b")))
+    assert results == ["a", "b"] and sorted(calls) == ["a", "b"]
+
+
+async def test_finished_call_is_not_reused():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("apn", fetch) == 1
+    assert await flight.do("apn", fetch) == 2
+
+
+async def test_error_reaches_every_caller():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        raise RuntimeError("regrid down")
+
+    results = await asyncio.gather(*(flight.do("apn", fetch) for _ in range(3)), return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "regrid down" for result in results)
+
+
+async def test_follower_takes_over_when_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    leader = asyncio.create_task(flight.do("apn", fetch))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(flight.do("apn", fetch))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await follower == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_cancelled_follower_does_not_cancel_the_call():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.03)
+        return "parcel"
+
+    leader = asyncio.create_task(flight.do("apn", fetch))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(flight.do("apn", fetch))
+    await asyncio.sleep(0.01)
+    follower.cancel()
+    assert await leader == "parcel"
+
+
+def test_callers_on_other_event_loops_share_the_call():
+    flight = SingleFlight()
+    calls = 0
+    started = threading.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(0.05)
+        return "parcel"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(asyncio.run(flight.do("apn", fetch))))
+    leader.start()
+    started.wait(timeout=1)
+    results.append(asyncio.run(flight.do("apn", fetch)))
+    leader.join(timeout=1)
+    assert results == ["parcel", "parcel"] and calls == 1
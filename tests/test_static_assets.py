@@ -0,0 +1,123 @@
+"""Tests for fingerprinted static assets, their HTTP caching and the vendor proxy paths."""
+
+import gzip
+
+import pytest
+
+from parcelizer.core.static_assets import IMMUTABLE_CACHE_CONTROL, StaticAssets
+from parcelizer.core.tile_proxy import DiskLRUCache, is_vendor_path
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    root = tmp_path / "static"
+    (root / "js").mkdir(parents=True)
+    (root / "js" / "app.js").write_text("console.log('parcel');\n" * 200)
+    (root / "logo.png").write_bytes(b"\x89PNG" + b"\0" * 2000)
+    return root
+
+
+def test_assets_are_fingerprinted_and_compressed(static_dir):
+    assets = StaticAssets(static_dir)
+    url_path = assets.url_path("js/app.js")
+    assert url_path.startswith("js/app.") and url_path.endswith(".js") and url_path != "js/app.js"
+
+    asset, fingerprinted = assets.lookup(url_path)
+    assert fingerprinted and asset.path == "js/app.js"
+    assert gzip.decompress(asset.variants["gzip"]) == asset.variants[None]
+    assert asset.etag("gzip") != asset.etag(None)
+
+    png, _ = assets.lookup("logo.png")
+    assert list(png.variants) == [None]  # Already compressed
+
+
+def test_unknown_and_traversal_names_are_not_found(static_dir, tmp_path):
+    (tmp_path / "secret.txt").write_text("key")
+    assets = StaticAssets(static_dir)
+    for name in ("missing.js", "../secret.txt", "js/../../secret.txt", "/etc/passwd"):
+        assert assets.lookup(name) == (None, False)
+
+
+def test_refresh_picks_up_changes(static_dir):
+    assets = StaticAssets(static_dir)
+    before = assets.url_path("js/app.js")
+    (static_dir / "js" / "app.js").write_text("console.log('changed');\n")
+    (static_dir / "extra.css").write_text("body {}")
+    (static_dir / "logo.png").unlink()
+    assets.refresh()
+
+    assert assets.url_path("js/app.js") != before
+    assert assets.lookup(before) == (None, False)
+    assert assets.lookup("extra.css")[0] is not None
+    assert assets.lookup("logo.png") == (None, False)
+
+
+@pytest.fixture
+def client(web_app):
+    return web_app.test_client()
+
+
+def test_fingerprinted_asset_is_immutable(client):
+    page = client.get("/").get_data(as_text=True)
+    url = next(part.split('"')[0] for part in page.split('src="')[1:] if part.startswith("/static/js/app."))
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_plain_asset_revalidates_with_etag(client):
+    response = client.get("/static/js/app.js")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert "Content-Encoding" not in response.headers
+    etag = response.headers["ETag"]
+
+    again = client.get("/static/js/app.js", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+
+    # The gzip variant has its own tag, so the identity tag doesn't match it
+    gzipped = client.get("/static/js/app.js", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert gzipped.status_code == 200 and gzipped.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("path", [
+    "/static/../app.py",
+    "/static/%2e%2e/app.py",
+    "/static/js/..%2f..%2fapp.py",
+    "/static/..%5capp.py",
+    "/static/templates/index.html",
+])
+def test_static_route_does_not_leave_the_static_folder(client, path):
+    assert client.get(path).status_code == 404
+
+
+def test_vendor_route_is_off_without_the_proxy(client):
+    assert client.get("/vendor/leaflet@1.9.4/dist/leaflet.js").status_code == 404
+
+
+@pytest.mark.parametrize("path, allowed", [
+    ("leaflet@1.9.4/dist/leaflet.js", True),
+    ("leaflet@1.9.4/dist/images/marker-icon.png", True),
+    ("leaflet@1.9.4/dist/../../evil/x.js", False),
+    ("leaflet@1.9.4/dist/images/../../../x.js", False),
+    ("leaflet@1.9.3/dist/leaflet.js", False),
+    ("other/leaflet.js", False),
+])
+def test_vendor_paths_are_restricted(path, allowed):
+    assert is_vendor_path(path) is allowed
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskLRUCache(tmp_path / "cache", max_bytes=25)
+    cache.put("a", b"a" * 10)
+    cache.put("b", b"b" * 10)
+    assert cache.get("a") == b"a" * 10  # "b" is now the oldest
+    cache.put("c", b"c" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size == 20 and len(cache) == 2
+    assert DiskLRUCache(tmp_path / "cache", max_bytes=25).size == 20  # Reindexed from disk
@@ -0,0 +1,64 @@
+"""Tests for the upload route's per-request output sinks."""
+
+import io
+
+import pytest
+from PIL import Image
+
+from parcelizer.core import pipeline as pipeline_module
+from parcelizer.core.config import config
+from parcelizer.core.pipeline import ParcelPipeline
+
+
+@pytest.fixture
+def sinks(monkeypatch):
+    """Every output sink the pipeline opens, written from background threads."""
+    monkeypatch.setattr(config, "background_writes", True)
+    opened = []
+    create_sink = pipeline_module.create_sink
+
+    def recording_create_sink(*args, **kwargs):
+        sink = create_sink(*args, **kwargs)
+        opened.append(sink)
+        return sink
+
+    monkeypatch.setattr(pipeline_module, "create_sink", recording_create_sink)
+    return opened
+
+
+def upload(client):
+    image = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(image, "PNG")
+    image.seek(0)
+    return client.post("/upload", data={"file": (image, "map.png")})
+
+
+def test_app_opens_no_sink_before_an_upload(sinks, web_app):
+    assert sinks == []
+
+
+def test_failed_upload_closes_its_sink(sinks, web_app, monkeypatch):
+    async def process_images(self, images, sink=None):
+        next(images)
+        raise RuntimeError("vision exploded")
+
+    monkeypatch.setattr(ParcelPipeline, "process_images", process_images)
+    response = upload(web_app.test_client())
+
+    assert response.status_code == 500 and response.get_json()["error"] == "vision exploded"
+    [sink] = sinks
+    assert sink._closed and not sink._thread.is_alive()
+
+
+def test_each_upload_closes_its_own_sink(sinks, web_app, monkeypatch):
+    async def process_images(self, images, sink=None):
+        list(images)
+        return []
+
+    monkeypatch.setattr(ParcelPipeline, "process_images", process_images)
+    client = web_app.test_client()
+    assert upload(client).status_code == 200
+    assert upload(client).status_code == 200
+
+    assert len(sinks) == 2
+    assert all(sink._closed and not sink._thread.is_alive() for sink in sinks)
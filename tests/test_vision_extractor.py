@@ -0,0 +1,60 @@
+"""Tests for the vision resolution ladder."""
+
+from PIL import Image
+
+from parcelizer.core.vision_extractor import ParcelInfo, VisionExtractor, parse_vision_ladder
+
+
+def extractor_answering(*answers, ladder="512:low,1024:high,title:high"):
+    """An extractor whose successive vision calls return ``answers``; also returns the call log."""
+    extractor = VisionExtractor()
+    extractor.ladder = parse_vision_ladder(ladder)
+    calls = []
+
+    async def request_extraction(base64_image, detail="high", budget=None):
+        calls.append(detail)
+        return list(answers[len(calls) - 1])
+
+    extractor._request_extraction = request_extraction
+    return extractor, calls
+
+
+def page():
+    return Image.new("RGB", (1600, 1200), "white")
+
+
+async def test_higher_resolution_reading_replaces_misread_apn():
+    extractor, calls = extractor_answering(
+        [ParcelInfo(apn="05-04-00-1S04-00", confidence="low")],
+        [ParcelInfo(apn="05-04-00-1504-00", county="Marion", confidence="high")],
+    )
+    parcels = await extractor.extract_from_image(page(), page_index=3)
+    assert calls == ["low", "high"]
+    assert [(info.apn, info.county, info.page_index) for info in parcels] == [("05-04-00-1504-00", "Marion", 3)]
+
+
+async def test_title_crop_adds_to_the_page_reading():
+    extractor, calls = extractor_answering(
+        [ParcelInfo(apn="1", confidence="low")],
+        [ParcelInfo(apn="1", confidence="low")],
+        [ParcelInfo(apn="1", county="Marion", state="OR", confidence="high"), ParcelInfo(apn="2")],
+    )
+    parcels = await extractor.extract_from_image(page())
+    assert len(calls) == 3
+    assert [(info.apn, info.county, info.state) for info in parcels] == [("1", "Marion", "OR"), ("2", None, None)]
+
+
+async def test_empty_higher_resolution_reading_keeps_the_earlier_one():
+    extractor, _ = extractor_answering(
+        [ParcelInfo(apn="1", confidence="low")],
+        [],
+        [],
+    )
+    parcels = await extractor.extract_from_image(page())
+    assert [info.apn for info in parcels] == ["1"]
+
+
+async def test_confident_first_reading_stops_the_ladder():
+    extractor, calls = extractor_answering([ParcelInfo(apn="1", confidence="high")])
+    assert [info.apn for info in await extractor.extract_from_image(page())] == ["1"]
+    assert calls == ["low"]
@@ -0,0 +1,160 @@
+"""Tests for the shared SQLite work queue and the workers that drain it."""
+
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from parcelizer.core import work_queue
+from parcelizer.core.work_queue import LeaseLost, QueueWorker, WorkQueue
+
+
+class FakeClock:
+    """Stands in for the ``time`` module so leases can expire instantly."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(work_queue, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(tmp_path / "queue.sqlite", lease_seconds=60, max_attempts=2)
+    queue.enqueue(tmp_path / "map.pdf", 3)
+    return queue
+
+
+def test_enqueue_ignores_pages_already_queued(queue, tmp_path):
+    assert queue.enqueue(tmp_path / "map.pdf", 4) == 1
+    assert queue.counts() == {"pending": 4}
+
+
+def test_claimed_items_are_not_claimed_twice(queue):
+    first = queue.claim("w1", limit=2)
+    second = queue.claim("w2", limit=2)
+    assert [item.page for item in first] == [0, 1]
+    assert [item.page for item in second] == [2]
+    assert queue.claim("w3") == []
+    assert queue.counts() == {"leased": 3}
+
+
+def test_expired_lease_is_claimable_again(queue, clock):
+    [item] = queue.claim("w1")
+    clock.now += 61
+    [again] = queue.claim("w2")
+    assert again.id == item.id and again.attempts == 2
+    # The first worker lost the lease, so its completion doesn't count
+    assert queue.complete([item.id], "w1") == 0
+    assert queue.complete([item.id], "w2") == 1
+
+
+def test_heartbeat_keeps_the_lease(queue, clock):
+    queue.claim("w1", limit=3)
+    clock.now += 50
+    assert queue.heartbeat("w1") == 3
+    clock.now += 50
+    assert queue.claim("w2") == []
+
+
+def test_lease_expiring_after_last_attempt_fails_the_item(queue, clock):
+    [item] = queue.claim("w1")
+    clock.now += 61
+    queue.claim("w2")
+    clock.now += 61
+    claimed = queue.claim("w3", limit=3)
+    assert item.id not in [other.id for other in claimed]
+    assert queue.counts()["failed"] == 1
+
+
+def test_fail_retries_until_max_attempts(queue):
+    [item] = queue.claim("w1")
+    queue.fail([item.id], "w1", "vision error")
+    assert queue.counts() == {"pending": 3}
+
+    [again] = queue.claim("w1")
+    assert again.id == item.id
+    queue.fail([again.id], "w1", "vision error")
+    assert queue.counts() == {"failed": 1, "pending": 2}
+
+
+def test_defer_and_release_do_not_use_up_attempts(queue):
+    [item] = queue.claim("w1")
+    queue.defer([item.id], "w1", "throttled")
+    [again] = queue.claim("w1")
+    assert again.attempts == 1
+
+    queue.claim("w1", limit=2)
+    assert queue.release("w1") == 3
+    assert queue.counts() == {"pending": 3}
+    assert all(item.attempts == 1 for item in queue.claim("w2", limit=3))
+
+
+def test_items_are_shared_across_queue_instances(queue):
+    other = WorkQueue(queue.path, lease_seconds=60, max_attempts=2)
+    [item] = queue.claim("w1")
+    assert item.id not in [claimed.id for claimed in other.claim("w2", limit=3)]
+
+
+class SlowPipeline:
+    """Stands in for ParcelPipeline: renders blank pages and takes a while over each batch."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.image_processor = SimpleNamespace(load_page=lambda file, page: Image.new("L", (10, 10)))
+
+    def create_sink(self, run_name=None):
+        return SimpleNamespace(count=0, close=lambda: None)
+
+    async def process_images(self, pages, sink=None):
+        list(pages)
+        await asyncio.sleep(self.seconds)
+        return []
+
+
+@pytest.fixture
+def short_lease_queue(tmp_path, clock):
+    queue = WorkQueue(tmp_path / "queue.sqlite", lease_seconds=0.03, max_attempts=2)
+    queue.enqueue(tmp_path / "map.pdf", 2)
+    return queue
+
+
+async def test_worker_stops_when_leases_cannot_be_renewed(short_lease_queue, monkeypatch, capsys):
+    def heartbeat(worker_id):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(short_lease_queue, "heartbeat", heartbeat)
+    worker = QueueWorker(short_lease_queue, SlowPipeline(seconds=10), worker_id="w1", batch_size=2)
+    with pytest.raises(LeaseLost):
+        await asyncio.wait_for(worker.run(), timeout=2)
+
+    assert "database is locked" in capsys.readouterr().out
+    assert short_lease_queue.counts() == {"pending": 2}  # Handed back for another worker
+    assert worker.pages_done == 0
+
+
+async def test_worker_survives_an_occasional_failed_renewal(short_lease_queue, monkeypatch):
+    renew = short_lease_queue.heartbeat
+    calls = 0
+
+    def flaky_heartbeat(worker_id):
+        nonlocal calls
+        calls += 1
+        if calls % 2:
+            raise sqlite3.OperationalError("database is locked")
+        return renew(worker_id)
+
+    monkeypatch.setattr(short_lease_queue, "heartbeat", flaky_heartbeat)
+    worker = QueueWorker(short_lease_queue, SlowPipeline(seconds=0.2), worker_id="w1", batch_size=2)
+    assert await asyncio.wait_for(worker.run(), timeout=2) == 2
+    assert calls >= 4 and short_lease_queue.counts() == {"done": 2}